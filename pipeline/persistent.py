@@ -0,0 +1,166 @@
+from collections.abc import ItemsView, Mapping, ValuesView
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Tuple, Union
+
+# Both structures are tries of 32-way nodes. A node is a list which is never changed after it is published: set and
+# append copy the nodes on the path from the root (path copying), all other nodes are shared with the old version
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+_HASH_BITS = 64
+
+# A slot of a map node is None, an entry (hash, key, value, index of the key in the order of insertion), a child node
+# (list) or a dict of keys with equal hashes -> (value, index)
+_Entry = Tuple[int, Hashable, Any, int]
+_Slot = Union[None, _Entry, list, Dict[Hashable, Any]]
+
+
+def _merge_entries(first: _Entry, second: _Entry, shift: int) -> Union[list, Dict[Hashable, Any]]:
+    if shift >= _HASH_BITS:
+        return {first[1]: first[2:], second[1]: second[2:]}
+    node: List[_Slot] = [None] * _WIDTH
+    first_idx, second_idx = (first[0] >> shift) & _MASK, (second[0] >> shift) & _MASK
+    if first_idx == second_idx:
+        node[first_idx] = _merge_entries(first, second, shift + _BITS)
+    else:
+        node[first_idx], node[second_idx] = first, second
+    return node
+
+
+def _map_set(node: List[_Slot], shift: int, entry: _Entry) -> Tuple[list, int]:
+    """New node with the entry and the index of the key. A new key gets the index of the entry"""
+    idx = (entry[0] >> shift) & _MASK
+    slot = node[idx]
+    new_node = node.copy()
+    index = entry[3]
+    if slot is None:
+        new_node[idx] = entry
+    elif type(slot) is tuple:
+        if slot[1] is entry[1] or slot[1] == entry[1]:
+            index = slot[3]
+            new_node[idx] = entry[:3] + (index,)
+        else:
+            new_node[idx] = _merge_entries(slot, entry, shift + _BITS)
+    elif type(slot) is list:
+        new_node[idx], index = _map_set(slot, shift + _BITS, entry)
+    else:
+        if entry[1] in slot:
+            index = slot[entry[1]][1]
+        new_node[idx] = {**slot, entry[1]: (entry[2], index)}
+    return new_node, index
+
+
+def _vector_append(node: list, shift: int, index: int, value: Any) -> list:
+    if shift == 0:
+        return node + [value]
+    idx = (index >> shift) & _MASK
+    new_node = node.copy()
+    if idx < len(node):
+        new_node[idx] = _vector_append(node[idx], shift - _BITS, index, value)
+    else:
+        new_node.append(_vector_append([], shift - _BITS, index, value))
+    return new_node
+
+
+def _vector_set(node: list, shift: int, index: int, value: Any) -> list:
+    new_node = node.copy()
+    idx = (index >> shift) & _MASK
+    new_node[idx] = value if shift == 0 else _vector_set(node[idx], shift - _BITS, index, value)
+    return new_node
+
+
+def _vector_iter(node: list, shift: int) -> Iterator:
+    if shift == 0:
+        yield from node
+    else:
+        for child in node:
+            yield from _vector_iter(child, shift - _BITS)
+
+
+class PersistentMap(Mapping):
+    """Immutable mapping: set returns a new map in O(log n), which shares almost everything with the old one.
+
+    Keys are iterated in the order of insertion, as in dict. Keys can't be removed"""
+
+    def __init__(self, items: Union[Mapping, Iterable[Tuple[Hashable, Any]]] = ()):
+        self._root: List[_Slot] = [None] * _WIDTH  # hash trie: key -> value
+        # trie of (key, value) in the order of insertion, its leaves are at depth _items_shift / _BITS.
+        # Iteration reads it without lookups in the hash trie
+        self._items: list = []
+        self._items_shift = 0
+        self._len = 0
+        for key, value in (items.items() if isinstance(items, Mapping) else items):
+            self._set_inplace(key, value)
+
+    def _set_inplace(self, key: Hashable, value: Any) -> None:
+        """Only for a map which is not published yet"""
+        self._root, index = _map_set(self._root, 0, (hash(key) & (1 << _HASH_BITS) - 1, key, value, self._len))
+        if index < self._len:
+            self._items = _vector_set(self._items, self._items_shift, index, (key, value))
+            return
+        if self._len == _WIDTH << self._items_shift:  # the trie of items is full
+            self._items = [self._items]
+            self._items_shift += _BITS
+        self._items = _vector_append(self._items, self._items_shift, self._len, (key, value))
+        self._len += 1
+
+    def set(self, key: Hashable, value: Any) -> "PersistentMap":
+        result = PersistentMap.__new__(PersistentMap)
+        result._root, result._items, result._items_shift, result._len = \
+            self._root, self._items, self._items_shift, self._len
+        result._set_inplace(key, value)
+        return result
+
+    def __getitem__(self, key: Hashable) -> Any:
+        key_hash = hash(key) & (1 << _HASH_BITS) - 1
+        node = self._root
+        shift = 0
+        while True:
+            slot = node[(key_hash >> shift) & _MASK]
+            if type(slot) is list:
+                node = slot
+                shift += _BITS
+            elif type(slot) is tuple:
+                if slot[1] is key or slot[1] == key:
+                    return slot[2]
+                raise KeyError(key)
+            elif slot is None:
+                raise KeyError(key)
+            else:
+                return slot[key][0]
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator:
+        return (key for key, _ in _vector_iter(self._items, self._items_shift))
+
+    def items(self) -> ItemsView:
+        return _ItemsView(self)
+
+    def values(self) -> ValuesView:
+        return _ValuesView(self)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PersistentMap) and other._root is self._root:
+            return True
+        return super().__eq__(other)
+
+    def __repr__(self) -> str:
+        return f"PersistentMap({dict(self.items())!r})"
+
+
+class _ItemsView(ItemsView):
+    def __iter__(self) -> Iterator:
+        return _vector_iter(self._mapping._items, self._mapping._items_shift)
+
+
+class _ValuesView(ValuesView):
+    def __iter__(self) -> Iterator:
+        return (value for _, value in _vector_iter(self._mapping._items, self._mapping._items_shift))
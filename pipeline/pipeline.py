@@ -1,10 +1,12 @@
 import abc
 from collections import defaultdict
-from copy import deepcopy
-from dataclasses import dataclass
-from typing import Dict, List, NewType, Optional, Set, TypeAlias
+from copy import deepcopy  # noqa: F401, tests import it from here
+from dataclasses import dataclass, field, replace
+from typing import Dict, FrozenSet, Iterable, List, NewType, Optional, Set, Tuple, TypeAlias
 from uuid import uuid4
 
+from persistent import PersistentMap
+
 BlockId = NewType("BlockId", str)
 Code: TypeAlias = str
 Timestamp = NewType("Timestamp", int)
@@ -25,17 +27,22 @@ def get_timestamp() -> Timestamp:
     return Timestamp(_counter)
 
 
-@dataclass
+@dataclass(frozen=True)
 class Block:
+    """Blocks are shared by copies of a state, so they are never changed: a changed block replaces the old one"""
     id: BlockId
     name: str
     code: Code
-    inputs: List[BlockId]
-    outputs: Set[BlockId]
+    inputs: List[BlockId]  # not changed either
+    outputs: FrozenSet[BlockId]
     last_edit_ts: Timestamp
     is_deprecated: bool = False
     # is_hidden: bool = False
-    is_all_children_hidden: bool = True
+    visible_children_count: int = 0  # number of outputs which are not hidden, see PipelineState.add_visible_children
+
+    @property
+    def is_all_children_hidden(self) -> bool:
+        return self.visible_children_count == 0
 
     @property
     def is_hidden(self) -> bool:
@@ -44,17 +51,69 @@ class Block:
 
 @dataclass
 class PipelineState:
-    blocks: Dict[BlockId, Block]
+    blocks: PersistentMap  # BlockId -> Block
+    # name -> block_ids in the order of adding. Replicas add blocks in different orders, so it isn't compared
+    names: Optional[PersistentMap] = field(default=None, compare=False)
+    # Topological order of all blocks (deprecated too): block_id -> position, a parent is before its children.
+    # It is kept by Pearce-Kelly algorithm, see add_edge. None if concurrent edits have made a loop, until an edge of
+    # the loop is removed
+    order: Optional[PersistentMap] = field(default=None, compare=False)
+    next_position: int = field(default=0, compare=False)
+    # Caches of downstream, upstream and topological_order. A copy shares the dicts with the original until one of
+    # them writes to its dicts: then it copies them first, see _own_caches
+    _downstream: Dict[BlockId, FrozenSet[BlockId]] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _upstream: Dict[BlockId, FrozenSet[BlockId]] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _caches_shared: bool = field(default=False, init=False, repr=False, compare=False)
+    _topological_order: Optional[Tuple[BlockId, ...]] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not isinstance(self.blocks, PersistentMap):
+            self.blocks = PersistentMap(self.blocks)
+        if self.names is None:
+            names = defaultdict(tuple)
+            for block in self.blocks.values():
+                names[block.name] += (block.id,)
+            self.names = PersistentMap(names)
+        if self.order is None and self.next_position == 0:  # a new state, copies of a state with a loop have None
+            self.restore_order()
 
     def copy(self) -> "PipelineState":
-        return deepcopy(self)
+        """O(1): copies share the blocks, each of them pays only for the blocks it replaces"""
+        copy = PipelineState(self.blocks, self.names, self.order, self.next_position)
+        copy._downstream, copy._upstream, copy._topological_order = \
+            self._downstream, self._upstream, self._topological_order
+        copy._caches_shared = self._caches_shared = True
+        return copy
+
+    def _own_caches(self) -> None:
+        if self._caches_shared:
+            self._downstream, self._upstream = dict(self._downstream), dict(self._upstream)
+            self._caches_shared = False
+
+    def set_block(self, block: Block) -> None:
+        self.blocks = self.blocks.set(block.id, block)
+
+    def add_block(self, block: Block) -> None:
+        if block.id not in self.blocks:
+            self.names = self.names.set(block.name, self.names.get(block.name, ()) + (block.id,))
+            if self.order is not None:
+                self.order = self.order.set(block.id, self.next_position)
+            self.next_position += 1
+            self._topological_order = None
+        self.set_block(block)
 
     def get_mapping(self) -> Dict[str, List[BlockId]]:
         """name -> block_ids"""
-        res = defaultdict(list)
-        for block in self.blocks.values():
-            res[block.name].append(block.id)
-        return dict(res)
+        return {name: list(block_ids) for name, block_ids in self.names.items()}
+
+    def get_ids(self, name: str, skip_deprecated: bool = False, skip_hidden: bool = False) -> List[BlockId]:
+        """Ids of the blocks with the name, without a scan of all blocks. Hidden blocks are deprecated too"""
+        block_ids = self.names.get(name, ())
+        if skip_deprecated:
+            return [block_id for block_id in block_ids if not self.blocks[block_id].is_deprecated]
+        if skip_hidden:
+            return [block_id for block_id in block_ids if not self.blocks[block_id].is_hidden]
+        return list(block_ids)
 
     def has_block(self, block_id: BlockId) -> bool:
         return block_id in self.blocks
@@ -62,14 +121,196 @@ class PipelineState:
     def is_deprecated(self, block_id: BlockId) -> bool:
         return self.blocks[block_id].is_deprecated
 
-    def update_is_all_children_hidden(self, block_id: BlockId) -> None:
-        block = self.blocks[block_id]
-        prev_val = block.is_all_children_hidden
-        block.is_all_children_hidden = all(self.blocks[out_id].is_hidden for out_id in block.outputs)
-        if block.is_all_children_hidden == prev_val:
+    def add_visible_children(self, block_ids: Iterable[BlockId], delta: int) -> None:
+        """Adds delta (+1 or -1) to the numbers of visible children of the blocks. A block which becomes hidden or
+        visible because of it changes the numbers of its parents in the same way, and so on. A worklist instead of
+        recursion: chains of blocks may be much deeper than the recursion limit"""
+        worklist = list(block_ids)
+        while worklist:
+            block = self.blocks[worklist.pop()]
+            was_hidden = block.is_hidden
+            block = replace(block, visible_children_count=block.visible_children_count + delta)
+            self.set_block(block)
+            if block.is_hidden != was_hidden:
+                self._topological_order = None
+                worklist.extend(set(block.inputs))
+
+    def recount_visible_children(self, block_ids: Iterable[BlockId]) -> None:
+        """Counts visible children of the blocks anew, and of the parents of each block which gets all children
+        hidden or gets a visible one, and so on. It is for a state with a loop: there a block may be its own ancestor,
+        so the deltas of add_visible_children add up wrong. A stack of iterators instead of recursion"""
+        stack = [iter(block_ids)]
+        while stack:
+            block_id = next(stack[-1], None)
+            if block_id is None:
+                stack.pop()
+                continue
+            block = self.blocks[block_id]
+            count = sum(not self.blocks[child_id].is_hidden for child_id in block.outputs)
+            if count == block.visible_children_count:
+                continue
+            self.set_block(replace(block, visible_children_count=count))
+            if (count == 0) != block.is_all_children_hidden:
+                self._topological_order = None
+                stack.append(iter(block.inputs))
+
+    def restore_order(self) -> None:
+        """Recomputes the order from scratch in O(n), it stays None if there is a loop"""
+        parents_counts = dict.fromkeys(self.blocks, 0)
+        for block in self.blocks.values():
+            for child_id in block.outputs:
+                parents_counts[child_id] += 1
+        ready = [block_id for block_id, count in parents_counts.items() if count == 0]
+        order = []
+        while ready:
+            block_id = ready.pop()
+            order.append(block_id)
+            for child_id in self.blocks[block_id].outputs:
+                parents_counts[child_id] -= 1
+                if parents_counts[child_id] == 0:
+                    ready.append(child_id)
+        if len(order) == len(self.blocks):
+            self.order = PersistentMap((block_id, position) for position, block_id in enumerate(order))
+            self.next_position = len(order)
+            self._topological_order = None
+            for block_id in reversed(order):  # children first. Counts made while there was a loop may be wrong
+                block = self.blocks[block_id]
+                count = sum(not self.blocks[child_id].is_hidden for child_id in block.outputs)
+                if count != block.visible_children_count:
+                    self.set_block(replace(block, visible_children_count=count))
+
+    def _get_descendants_before(self, block_id: BlockId, bound: int) -> Optional[Set[BlockId]]:
+        """Descendants of the block which are before the position bound in the order, with the block itself.
+        None if the block at the bound is one of them"""
+        order = self.order
+        found = {block_id}
+        stack = [block_id]
+        while stack:
+            for child_id in self.blocks[stack.pop()].outputs:
+                position = order[child_id]
+                if position == bound:
+                    return None
+                if position < bound and child_id not in found:
+                    found.add(child_id)
+                    stack.append(child_id)
+        return found
+
+    def would_create_cycle(self, parent_id: BlockId, child_id: BlockId) -> bool:
+        """Whether an edge parent -> child makes a loop. Only the blocks between the two in the order are visited"""
+        if parent_id == child_id:
+            return True
+        if self.order is None:
+            return parent_id in self.downstream(child_id)
+        parent_position = self.order[parent_id]
+        if parent_position < self.order[child_id]:
+            return False
+        return self._get_descendants_before(child_id, parent_position) is None
+
+    def downstream(self, block_id: BlockId) -> FrozenSet[BlockId]:
+        """All blocks which depend on the block, deprecated too, without the block itself"""
+        found = self._downstream.get(block_id)
+        if found is None:
+            self._own_caches()
+            found = self._downstream[block_id] = frozenset(self._search(block_id, "outputs") - {block_id})
+        return found
+
+    def upstream(self, block_id: BlockId) -> FrozenSet[BlockId]:
+        """All blocks which the block depends on, deprecated too, without the block itself"""
+        found = self._upstream.get(block_id)
+        if found is None:
+            self._own_caches()
+            found = self._upstream[block_id] = frozenset(self._search(block_id, "inputs") - {block_id})
+        return found
+
+    def _search(self, block_id: BlockId, direction: str) -> Set[BlockId]:
+        found = {block_id}
+        stack = [block_id]
+        while stack:
+            for next_id in getattr(self.blocks[stack.pop()], direction):
+                if next_id not in found:
+                    found.add(next_id)
+                    stack.append(next_id)
+        return found
+
+    def topological_order(self) -> Tuple[BlockId, ...]:
+        """Blocks which are not hidden, each one after all of its inputs"""
+        assert self.order is not None, "Concurrent edits have made a loop"
+        if self._topological_order is None:
+            visible_ids = [block.id for block in self.blocks.values() if not block.is_hidden]
+            self._topological_order = tuple(sorted(visible_ids, key=self.order.__getitem__))
+        return self._topological_order
+
+    def _invalidate_reachability(self, parent_id: BlockId, child_id: BlockId) -> None:
+        """Drops the cached results which an edge parent -> child changes: downstream of the parent and of its
+        ancestors, upstream of the child and of its descendants"""
+        stale_downstream = self._get_cached_ids(self._downstream, parent_id, "inputs")
+        stale_upstream = self._get_cached_ids(self._upstream, child_id, "outputs")
+        if stale_downstream or stale_upstream:
+            self._own_caches()
+            for block_id in stale_downstream:
+                del self._downstream[block_id]
+            for block_id in stale_upstream:
+                del self._upstream[block_id]
+
+    def _get_cached_ids(self, cache: Dict[BlockId, FrozenSet[BlockId]], block_id: BlockId,
+                        direction: str) -> List[BlockId]:
+        """The block and the blocks reachable from it in the direction which have results in the cache"""
+        if not cache:
+            return []
+        return [found_id for found_id in self._search(block_id, direction) if found_id in cache]
+
+    def _reorder(self, parent_id: BlockId, child_id: BlockId) -> None:
+        """Pearce-Kelly: makes the order valid for a new edge parent -> child. Only the descendants of the child and
+        the ancestors of the parent which are between the two in the order are moved, in the positions they had"""
+        order = self.order
+        lower, upper = order[child_id], order[parent_id]
+        if upper < lower:
+            return
+        descendants = self._get_descendants_before(child_id, upper)
+        if descendants is None:
+            self.order = None
+            self._topological_order = None
+            return
+        ancestors = {parent_id}
+        stack = [parent_id]
+        while stack:
+            for grandparent_id in self.blocks[stack.pop()].inputs:
+                if order[grandparent_id] > lower and grandparent_id not in ancestors:
+                    ancestors.add(grandparent_id)
+                    stack.append(grandparent_id)
+        moved = sorted(ancestors, key=order.__getitem__) + sorted(descendants, key=order.__getitem__)
+        positions = sorted(order[block_id] for block_id in moved)
+        for block_id, position in zip(moved, positions):
+            order = order.set(block_id, position)
+        self.order = order
+        self._topological_order = None
+
+    def add_edge(self, parent_id: BlockId, child_id: BlockId) -> None:
+        parent = self.blocks[parent_id]
+        if child_id in parent.outputs:
             return
-        for parent_id in block.inputs:
-            self.update_is_all_children_hidden(parent_id)
+        self.set_block(replace(parent, outputs=parent.outputs | {child_id}))
+        self._invalidate_reachability(parent_id, child_id)
+        if self.order is not None:
+            self._reorder(parent_id, child_id)
+        if self.order is None:
+            self.recount_visible_children([parent_id])
+        elif not self.is_hidden(child_id):
+            self.add_visible_children([parent_id], +1)
+
+    def remove_edge(self, parent_id: BlockId, child_id: BlockId) -> None:
+        parent = self.blocks[parent_id]
+        assert child_id in parent.outputs
+        # only an edge of a loop can break it, the order is restored in O(n) only then
+        is_in_loop = self.order is None and parent_id in self._search(child_id, "outputs")
+        self.set_block(replace(parent, outputs=parent.outputs - {child_id}))
+        self._invalidate_reachability(parent_id, child_id)
+        if self.order is None:
+            self.recount_visible_children([parent_id])
+            if is_in_loop:
+                self.restore_order()
+        elif not self.is_hidden(child_id):
+            self.add_visible_children([parent_id], -1)
 
     def is_hidden(self, block_id: BlockId) -> bool:
         return self.blocks[block_id].is_hidden
@@ -79,7 +320,13 @@ class PipelineState:
     #     self.blocks[block_id].is_hidden = True
 
     def deprecate(self, block_id: BlockId) -> None:
-        self.blocks[block_id].is_deprecated = True
+        block = replace(self.blocks[block_id], is_deprecated=True)
+        self.set_block(block)
+        if self.order is None:
+            self.recount_visible_children(block.inputs)
+        elif block.is_hidden:
+            self._topological_order = None
+            self.add_visible_children(set(block.inputs), -1)
 
     # def unhide(self, block_id: BlockId) -> None:
     #     self.blocks[block_id].is_hidden = False
@@ -116,18 +363,17 @@ class AddBlock(Update):
         self._block = Block(
             name=self._name,
             id=make_unique_id(),
-            inputs=self._inputs,
-            outputs=set(),
+            inputs=list(self._inputs),
+            outputs=frozenset(),
             code=self._code,
             last_edit_ts=self._ts,
         )
 
     def effect(self, state: PipelineState) -> None:
         assert self._block is not None
-        state.blocks[self._block.id] = deepcopy(self._block)
+        state.add_block(self._block)  # blocks are immutable, so replicas can share it
         for parent_id in self._block.inputs:
-            state.blocks[parent_id].outputs.add(self._block.id)
-            state.update_is_all_children_hidden(parent_id)
+            state.add_edge(parent_id, self._block.id)
 
 
 class DeleteBlock(Update):
@@ -144,8 +390,6 @@ class DeleteBlock(Update):
         if state.is_deprecated(self._block_id):
             return
         state.deprecate(self._block_id)
-        for parent_id in state.blocks[self._block_id].inputs:
-            state.update_is_all_children_hidden(parent_id)
 
 
 class EditBlock(Update):
@@ -158,19 +402,18 @@ class EditBlock(Update):
         self._ts = ts
 
     def prepare(self, state: PipelineState) -> None:
-        # TODO: check no loops will occur
         assert not state.is_deprecated(self._block_id)
+        old_inputs = set(state.blocks[self._block_id].inputs)  # loops of concurrent edits are kept, not made
+        assert not any(state.would_create_cycle(parent_id, self._block_id)
+                       for parent_id in self._new_inputs if parent_id not in old_inputs), "The edit makes a loop"
 
     def effect(self, state: PipelineState) -> None:
         block = state.blocks[self._block_id]
         if block.last_edit_ts > self._ts:
             return
-        block.last_edit_ts = self._ts
-        block.code = self._new_code
+        state.set_block(replace(block, last_edit_ts=self._ts, code=self._new_code))
         for old_parent_id in block.inputs:
-            state.blocks[old_parent_id].outputs.remove(self._block_id)
-            state.update_is_all_children_hidden(old_parent_id)
+            state.remove_edge(old_parent_id, self._block_id)
         for new_parent_id in self._new_inputs:
-            state.blocks[new_parent_id].outputs.add(self._block_id)
-            state.update_is_all_children_hidden(new_parent_id)
-        state.blocks[self._block_id].inputs = self._new_inputs
+            state.add_edge(new_parent_id, self._block_id)
+        state.set_block(replace(state.blocks[self._block_id], inputs=list(self._new_inputs)))
@@ -4,6 +4,7 @@ random.seed(0xABBA)
 
 import pytest
 
+import pipeline
 from pipeline import *
 
 
@@ -39,20 +40,6 @@ class Applier:
             self.updates_list.append(upd)
 
 
-def get_all_reachable_ids(state: PipelineState, block_id: BlockId) -> Set[BlockId]:
-    used = set()
-    queue = [block_id]
-    i = 0
-    while i < len(queue):
-        next_block_id = queue[i]
-        i += 1
-        if next_block_id in used:
-            continue
-        used.add(next_block_id)
-        queue += list(state.blocks[next_block_id].outputs)
-    return used
-
-
 def check_cycles(state: PipelineState):
     used = set()
     finished = set()
@@ -95,7 +82,7 @@ def make_random_operation(state: PipelineState) -> Optional[Update]:
     if op_idx <= 90 and visible_blocks:  # Edit
         block = random.choice(visible_blocks)
 
-        possible_inputs_set = set(block.id for block in visible_blocks) - get_all_reachable_ids(state, block.id)
+        possible_inputs_set = set(block.id for block in visible_blocks) - state.downstream(block.id) - {block.id}
         # assert all(inp_id in possible_inputs_set for inp_id in block.inputs), "Cycles?"
         # assert len(possible_inputs_set) >= len(block.inputs)
         possible_inputs_set |= set(block.inputs)
@@ -117,16 +104,15 @@ def make_random_operation(state: PipelineState) -> Optional[Update]:
     return AddBlock(name, f"return '{name}'", [block.id for block in prev_blocks], get_timestamp())
 
 
-@pytest.fixture
-def init_state():
+def make_init_state() -> PipelineState:
     Applier.cnt = 0
     app = Applier(PipelineState({}))
 
     def get_id(name: str) -> BlockId:
         nonlocal app
-        res = app.state.get_mapping()
-        assert len(res[name]) == 1
-        return res[name][0]
+        res = app.state.get_ids(name)
+        assert len(res) == 1
+        return res[0]
 
     name = make_unique_name()
     app.apply_local([AddBlock(name, f"return '{name}'", [], get_timestamp())])
@@ -138,8 +124,12 @@ def init_state():
     return app.state
 
 
-# @pytest.mark.skip
-def test_stress(init_state):
+@pytest.fixture
+def init_state():
+    return make_init_state()
+
+
+def run_stress(init_state: PipelineState) -> Tuple[Applier, Applier]:
     app_1 = Applier(init_state)
     local_upds_1 = []
     pulled_cnt_1 = 0
@@ -178,8 +168,30 @@ def test_stress(init_state):
     pulled_upds = local_upds_1[pulled_cnt_2:]
     pulled_cnt_2 += len(pulled_upds)
     app_2.apply_remote(pulled_upds)
+    return app_1, app_2
+
+
+# @pytest.mark.skip
+def test_stress(init_state):
+    app_1, app_2 = run_stress(init_state)
+    assert app_1.state == app_2.state
+
 
+@pytest.mark.parametrize("seed", [14, 35])
+def test_stress_loops(seed, monkeypatch):
+    """Seeds which made concurrent loops and broke counters of visible children"""
+    random_state = random.getstate()
+    random.seed(seed)
+    monkeypatch.setattr(pipeline, "_last_id", 0)  # inputs are chosen from sorted ids
+    try:
+        app_1, app_2 = run_stress(make_init_state())
+    finally:
+        random.setstate(random_state)
     assert app_1.state == app_2.state
+    for state in (app_1.state, app_2.state):
+        assert state.order is not None  # the loops are broken by the end
+        for block in state.blocks.values():
+            assert block.visible_children_count == sum(not state.is_hidden(i) for i in block.outputs)
 
 
 def test_stress_3(init_state):
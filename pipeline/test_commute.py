@@ -25,9 +25,9 @@ def init_state():
 
     def get_id(name: str) -> BlockId:
         nonlocal app
-        res = app.state.get_mapping()
-        assert len(res[name]) == 1
-        return res[name][0]
+        res = app.state.get_ids(name)
+        assert len(res) == 1
+        return res[0]
 
     app.apply_local([
         AddBlock("1", "return 1", [], get_timestamp()),
@@ -222,3 +222,138 @@ def test_edit_edit(init_state):
 
     assert app_1.state.blocks[id_10].code == "Hello world!"
     assert app_1.state.blocks[id_10].inputs == [id_8, id_4]
+
+
+def test_deep_chain_unhides():
+    app_1 = Applier(PipelineState({}))
+    ids = []
+    for i in range(3000):  # much deeper than the recursion limit
+        app_1.apply_local([AddBlock(f"chain_{i}", "return a", ids[-1:], get_timestamp())])
+        ids.append(app_1.state.get_ids(f"chain_{i}")[0])
+    app_2 = Applier(app_1.state)
+
+    upds_1 = app_1.apply_local([DeleteBlock(block_id) for block_id in reversed(ids)])
+    assert all(app_1.state.is_hidden(block_id) for block_id in ids)
+    upds_2 = app_2.apply_local([AddBlock("leaf", "return a", [ids[-1]], get_timestamp())])
+    app_1.apply_remote(upds_2)
+    app_2.apply_remote(upds_1)
+
+    assert app_1.state == app_2.state
+    assert not any(app_1.state.is_hidden(block_id) for block_id in ids)
+    for block in app_1.state.blocks.values():
+        assert block.visible_children_count == sum(not app_1.state.is_hidden(i) for i in block.outputs)
+
+
+def test_name_index(init_state: PipelineState):
+    app_1 = Applier(init_state)
+    app_2 = Applier(init_state)
+    id_4, = init_state.get_ids("4")
+    id_6, = init_state.get_ids("6")
+    upds_1 = app_1.apply_local([AddBlock("6", "return 6", [id_4], get_timestamp())])
+    upds_2 = app_2.apply_local([DeleteBlock(id_6)])
+    app_1.apply_remote(upds_2)
+    app_2.apply_remote(upds_1)
+
+    assert app_1.state == app_2.state
+    for app in (app_1, app_2):
+        new_id_6, = app.state.get_ids("6", skip_deprecated=True)
+        assert set(app.state.get_ids("6")) == {id_6, new_id_6}
+        assert app.state.get_ids("6", skip_hidden=True) == [new_id_6]
+        assert app.state.get_ids("7") == [init_state.get_mapping()["7"][0]]
+        assert app.state.get_ids("7", skip_hidden=True) == [] and app.state.get_ids("missing") == []
+    assert app_1.state.get_mapping() == PipelineState(dict(app_1.state.blocks.items())).get_mapping()
+
+
+def assert_order_is_topological(state: PipelineState):
+    assert sorted(state.order.values()) == sorted(set(state.order.values())) and len(state.order) == len(state.blocks)
+    for block in state.blocks.values():
+        assert all(state.order[block.id] < state.order[child_id] for child_id in block.outputs)
+
+
+def test_edit_loop_rejected(init_state: PipelineState):
+    app = Applier(init_state)
+    id_4, = init_state.get_ids("4")
+    id_5, = init_state.get_ids("5")
+    id_10, = init_state.get_ids("10")
+
+    with pytest.raises(AssertionError, match="loop"):
+        app.apply_local([EditBlock(id_5, "return a", [id_10], get_timestamp())])
+    with pytest.raises(AssertionError, match="loop"):
+        app.apply_local([EditBlock(id_5, "return a", [id_5], get_timestamp())])
+    assert app.state == init_state
+
+    app.apply_local([EditBlock(id_4, "return a", [id_10], get_timestamp())])  # moves 4 and its children after 10
+    assert_order_is_topological(app.state)
+    assert not app.state.would_create_cycle(id_10, id_4) and app.state.would_create_cycle(id_4, id_5)
+
+
+def test_edit_edit_loop(init_state: PipelineState, monkeypatch):
+    app_1 = Applier(init_state)
+    app_2 = Applier(init_state)
+    id_3, = init_state.get_ids("3")
+    id_5, = init_state.get_ids("5")
+    id_6, = init_state.get_ids("6")
+    id_8, = init_state.get_ids("8")
+    id_10, = init_state.get_ids("10")
+
+    upds_1 = app_1.apply_local([EditBlock(id_8, "return a", [id_6], get_timestamp())])
+    upds_2 = app_2.apply_local([EditBlock(id_6, "return a", [id_10], get_timestamp())])
+    app_1.apply_remote(upds_2)
+    app_2.apply_remote(upds_1)
+    assert app_1.state == app_2.state
+    assert app_1.state.order is None and app_1.state.would_create_cycle(id_8, id_10)  # 6 -> 8 -> 10 -> 6
+
+    restore_order = PipelineState.restore_order
+    restores = []
+    monkeypatch.setattr(PipelineState, "restore_order", lambda state: restores.append(state) or restore_order(state))
+    app_1.apply_local([EditBlock(id_5, "return a", [id_3], get_timestamp())])  # the loop is still there
+    assert app_1.state.order is None and not restores
+    app_1.apply_local([EditBlock(id_8, "return a", [id_5], get_timestamp())])
+    assert_order_is_topological(app_1.state)
+    assert len(restores) == 1
+
+
+def test_reachability_queries(init_state: PipelineState):
+    app = Applier(init_state)
+    ids = {name: block_ids[0] for name, block_ids in init_state.get_mapping().items()}
+
+    assert app.state.downstream(ids["4"]) == {ids["6"], ids["7"], ids["9"]}
+    assert app.state.upstream(ids["10"]) == {ids["8"], ids["5"], ids["1"], ids["2"], ids["3"]}
+    order = app.state.topological_order()
+    assert set(order) == {ids[name] for name in ("1", "2", "3", "4", "5", "6", "8", "10")}
+    assert order.index(ids["3"]) < order.index(ids["5"]) < order.index(ids["8"]) < order.index(ids["10"])
+
+    copy = app.state.copy()
+    app.apply_local([
+        EditBlock(ids["4"], "return a", [ids["10"]], get_timestamp()),
+        AddBlock("11", "return a", [ids["6"]], get_timestamp()),
+    ])
+    id_11, = app.state.get_ids("11")
+    assert app.state.downstream(ids["4"]) == {ids["6"], ids["7"], ids["9"], id_11}
+    assert app.state.upstream(ids["6"]) == {ids["4"], ids["10"], ids["8"], ids["5"], ids["1"], ids["2"], ids["3"]}
+    order = app.state.topological_order()
+    assert order.index(ids["10"]) < order.index(ids["4"]) < order.index(ids["6"]) < order.index(id_11)
+
+    app.apply_local([DeleteBlock(id_11), DeleteBlock(ids["6"])])
+    assert ids["6"] not in app.state.topological_order() and ids["4"] in app.state.topological_order()
+    assert copy.downstream(ids["4"]) == {ids["6"], ids["7"], ids["9"]}  # copies don't see the changes
+    assert copy.topological_order() == init_state.topological_order()
+
+
+def test_reachability_cache(init_state: PipelineState):
+    app = Applier(init_state)
+    ids = {name: block_ids[0] for name, block_ids in init_state.get_mapping().items()}
+    for name in ("1", "4", "7"):
+        app.state.downstream(ids[name])
+    for name in ("8", "9"):
+        app.state.upstream(ids[name])
+
+    copy = app.state.copy()
+    copy.downstream(ids["3"])
+    assert ids["3"] not in app.state._downstream  # queries of a copy don't fill the caches of the original
+
+    app.apply_local([AddBlock("11", "return a", [ids["8"]], get_timestamp())])  # only ancestors of 8 change
+    assert set(app.state._downstream) == {ids["4"], ids["7"]}
+    assert set(app.state._upstream) == {ids["8"], ids["9"]}
+    assert set(copy._downstream) == {ids["1"], ids["3"], ids["4"], ids["7"]}
+    assert app.state.downstream(ids["1"]) == {ids["5"], ids["8"], ids["10"], app.state.get_ids("11")[0]}
@@ -0,0 +1,64 @@
+import random
+
+from persistent import PersistentMap
+from pipeline import *
+
+
+class CollidingKey:
+    def __init__(self, value: int):
+        self.value = value
+
+    def __hash__(self) -> int:
+        return self.value % 3
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, CollidingKey) and other.value == self.value
+
+
+def test_persistent_map():
+    rng = random.Random(0)
+    expected = {}
+    versions = []
+    pmap = PersistentMap()
+    for _ in range(5000):
+        key = rng.randrange(3000)
+        expected[key] = rng.random()
+        pmap = pmap.set(key, expected[key])
+        if rng.random() < 0.01:
+            versions.append((pmap, dict(expected)))
+    assert pmap == expected and list(pmap.items()) == list(expected.items())
+    for old_pmap, old_expected in versions:  # old versions are not changed by the later ones
+        assert list(old_pmap.items()) == list(old_expected.items())
+        assert list(old_pmap.values()) == list(old_expected.values())
+        assert len(old_pmap) == len(old_expected)
+    assert -1 not in pmap and 5 in pmap
+
+
+def test_hash_collisions():
+    keys = [CollidingKey(i) for i in range(10)]
+    pmap = PersistentMap((key, key.value) for key in keys)
+    updated = pmap.set(keys[4], -4)
+    assert [pmap[key] for key in keys] == list(range(10))
+    assert updated[keys[4]] == -4 and list(updated) == keys
+    assert CollidingKey(11) not in pmap
+
+
+def test_copy_shares_blocks():
+    state = PipelineState({})
+    upd = AddBlock("a", "return 1", [], get_timestamp())
+    upd.prepare(state)
+    upd.effect(state)
+    block_id, = state.get_mapping()["a"]
+
+    copy = state.copy()
+    assert copy == state and copy.blocks[block_id] is state.blocks[block_id]
+    child = AddBlock("b", "return 2", [block_id], get_timestamp())
+    child.prepare(copy)
+    child.effect(copy)
+    delete = DeleteBlock(block_id)
+    delete.prepare(state)
+    delete.effect(state)
+
+    assert list(state.get_mapping()) == ["a"] and state.is_hidden(block_id)
+    assert list(copy.get_mapping()) == ["a", "b"] and not copy.is_hidden(block_id)
+    assert state.blocks[block_id].outputs == set()
@@ -0,0 +1,82 @@
+"""Compares UpdatesApplier on a graph with the node index and on a graph which searches nodes by DFS.
+
+Run from the repository root: python -m yaml_diff_v3.benchmarks.bench_graph_index
+"""
+import random
+import time
+from copy import deepcopy
+
+from yaml_diff_v3 import crdt_graph
+from yaml_diff_v3.benchmarks.synthetic import make_pipeline_yaml_text
+from yaml_diff_v3.crdt_graph import Timestamp, SessionId, NodeId, IdGenerator
+from yaml_diff_v3.crdt_graph.updates import EditScalarNode, AddListItem, DeleteListItem
+from yaml_diff_v3.service import Service
+from yaml_diff_v3.utils import get_tag
+
+STAGES_COUNTS = (30, 300, 3000)  # ~1k, ~10k and ~100k nodes
+UPDATES_COUNT = 100
+
+
+class _DfsGraph(crdt_graph.Graph):
+    """Node lookup as it was before the index: full traversal on every call"""
+
+    def get_node(self, node_id: NodeId):
+        def dfs(node):
+            yield node
+            for child in node.get_all_children():
+                yield from dfs(child)
+
+        [node] = [node for node in dfs(self.root) if node.id == node_id]
+        return node
+
+
+def _make_updates(graph: crdt_graph.Graph, count: int, rng: random.Random) -> list[crdt_graph.Update]:
+    nodes = graph.get_all_nodes()
+    scalars = [node for node in nodes if isinstance(node, crdt_graph.ScalarNode)]
+    lists = [node for node in nodes if isinstance(node, crdt_graph.SequenceNode)]
+    session_id = SessionId("bench")
+    id_generator = IdGenerator(1, graph.get_max_id_counter())
+    updates: list[crdt_graph.Update] = []
+    for i in range(count):
+        ts = Timestamp(i + 1)
+        kind = rng.randrange(3)
+        if kind == 0:
+            updates.append(EditScalarNode(session_id, ts, id_generator.update_id(),
+                                          node_id=rng.choice(scalars).id, new_yaml_tag=get_tag("str"),
+                                          new_value=f"value_{i}"))
+        elif kind == 1:
+            list_node = rng.choice(lists)
+            value = crdt_graph.ScalarNode(
+                id=id_generator.node_id(), yaml_tag=get_tag("str"), anchor=None,
+                last_edit_ts=ts, is_deprecated=False, comment=None, last_comment_edit_ts=ts, value=f"item_{i}")
+            item = crdt_graph.SequenceNode.Item(id=id_generator.node_id(), value=value,
+                                                sort_key=f"5{i}R", last_timestamp_sort_key_edited=ts)
+            updates.append(AddListItem(session_id, ts, id_generator.update_id(),
+                                       list_node_id=list_node.id, new_item=item))
+        else:
+            list_node = rng.choice(lists)
+            updates.append(DeleteListItem(session_id, ts, id_generator.update_id(),
+                                          item_id=rng.choice(list_node.items).value.id))
+    return updates
+
+
+def _measure(graph: crdt_graph.Graph, updates: list[crdt_graph.Update]) -> float:
+    applier = crdt_graph.UpdatesApplier(set())
+    start = time.perf_counter()
+    applier.apply_updates(graph, updates)
+    return time.perf_counter() - start
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'nodes':>8} {'dfs, s':>10} {'index, s':>10} {'speedup':>8}")
+    for stages_count in STAGES_COUNTS:
+        graph = Service().make_initial_crdt_graph(make_pipeline_yaml_text(stages_count), Timestamp(0))
+        updates = _make_updates(graph, UPDATES_COUNT, rng)
+        dfs_time = _measure(_DfsGraph(deepcopy(graph.root)), updates)
+        index_time = _measure(crdt_graph.Graph(deepcopy(graph.root)), updates)
+        print(f"{len(graph.get_all_nodes()):>8} {dfs_time:>10.4f} {index_time:>10.4f} {dfs_time / index_time:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
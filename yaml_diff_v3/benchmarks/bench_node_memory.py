@@ -0,0 +1,131 @@
+"""Measures memory taken by CRDT graph nodes: slotted classes without yaml paths against the previous layout, regular
+dataclasses with a per-instance __dict__ and a yaml path tuple in every node.
+
+Both trees are built from the same graph and share strings, ids and comments with it, so only the node and item
+objects, their lists of items and the paths are counted. Memory is measured with tracemalloc.
+Run from the repository root: python -m yaml_diff_v3.benchmarks.bench_node_memory
+"""
+import gc
+import tracemalloc
+from dataclasses import dataclass
+
+from yaml_diff_v3 import crdt_graph
+from yaml_diff_v3.benchmarks.synthetic import make_pipeline_yaml_text
+from yaml_diff_v3.crdt_graph import Timestamp
+from yaml_diff_v3.service import Service
+
+STAGES_COUNTS = (30, 300, 3000, 6000)  # ~1k, ~10k, ~100k and ~200k nodes
+
+
+@dataclass
+class _DictScalarNode:
+    id: int
+    yaml_tag: str
+    anchor: None | str
+    yaml_path: tuple
+    last_edit_ts: int
+    is_deprecated: bool
+    comment: object
+    last_comment_edit_ts: int
+    value: str
+
+
+@dataclass
+class _DictCollectionNode:
+    id: int
+    yaml_tag: str
+    anchor: None | str
+    yaml_path: tuple
+    last_edit_ts: int
+    is_deprecated: bool
+    comment: object
+    last_comment_edit_ts: int
+    items: list
+
+
+@dataclass
+class _DictMappingItem:
+    id: int
+    key: object
+    value: object
+    sort_key: str
+    last_timestamp_sort_key_edited: int
+
+
+@dataclass
+class _DictSequenceItem:
+    id: int
+    value: object
+    sort_key: str
+    last_timestamp_sort_key_edited: int
+
+
+@dataclass
+class _DictReferenceNode:
+    id: int
+    referred_id: int
+    is_deprecated: bool
+    yaml_path: tuple
+
+
+def _copy_as_dict_nodes(node: crdt_graph.Node, path: tuple):
+    """The node as it was stored before: paths are separate tuples, as yaml_graph.deserialize makes them"""
+    if isinstance(node, crdt_graph.ReferenceNode):
+        return _DictReferenceNode(node.id, node.referred_id, node.is_deprecated, path)
+    fields = (node.id, node.yaml_tag, node.anchor, path, node.last_edit_ts, node.is_deprecated, node.comment,
+              node.last_comment_edit_ts)
+    if isinstance(node, crdt_graph.ScalarNode):
+        return _DictScalarNode(*fields, node.value)
+    if isinstance(node, crdt_graph.MappingNode):
+        items = [_DictMappingItem(item.id, _copy_as_dict_nodes(item.key, path + (item.key.value, 0)),
+                                  _copy_as_dict_nodes(item.value, path + (item.key.value, 1)), item.sort_key,
+                                  item.last_timestamp_sort_key_edited)
+                 for item in node.items]
+    else:
+        items = [_DictSequenceItem(item.id, _copy_as_dict_nodes(item.value, path + (i,)), item.sort_key,
+                                   item.last_timestamp_sort_key_edited)
+                 for i, item in enumerate(node.items)]
+    return _DictCollectionNode(*fields, items)
+
+
+def _copy_as_slotted_nodes(node: crdt_graph.Node) -> crdt_graph.Node:
+    if isinstance(node, crdt_graph.ReferenceNode):
+        return crdt_graph.ReferenceNode(node.id, node.referred_id, node.is_deprecated)
+    fields = (node.id, node.yaml_tag, node.anchor, node.last_edit_ts, node.is_deprecated, node.comment,
+              node.last_comment_edit_ts)
+    if isinstance(node, crdt_graph.ScalarNode):
+        return crdt_graph.ScalarNode(*fields, node.value)
+    if isinstance(node, crdt_graph.MappingNode):
+        return crdt_graph.MappingNode(*fields, [
+            crdt_graph.MappingNode.Item(item.id, _copy_as_slotted_nodes(item.key), _copy_as_slotted_nodes(item.value),
+                                        item.sort_key, item.last_timestamp_sort_key_edited)
+            for item in node.items])
+    return crdt_graph.SequenceNode(*fields, [
+        crdt_graph.SequenceNode.Item(item.id, _copy_as_slotted_nodes(item.value), item.sort_key,
+                                     item.last_timestamp_sort_key_edited)
+        for item in node.items])
+
+
+def _measure_memory(function, *args) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = function(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    print(f"{'elements':>9} {'before, B/elem':>15} {'after, B/elem':>14} {'before, MB':>11} {'after, MB':>10}")
+    for stages_count in STAGES_COUNTS:
+        graph = Service().make_initial_crdt_graph(make_pipeline_yaml_text(stages_count), Timestamp(0))
+        elements_count = len(graph.get_all_nodes())
+        before = _measure_memory(_copy_as_dict_nodes, graph.root, ())
+        after = _measure_memory(_copy_as_slotted_nodes, graph.root)
+        print(f"{elements_count:>9} {before / elements_count:>15.0f} {after / elements_count:>14.0f} "
+              f"{before / 1e6:>11.1f} {after / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
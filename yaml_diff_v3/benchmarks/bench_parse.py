@@ -0,0 +1,65 @@
+"""Compares parsing of large yaml texts without comments by the round-trip loader and by the C composer.
+
+The texts are the demo files without comments, empty lines and anchors, repeated to a few megabytes.
+Run from the repository root: python -m yaml_diff_v3.benchmarks.bench_parse
+"""
+import time
+from pathlib import Path
+from textwrap import indent
+
+from ruamel import yaml
+
+from yaml_diff_v3 import utils, yaml_graph
+
+DEMO_DIR = Path(__file__).parent.parent / "demo"
+TEXT_SIZES = (1_000_000, 4_000_000)
+
+
+def _strip(node: yaml.Node) -> yaml.Node:
+    """A copy of the node without comments and anchors. Aliases are replaced with copies of the referred nodes"""
+    kwargs = dict(start_mark=node.start_mark, end_mark=node.end_mark)
+    if isinstance(node, yaml.ScalarNode):
+        return yaml.ScalarNode(tag=node.tag, value=node.value, style="|" if "\n" in node.value else None, **kwargs)
+    if isinstance(node, yaml.SequenceNode):
+        return yaml.SequenceNode(tag=node.tag, value=[_strip(value) for value in node.value],
+                                 flow_style=None, **kwargs)
+    return yaml.MappingNode(tag=node.tag, value=[(_strip(key), _strip(value))
+                                                 for key, value in node.value], flow_style=None, **kwargs)
+
+
+def _make_text(size: int) -> str:
+    documents = [utils.emits_yaml_node(_strip(utils.loads_yaml_node(path.read_text())))
+                 for path in sorted(DEMO_DIR.glob("experiment_*/case_*/v*.yaml"))]
+    parts = []
+    text_size = 0
+    while text_size < size:
+        part = f"copy_{len(parts)}:\n" + indent(documents[len(parts) % len(documents)], "  ")
+        parts.append(part)
+        text_size += len(part)
+    return "".join(parts)
+
+
+def _measure(function, *args) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    if utils.CParser is None:
+        print("ruamel.yaml.clib is not installed, there is no C composer")
+        return
+    print(f"{'size, MB':>9} {'check, s':>9} {'round-trip, s':>14} {'C, s':>6} {'speedup':>8}")
+    for size in TEXT_SIZES:
+        text = _make_text(size)
+        check_time, can_load_fast = _measure(utils.can_load_yaml_node_fast, text)
+        assert can_load_fast
+        round_trip_time, round_trip_node = _measure(utils.loads_yaml_node, text, False)
+        fast_time, fast_node = _measure(utils.loads_yaml_node, text, True)
+        assert yaml_graph.deserialize(fast_node) == yaml_graph.deserialize(round_trip_node)
+        print(f"{len(text) / 1e6:>9.1f} {check_time:>9.4f} {round_trip_time:>14.3f} {fast_time:>6.3f} "
+              f"{round_trip_time / fast_time:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
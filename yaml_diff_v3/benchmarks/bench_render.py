@@ -0,0 +1,54 @@
+"""Compares the full rendering of a CRDT graph to yaml text through yaml graph, the direct rendering through ruamel
+nodes and YamlTextRenderer after small updates.
+
+Run from the repository root: python -m yaml_diff_v3.benchmarks.bench_render
+"""
+import random
+import time
+
+from yaml_diff_v3 import converter, crdt_graph, yaml_graph
+from yaml_diff_v3.benchmarks.bench_graph_index import _make_updates
+from yaml_diff_v3.benchmarks.synthetic import make_pipeline_yaml_text
+from yaml_diff_v3.crdt_graph import Timestamp
+from yaml_diff_v3.service import Service
+from yaml_diff_v3.utils import dumps_yaml_node, emits_yaml_node
+
+STAGES_COUNTS = (30, 300, 3000)  # ~1k, ~10k and ~100k nodes
+RENDERS_COUNT = 10  # incremental renders, each one after a single update
+
+
+def _render_fully(graph: crdt_graph.Graph) -> str:
+    return dumps_yaml_node(yaml_graph.serialize(converter.crdt_graph_to_yaml_node(graph)))
+
+
+def main():
+    print(f"{'stages':>7} {'full, s':>8} {'direct, s':>10} {'first, s':>9} {'incremental, s':>15}")
+    for stages_count in STAGES_COUNTS:
+        graph = Service().make_initial_crdt_graph(make_pipeline_yaml_text(stages_count), Timestamp(0))
+        start = time.perf_counter()
+        text = _render_fully(graph)
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        assert emits_yaml_node(converter.crdt_graph_to_ruamel_node(graph)) == text
+        direct_time = time.perf_counter() - start
+
+        renderer = converter.YamlTextRenderer()
+        start = time.perf_counter()
+        assert renderer.render(graph) == text
+        first_time = time.perf_counter() - start
+
+        rng = random.Random(0)
+        incremental_time = 0.0
+        for _ in range(RENDERS_COUNT):
+            crdt_graph.UpdatesApplier(set()).apply_updates(graph, _make_updates(graph, 1, rng))
+            start = time.perf_counter()
+            renderer.render(graph)
+            incremental_time += time.perf_counter() - start
+        assert renderer.render(graph) == _render_fully(graph)
+        print(f"{stages_count:>7} {full_time:>8.3f} {direct_time:>10.3f} {first_time:>9.3f} "
+              f"{incremental_time / RENDERS_COUNT:>15.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Measures conversion of a list reorder (yaml EditListOrder) to CRDT sort key updates on random permutations.
+
+The longest chain of items which kept their order is compared with the previous quadratic implementation.
+Run from the repository root: python -m yaml_diff_v3.benchmarks.bench_reorder
+"""
+import random
+import time
+
+from yaml_diff_v3.converter import make_crdt_updates_from_yaml_updates
+from yaml_diff_v3.converter.yaml_to_crdt_updates import _get_longest_chain_satisfying_old_order
+from yaml_diff_v3.crdt_graph import Timestamp, SessionId, NodeId, IdGenerator
+from yaml_diff_v3.service import Service
+from yaml_diff_v3.yaml_graph.updates import EditListOrder
+
+SIZES = (100, 1_000, 10_000, 100_000)
+QUADRATIC_MAX_SIZE = 10_000  # the previous implementation takes too long on larger lists
+
+
+def _get_longest_chain_quadratic(old_order: list[NodeId], new_order: list[NodeId]) -> list[NodeId]:
+    """The previous implementation"""
+    old_index = {node_id: index for index, node_id in enumerate(old_order)}
+    permutation = [old_index[node_id] for node_id in new_order]
+    max_lengths = [1] * len(permutation)  # length of LIS if it ends in position i
+    prevs = [None] * len(permutation)
+    for i in range(1, len(permutation)):
+        for j in range(i):
+            if permutation[i] > permutation[j] and max_lengths[i] < max_lengths[j] + 1:
+                max_lengths[i] = max_lengths[j] + 1
+                prevs[i] = j
+    best_idx = None
+    for i, length in enumerate(max_lengths):
+        if best_idx is None or max_lengths[best_idx] < length:
+            best_idx = i
+
+    reversed_chain = [best_idx]
+    while True:
+        prev = prevs[reversed_chain[-1]]
+        if prev is None:
+            break
+        reversed_chain.append(prev)
+    return [new_order[idx] for idx in reversed_chain[::-1]]
+
+
+def _measure(function, *args) -> tuple[float, list]:
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'size':>8} {'chain':>6} {'quadratic, s':>13} {'patience, s':>12} {'conversion, s':>14}")
+    for size in SIZES:
+        permutation = list(range(size))
+        rng.shuffle(permutation)
+        old_order = [NodeId(i) for i in range(size)]
+        new_order = [old_order[i] for i in permutation]
+
+        patience_time, chain = _measure(_get_longest_chain_satisfying_old_order, old_order, new_order)
+        quadratic_time_text = "-"
+        if size <= QUADRATIC_MAX_SIZE:
+            quadratic_time, quadratic_chain = _measure(_get_longest_chain_quadratic, old_order, new_order)
+            assert len(quadratic_chain) == len(chain)
+            quadratic_time_text = f"{quadratic_time:.4f}"
+
+        graph = Service().make_initial_crdt_graph("".join(f"- {i}\n" for i in range(size)), Timestamp(0))
+        yaml_updates = [EditListOrder(list_path=(), new_order=tuple(permutation))]
+        conversion_time, updates = _measure(make_crdt_updates_from_yaml_updates, yaml_updates, SessionId("bench"),
+                                            Timestamp(1), graph, IdGenerator(1))
+        assert len(updates) == size - len(chain)
+        print(f"{size:>8} {len(chain):>6} {quadratic_time_text:>13} {patience_time:>12.4f} {conversion_time:>14.4f}")
+
+
+if __name__ == "__main__":
+    main()
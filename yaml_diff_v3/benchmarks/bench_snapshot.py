@@ -0,0 +1,44 @@
+"""Compares binary snapshots of CRDT graphs with pickle: size of the data, time of saving and loading.
+
+Run from the repository root: python -m yaml_diff_v3.benchmarks.bench_snapshot
+"""
+import pickle
+import random
+import sys
+import time
+
+from yaml_diff_v3 import crdt_graph
+from yaml_diff_v3.benchmarks.bench_graph_index import _make_updates
+from yaml_diff_v3.benchmarks.synthetic import make_pipeline_yaml_text
+from yaml_diff_v3.crdt_graph import Timestamp
+from yaml_diff_v3.service import Service
+
+STAGES_COUNTS = (30, 300, 3000)  # ~1k, ~10k and ~100k nodes
+UPDATES_COUNT = 200  # to have tombstones, edited timestamps and sort keys in the graph
+
+
+def _measure(function, *args) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    sys.setrecursionlimit(100_000)  # pickle recurses into nested nodes
+    print(f"{'elements':>9} {'snapshot, MB':>13} {'dump, s':>8} {'load, s':>8} "
+          f"{'pickle, MB':>11} {'dump, s':>8} {'load, s':>8}")
+    for stages_count in STAGES_COUNTS:
+        graph = Service().make_initial_crdt_graph(make_pipeline_yaml_text(stages_count), Timestamp(0))
+        crdt_graph.UpdatesApplier(set()).apply_updates(graph, _make_updates(graph, UPDATES_COUNT, random.Random(0)))
+
+        dump_time, data = _measure(crdt_graph.dumps_snapshot, graph)
+        load_time, loaded = _measure(crdt_graph.loads_snapshot, data)
+        assert loaded.root == graph.root
+        pickle_dump_time, pickle_data = _measure(pickle.dumps, graph.root)
+        pickle_load_time, _ = _measure(pickle.loads, pickle_data)
+        print(f"{len(graph.get_all_nodes()):>9} {len(data) / 1e6:>13.2f} {dump_time:>8.3f} {load_time:>8.3f} "
+              f"{len(pickle_data) / 1e6:>11.2f} {pickle_dump_time:>8.3f} {pickle_load_time:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Measures growth of list item sort keys: the compact base-62 keys against the previous uuid-based keys.
+
+Run from the repository root: python -m yaml_diff_v3.benchmarks.bench_sort_keys
+"""
+import bisect
+import random
+import time
+
+from yaml_diff_v3.converter.sort_keys import make_sort_key_between
+from yaml_diff_v3.crdt_graph import SessionId
+from yaml_diff_v3.utils import make_unique_id
+
+INSERTS_COUNT = 10_000
+CHECKPOINTS = (100, 1_000, 10_000)
+INITIAL_KEYS = [f"1{i}R" for i in range(10)]  # keys of a list of 10 items made by the converter
+SESSION_IDS = [SessionId(f"session_{i}") for i in range(3)]
+MAX_KEY_LENGTH = 10_000  # a scenario is stopped earlier if a key gets longer. uuid-based keys grow linearly on appends
+
+
+def _make_uuid_sort_key_between(left_key: None | str, right_key: None | str, session_id: SessionId) -> str:
+    """The previous implementation"""
+    if left_key is None:
+        left_key = "0R"
+    if right_key is None:
+        right_key = "9R"
+    if right_key.startswith(left_key):  # strict prefix
+        return right_key[:-1] + "L" + make_unique_id() + "R"
+    return left_key + make_unique_id() + "R"
+
+
+def _run(make_key, choose_index, rng: random.Random) -> list[tuple[int, float, int, float]]:
+    """Returns (inserts count, mean key length, max key length, total time) at each checkpoint"""
+    keys = list(INITIAL_KEYS)
+    result = []
+    elapsed = 0.0
+    for i in range(1, INSERTS_COUNT + 1):
+        index = choose_index(len(keys), rng)  # insert between keys[index - 1] and keys[index]
+        left_key = keys[index - 1] if index > 0 else None
+        right_key = keys[index] if index < len(keys) else None
+        start = time.perf_counter()
+        key = make_key(left_key, right_key, rng.choice(SESSION_IDS))
+        bisect.insort(keys, key)
+        elapsed += time.perf_counter() - start
+        assert keys[index] == key
+        if i in CHECKPOINTS or len(key) > MAX_KEY_LENGTH:
+            result.append((i, sum(map(len, keys)) / len(keys), max(map(len, keys)), elapsed))
+        if len(key) > MAX_KEY_LENGTH:
+            break
+    return result
+
+
+def main():
+    scenarios = {
+        "random": lambda size, rng: rng.randint(0, size),
+        "append": lambda size, rng: size,
+        "prepend": lambda size, rng: 0,
+    }
+    implementations = {"uuid": _make_uuid_sort_key_between, "base-62": make_sort_key_between}
+    print(f"{'scenario':>8} {'keys':>8} {'inserts':>8} {'mean len':>9} {'max len':>8} {'time, s':>8}")
+    for scenario, choose_index in scenarios.items():
+        for name, make_key in implementations.items():
+            for inserts_count, mean_length, max_length, elapsed in _run(make_key, choose_index, random.Random(0)):
+                print(f"{scenario:>8} {name:>8} {inserts_count:>8} {mean_length:>9.1f} {max_length:>8} "
+                      f"{elapsed:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Compares yaml_graph.build_updates with the previous DeepDiff based implementation on scaled demo configs.
+
+Run from the repository root: python -m yaml_diff_v3.benchmarks.bench_updates_builder
+deepdiff is a dev dependency (pipenv install --dev)
+"""
+import time
+from pathlib import Path
+
+from yaml_diff_v3 import yaml_graph, utils
+from yaml_diff_v3.benchmarks import deepdiff_updates_builder
+from yaml_diff_v3.benchmarks.synthetic import scale_yaml_text
+
+SCALE = 100
+CASES_DIR = Path(__file__).parent.parent / "demo" / "experiment_1"
+
+
+def _measure(build_updates, old_node: yaml_graph.Node, new_node: yaml_graph.Node) -> tuple[float, set]:
+    start = time.perf_counter()
+    updates = build_updates(old_node, new_node)
+    return time.perf_counter() - start, set(updates)
+
+
+def main():
+    print(f"{'case':>8} {'lines':>8} {'deepdiff, s':>12} {'native, s':>10} {'speedup':>8}")
+    for case_dir in sorted(CASES_DIR.glob("case_*")):
+        old_text = scale_yaml_text((case_dir / "v0.yaml").read_text(), SCALE)
+        new_text = scale_yaml_text((case_dir / "v1.yaml").read_text(), SCALE)
+        old_node = yaml_graph.deserialize(utils.loads_yaml_node(old_text))
+        new_node = yaml_graph.deserialize(utils.loads_yaml_node(new_text))
+
+        deepdiff_time, deepdiff_updates = _measure(deepdiff_updates_builder.build_updates, old_node, new_node)
+        native_time, native_updates = _measure(yaml_graph.build_updates, old_node, new_node)
+        assert native_updates == deepdiff_updates
+        print(f"{case_dir.name:>8} {old_text.count(chr(10)):>8} {deepdiff_time:>12.3f} {native_time:>10.3f} "
+              f"{deepdiff_time / native_time:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compares the wire encoding of update batches with pickle and JSON: size of a batch, time of encoding and decoding.
+
+The batches are the local updates of the demo experiments and random updates of a large synthetic graph. JSON is
+decoded only to dicts, without constructing the updates, so its decoding time is a lower bound.
+Run from the repository root: python -m yaml_diff_v3.benchmarks.bench_wire
+"""
+import dataclasses
+import json
+import pickle
+import random
+import time
+from pathlib import Path
+
+from yaml_diff_v3 import crdt_graph
+from yaml_diff_v3.benchmarks.bench_graph_index import _make_updates
+from yaml_diff_v3.benchmarks.synthetic import make_pipeline_yaml_text
+from yaml_diff_v3.crdt_graph import Timestamp, SessionId
+from yaml_diff_v3.service import Service
+
+DEMO_DIR = Path(__file__).parent.parent / "demo"
+STAGES_COUNT = 3000
+SYNTHETIC_BATCH_SIZE = 10_000
+REPEATS = 20  # demo batches are tiny, they are encoded and decoded many times
+
+
+def _demo_batches() -> list[list[crdt_graph.Update]]:
+    service = Service()
+    batches = []
+    for case_dir in sorted(DEMO_DIR.glob("experiment_*/case_*")):
+        base_text = (case_dir / "v0.yaml").read_text()
+        graph = service.make_initial_crdt_graph(base_text, Timestamp(0))
+        for i, path in enumerate(sorted(case_dir.glob("v[1-9].yaml")), start=1):
+            batches.append(service.build_local_updates(graph, base_text, path.read_text(),
+                                                       SessionId(f"session_{i}"), Timestamp(i)))
+    return batches
+
+
+def _json_dumps(updates: list[crdt_graph.Update]) -> bytes:
+    return json.dumps([{"type": type(update).__name__, **dataclasses.asdict(update)} for update in updates]).encode()
+
+
+CODECS = {
+    "wire": (crdt_graph.encode_updates, crdt_graph.decode_updates),
+    "pickle": (pickle.dumps, pickle.loads),
+    "json": (_json_dumps, json.loads),
+}
+
+
+def _measure(batches: list[list[crdt_graph.Update]], repeats: int) -> None:
+    updates_count = sum(map(len, batches)) * repeats
+    print(f"{'codec':>7} {'bytes/update':>13} {'encode, updates/s':>18} {'decode, updates/s':>18}")
+    for name, (encode, decode) in CODECS.items():
+        start = time.perf_counter()
+        for _ in range(repeats):
+            encoded = [encode(batch) for batch in batches]
+        encode_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(repeats):
+            decoded = [decode(data) for data in encoded]
+        decode_time = time.perf_counter() - start
+        if name != "json":
+            assert decoded == batches
+        size = sum(map(len, encoded)) * repeats
+        print(f"{name:>7} {size / updates_count:>13.1f} {updates_count / encode_time:>18.0f} "
+              f"{updates_count / decode_time:>18.0f}")
+
+
+def main():
+    batches = _demo_batches()
+    print(f"Demo experiments: {len(batches)} batches, {sum(map(len, batches))} updates")
+    _measure(batches, REPEATS)
+
+    graph = Service().make_initial_crdt_graph(make_pipeline_yaml_text(STAGES_COUNT), Timestamp(0))
+    batch = _make_updates(graph, SYNTHETIC_BATCH_SIZE, random.Random(0))
+    print(f"\nSynthetic: 1 batch, {len(batch)} updates")
+    _measure([batch], 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import random
+import re
+
+
+def make_pipeline_yaml_text(stages_count: int, seed: int = 0) -> str:
+    """Generates a pipeline config resembling the demo experiments. Each stage adds ~34 CRDT graph elements"""
+    rng = random.Random(seed)
+    lines = ["stages:"]
+    for i in range(stages_count):
+        lines += [
+            f"  - name: stage_{i}  # stage {i}",
+            f"    image: registry.local/stage_{rng.randrange(100)}:latest",
+            "    params:",
+            f"      M: {rng.randrange(1000)}",
+            f"      w: {rng.random():.3f}",
+            f"      mode: mode_{rng.randrange(5)}",
+            "    inputs:",
+            f"      - stage_{rng.randrange(i + 1)}",
+            f"      - stage_{rng.randrange(i + 1)}",
+            "    script:",
+            f"      - python train.py --stage {i}",
+            f"      - python eval.py --stage {i}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def scale_yaml_text(yaml_text: str, times: int) -> str:
+    """Repeats a document with a top level mapping. Top level keys and anchors are renamed in each copy"""
+    copies = []
+    for i in range(times):
+        text = re.sub(r"^([\w-]+):", rf"\1_{i}:", yaml_text, flags=re.MULTILINE)
+        text = re.sub(r"([&*])([\w-]+)", rf"\1\2_{i}", text)
+        copies.append(text)
+    return "\n".join(copies)
@@ -1,7 +1,9 @@
+from .crdt_to_ruamel_node import crdt_graph_to_ruamel_node
 from .crdt_to_yaml_node import crdt_graph_to_yaml_node
+from .crdt_to_yaml_text import YamlTextRenderer
 from .new_yaml_node_to_crdt_node import make_new_crdt_node_from_yaml, make_new_crdt_mapping_item_from_yaml
 from .yaml_to_crdt_updates import make_crdt_updates_from_yaml_updates
 
-__all__ = ["crdt_graph_to_yaml_node",
+__all__ = ["crdt_graph_to_yaml_node", "crdt_graph_to_ruamel_node", "YamlTextRenderer",
            "make_new_crdt_node_from_yaml", "make_new_crdt_mapping_item_from_yaml",
            "make_crdt_updates_from_yaml_updates"]
@@ -0,0 +1,130 @@
+from ruamel import yaml
+from ruamel.yaml.anchor import Anchor
+from ruamel.yaml.serializer import templated_id
+
+from yaml_diff_v3 import crdt_graph, utils
+from yaml_diff_v3.converter.crdt_to_yaml_node import get_has_same_key_flags
+from yaml_diff_v3.yaml_graph.serialization import serialize_comment, get_default_yaml_kwargs
+
+
+def _make_anchor(anchor: None | str, always_dump: bool) -> None | Anchor:
+    """Anchor as ruamel constructor and representer make it: anchors of collections are dumped only if the collection
+    is referenced, generated ids like "id001" are renumbered"""
+    if anchor is None:
+        return None
+    result = Anchor()
+    result.value = None if templated_id(anchor) else anchor
+    result.always_dump = always_dump
+    return result
+
+
+def _get_scalar_value(node: crdt_graph.ScalarNode) -> str:
+    """Booleans and nulls are written the way ruamel representer writes them, other values are kept as is"""
+    if node.yaml_tag == utils.get_tag("bool"):
+        return node.value.lower()
+    if node.yaml_tag == utils.get_tag("null"):
+        return ""
+    return node.value
+
+
+def _scalar_to_ruamel(node: crdt_graph.ScalarNode) -> yaml.ScalarNode:
+    style = "|" if "\n" in node.value else None  # the same as in yaml_graph.serialize
+    return yaml.ScalarNode(
+        tag=node.yaml_tag,
+        value=_get_scalar_value(node),
+        style=style,
+        anchor=_make_anchor(node.anchor, always_dump=True),
+        comment=serialize_comment(node.comment),
+        **get_default_yaml_kwargs(),
+    )
+
+
+def mapping_key_to_ruamel(item: crdt_graph.MappingNode.Item, has_same_key: bool) -> yaml.Node:
+    assert item.key.anchor is None, "Key can't cave an anchor"
+    if not has_same_key:
+        return yaml.ScalarNode(
+            tag=item.key.yaml_tag,
+            value=item.key.value,
+            comment=serialize_comment(item.key.comment),
+            **get_default_yaml_kwargs(),
+        )
+    return yaml.SequenceNode(
+        tag=utils.get_tag("seq"),
+        value=[
+            yaml.ScalarNode(tag=item.key.yaml_tag, value=item.key.value, **get_default_yaml_kwargs()),
+            yaml.ScalarNode(tag=utils.get_tag("str"), value=str(item.value.id), **get_default_yaml_kwargs()),
+        ],
+        flow_style=True,  # ruamel constructor makes a tuple of a sequence key, it is dumped in flow style
+        comment=serialize_comment(item.key.comment),  # I.e. move comment one level upper
+        **get_default_yaml_kwargs(),
+    )
+
+
+def make_ruamel_mapping(node: crdt_graph.MappingNode, value: list[tuple[yaml.Node, yaml.Node]]) -> yaml.MappingNode:
+    """A ruamel node with the given items and with the tag, the anchor and the comment of the CRDT node"""
+    return yaml.MappingNode(
+        tag=node.yaml_tag,
+        value=value,
+        flow_style=None,
+        anchor=_make_anchor(node.anchor, always_dump=False),
+        comment=serialize_comment(node.comment),
+        **get_default_yaml_kwargs(),
+    )
+
+
+def make_ruamel_sequence(node: crdt_graph.SequenceNode, value: list[yaml.Node]) -> yaml.SequenceNode:
+    """A ruamel node with the given items and with the tag, the anchor and the comment of the CRDT node"""
+    return yaml.SequenceNode(
+        tag=node.yaml_tag,
+        value=value,
+        flow_style=None,
+        anchor=_make_anchor(node.anchor, always_dump=False),
+        comment=serialize_comment(node.comment),
+        **get_default_yaml_kwargs(),
+    )
+
+
+def _mapping_to_ruamel(node: crdt_graph.MappingNode,
+                       converted_nodes: dict[crdt_graph.NodeId, yaml.Node]) -> yaml.MappingNode:
+    visible_items = [item for item in node.items if not item.value.is_hidden]
+    return make_ruamel_mapping(node, [(mapping_key_to_ruamel(item, has_same_key),
+                                       crdt_node_to_ruamel_node(item.value, converted_nodes))
+                                      for item, has_same_key in zip(visible_items,
+                                                                    get_has_same_key_flags(visible_items))])
+
+
+def _sequence_to_ruamel(node: crdt_graph.SequenceNode,
+                        converted_nodes: dict[crdt_graph.NodeId, yaml.Node]) -> yaml.SequenceNode:
+    return make_ruamel_sequence(node, [crdt_node_to_ruamel_node(item.value, converted_nodes)
+                                       for item in node.items if not item.value.is_hidden])
+
+
+def crdt_node_to_ruamel_node(crdt_node: crdt_graph.Node,
+                         converted_nodes: dict[crdt_graph.NodeId, yaml.Node]) -> yaml.Node:
+    if isinstance(crdt_node, crdt_graph.ReferenceNode):
+        return converted_nodes[crdt_node.referred_id]
+
+    converted: yaml.Node
+    if isinstance(crdt_node, crdt_graph.ScalarNode):
+        converted = _scalar_to_ruamel(crdt_node)
+    elif isinstance(crdt_node, crdt_graph.MappingNode):
+        converted = _mapping_to_ruamel(crdt_node, converted_nodes)
+    elif isinstance(crdt_node, crdt_graph.SequenceNode):
+        converted = _sequence_to_ruamel(crdt_node, converted_nodes)
+    else:
+        raise TypeError(f"Unexpected crdt node type {crdt_node}")
+
+    converted_nodes[crdt_node.id] = converted
+    return converted
+
+
+def crdt_graph_to_ruamel_node(graph: crdt_graph.Graph) -> yaml.Node:
+    """Converts a CRDT graph straight to a ruamel node in one pass, without yaml graph. Dumped with
+    utils.emits_yaml_node, it gives the same text as crdt_graph_to_yaml_node + yaml_graph.serialize +
+    utils.dumps_yaml_node, except for a few scalars which ruamel constructor doesn't keep as they are
+    (e.g. "+1" or ".NaN"): they and their anchors are dumped unchanged"""
+    converted_nodes: dict[crdt_graph.NodeId, yaml.Node] = {}
+    converted = crdt_node_to_ruamel_node(graph.root, converted_nodes)
+    if isinstance(converted, yaml.ScalarNode) and converted.tag == utils.get_tag("null"):
+        converted.value = "null"  # an empty document would be read as an empty string
+    return converted
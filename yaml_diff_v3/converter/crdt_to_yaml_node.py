@@ -1,11 +1,11 @@
-from collections import OrderedDict
+from collections import OrderedDict, Counter
 
 from yaml_diff_v3 import crdt_graph, yaml_graph, utils
 
 
-def _scalar_to_yaml(node: crdt_graph.ScalarNode) -> yaml_graph.ScalarNode:
+def _scalar_to_yaml(node: crdt_graph.ScalarNode, path: yaml_graph.NodePath) -> yaml_graph.ScalarNode:
     return yaml_graph.ScalarNode(
-        path=(),  # TODO: remove path
+        path=path,
         tag=node.yaml_tag,
         value=node.value,
         anchor=node.anchor,
@@ -13,14 +13,9 @@ def _scalar_to_yaml(node: crdt_graph.ScalarNode) -> yaml_graph.ScalarNode:
     )
 
 
-def _mapping_item_to_yaml(
-        mapping_node: crdt_graph.MappingNode,
-        item: crdt_graph.MappingNode.Item,
-        converted_nodes: dict[crdt_graph.NodeId, yaml_graph.Node],
-) -> tuple[yaml_graph.NodePathKey, yaml_graph.MappingNode.Item]:
-    has_same_key = 1 < sum(1 for mapping_item in mapping_node.items
-                           if mapping_item.key.value == item.key.value and not mapping_item.value.is_hidden)
-    path_key = (item.key.value, item.value.id) if has_same_key else item.key.value
+def _mapping_key_to_yaml(item: crdt_graph.MappingNode.Item,
+                         has_same_key: bool) -> tuple[yaml_graph.NodePathKey, yaml_graph.Node]:
+    path_key = (item.key.value, str(item.value.id)) if has_same_key else item.key.value
 
     assert item.key.anchor is None, "Key can't cave an anchor"
     yaml_key: yaml_graph.Node
@@ -40,28 +35,43 @@ def _mapping_item_to_yaml(
                 yaml_graph.SequenceNode.Item(yaml_graph.ScalarNode(
                     path=(), tag=item.key.yaml_tag, value=item.key.value, anchor=None, comment=None)),
                 yaml_graph.SequenceNode.Item(yaml_graph.ScalarNode(
-                    path=(), tag=utils.get_tag("str"), value=item.value.id, anchor=None, comment=None)),
+                    path=(), tag=utils.get_tag("str"), value=str(item.value.id), anchor=None, comment=None)),
             ),
             anchor=None,
             comment=item.key.comment,  # I.e. move comment one level upper
         )
+    return path_key, yaml_key
+
 
+def _mapping_item_to_yaml(
+        item: crdt_graph.MappingNode.Item,
+        has_same_key: bool,
+        path: yaml_graph.NodePath,
+        converted_nodes: dict[crdt_graph.NodeId, yaml_graph.Node],
+) -> tuple[yaml_graph.NodePathKey, yaml_graph.MappingNode.Item]:
+    path_key, yaml_key = _mapping_key_to_yaml(item, has_same_key)
+    item_path = path + (path_key,)
     yaml_item = yaml_graph.MappingNode.Item(
         key=yaml_key,
-        value=_crdt_to_yaml_node(item.value, converted_nodes),
-        path=(),
+        value=_crdt_to_yaml_node(item.value, item_path + (1,), converted_nodes),
+        path=item_path,
         path_key=path_key,  # TODO: probably unnecessary
     )
     return path_key, yaml_item
 
 
-def _mapping_to_yaml(node: crdt_graph.MappingNode,
+def get_has_same_key_flags(visible_items: list[crdt_graph.MappingNode.Item]) -> list[bool]:
+    keys_counts = Counter(item.key.value for item in visible_items)
+    return [keys_counts[item.key.value] > 1 for item in visible_items]
+
+
+def _mapping_to_yaml(node: crdt_graph.MappingNode, path: yaml_graph.NodePath,
                      converted_nodes: dict[crdt_graph.NodeId, yaml_graph.Node]) -> yaml_graph.MappingNode:
-    items = OrderedDict(_mapping_item_to_yaml(node, item, converted_nodes)
-                        for item in sorted(node.items, key=lambda item: item.sort_key)
-                        if not item.value.is_hidden)
+    visible_items = [item for item in node.items if not item.value.is_hidden]
+    items = OrderedDict(_mapping_item_to_yaml(item, has_same_key, path, converted_nodes)
+                        for item, has_same_key in zip(visible_items, get_has_same_key_flags(visible_items)))
     return yaml_graph.MappingNode(
-        path=node.yaml_path,
+        path=path,
         tag=node.yaml_tag,
         items=items,
         anchor=node.anchor,
@@ -69,13 +79,13 @@ def _mapping_to_yaml(node: crdt_graph.MappingNode,
     )
 
 
-def _sequence_to_yaml(node: crdt_graph.SequenceNode,
+def _sequence_to_yaml(node: crdt_graph.SequenceNode, path: yaml_graph.NodePath,
                       converted_nodes: dict[crdt_graph.NodeId, yaml_graph.Node]) -> yaml_graph.SequenceNode:
-    values = tuple(yaml_graph.SequenceNode.Item(_crdt_to_yaml_node(item.value, converted_nodes))
-                   for item in sorted(node.items, key=lambda item: item.sort_key)
-                   if not item.value.is_hidden)
+    visible_values = [item.value for item in node.items if not item.value.is_hidden]
+    values = tuple(yaml_graph.SequenceNode.Item(_crdt_to_yaml_node(value, path + (i,), converted_nodes))
+                   for i, value in enumerate(visible_values))
     return yaml_graph.SequenceNode(
-        path=node.yaml_path,
+        path=path,
         tag=node.yaml_tag,
         values=values,
         anchor=node.anchor,
@@ -83,19 +93,20 @@ def _sequence_to_yaml(node: crdt_graph.SequenceNode,
     )
 
 
-def _crdt_to_yaml_node(crdt_node: crdt_graph.Node,
+def _crdt_to_yaml_node(crdt_node: crdt_graph.Node, path: yaml_graph.NodePath,
                        converted_nodes: dict[crdt_graph.NodeId, yaml_graph.Node]) -> yaml_graph.Node:
+    """Paths are computed on the way down, the same way as yaml_graph.deserialize does it"""
     if isinstance(crdt_node, crdt_graph.ReferenceNode):
-        return yaml_graph.ReferenceNode(path=crdt_node.yaml_path,
+        return yaml_graph.ReferenceNode(path=path,
                                         referred_node=converted_nodes[crdt_node.referred_id])
 
     converted: yaml_graph.Node
     if isinstance(crdt_node, crdt_graph.ScalarNode):
-        converted = _scalar_to_yaml(crdt_node)
+        converted = _scalar_to_yaml(crdt_node, path)
     elif isinstance(crdt_node, crdt_graph.MappingNode):
-        converted = _mapping_to_yaml(crdt_node, converted_nodes)
+        converted = _mapping_to_yaml(crdt_node, path, converted_nodes)
     elif isinstance(crdt_node, crdt_graph.SequenceNode):
-        converted = _sequence_to_yaml(crdt_node, converted_nodes)
+        converted = _sequence_to_yaml(crdt_node, path, converted_nodes)
     else:
         raise TypeError(f"Unexpected crdt node type {crdt_node}")
 
@@ -105,4 +116,4 @@ def _crdt_to_yaml_node(crdt_node: crdt_graph.Node,
 
 def crdt_graph_to_yaml_node(graph: crdt_graph.Graph) -> yaml_graph.Node:
     converted_nodes: dict[crdt_graph.NodeId, yaml_graph.Node] = {}
-    return _crdt_to_yaml_node(graph.root, converted_nodes)
+    return _crdt_to_yaml_node(graph.root, (), converted_nodes)
@@ -0,0 +1,209 @@
+from ruamel import yaml
+from ruamel.yaml.serializer import templated_id
+
+from yaml_diff_v3 import crdt_graph, utils
+from yaml_diff_v3.converter.crdt_to_ruamel_node import crdt_graph_to_ruamel_node, crdt_node_to_ruamel_node, \
+    mapping_key_to_ruamel, make_ruamel_mapping, make_ruamel_sequence
+from yaml_diff_v3.converter.crdt_to_yaml_node import get_has_same_key_flags
+from yaml_diff_v3.yaml_graph.serialization import get_default_yaml_kwargs
+
+Collection = crdt_graph.MappingNode | crdt_graph.SequenceNode
+Item = crdt_graph.MappingNode.Item | crdt_graph.SequenceNode.Item
+# Mapping items on the way from the root to a collection with their has_same_key flags
+Ancestors = tuple[tuple[crdt_graph.MappingNode, crdt_graph.MappingNode.Item, bool], ...]
+
+_SENTINEL = "__yaml_diff_v3_sentinel__"  # a plain scalar which doesn't occur in configs
+
+
+class _CantSplitText(Exception):
+    pass
+
+
+class YamlTextRenderer:
+    """Converts a CRDT graph to yaml text like crdt_graph_to_ruamel_node + emits_yaml_node, but reuses the text of
+    subtrees which were not changed since the previous call (see Graph.get_version).
+
+    Items of a block collection are split into chunks, and the text of each chunk is cached. Text of a chunk is
+    found by dumping a document which contains only this chunk and the mapping items on the way from the root:
+    it is the dumped text without a header and a footer. They come from the same document with a sentinel item
+    instead of the chunk, so the chunk is rendered with the same indentation, width and comments of the ancestors
+    as in the whole document. A chunk is a single item unless its subtree contains a reference to another item
+    (an alias must be dumped together with its anchor), then the items between them are joined into one chunk.
+    If the only item of a chunk is a mapping item with a block collection value, its text is made from the texts
+    of the value's chunks, so a change deep inside a large collection re-renders only the changed chunk.
+    Generated anchors like "id001" are numbered by ruamel in the order of the whole document, so if a referenced
+    node has such an anchor, the whole document is dumped instead.
+
+    A renderer keeps the texts of one graph, so it must not be used with different graphs"""
+
+    def __init__(self):
+        self._texts: dict[crdt_graph.NodeId, dict[tuple[crdt_graph.NodeId, ...], tuple[tuple, str]]] = {}
+        self._refs: dict[crdt_graph.NodeId, tuple[int, frozenset[crdt_graph.NodeId]]] = {}
+        self._text: None | tuple[int, str] = None  # version of the root and the whole text
+
+    def render(self, graph: crdt_graph.Graph) -> str:
+        root = graph.root
+        if self._text is not None and self._text[0] == graph.get_version(root.id):
+            return self._text[1]
+
+        text: None | str = None
+        if self._is_splittable(root) and not self._has_generated_anchors(graph):
+            try:
+                header, footer = self._get_header_and_footer((), root)
+                text = header + self._render_items(graph, (), root) + footer
+            except _CantSplitText:
+                self._texts.clear()
+        if text is None:
+            text = utils.emits_yaml_node(crdt_graph_to_ruamel_node(graph))
+        self._text = (graph.get_version(root.id), text)
+        return text
+
+    @staticmethod
+    def _is_splittable(node: crdt_graph.Node) -> bool:
+        """Whether the node is a block collection, i.e. each its item starts on a new line"""
+        return isinstance(node, (crdt_graph.MappingNode, crdt_graph.SequenceNode)) and \
+            any(not item.value.is_hidden for item in node.items)
+
+    def _has_generated_anchors(self, graph: crdt_graph.Graph) -> bool:
+        """Whether an alias of a generated anchor is dumped, i.e. the anchor is renumbered"""
+        for referred_id in self._get_referred_ids(graph, graph.root):
+            anchor = graph.get_node(referred_id).anchor
+            if anchor is not None and templated_id(anchor):
+                return True
+        return False
+
+    def _render_items(self, graph: crdt_graph.Graph, ancestors: Ancestors, collection: Collection) -> str:
+        """Returns the text of all visible items of the collection"""
+        visible_items = [item for item in collection.items if not item.value.is_hidden]
+        if isinstance(collection, crdt_graph.MappingNode):
+            has_same_key_flags = get_has_same_key_flags(visible_items)
+        else:
+            has_same_key_flags = [False] * len(visible_items)
+
+        old_texts = self._texts.get(collection.id, {})
+        texts = {}
+        header_and_footer: None | tuple[str, str] = None
+        for start, end in self._split_into_chunks(graph, collection, visible_items):
+            chunk = visible_items[start:end]
+            chunk_ids = tuple(item.id for item in chunk)
+            state = (tuple(graph.get_version(item.id) for item in chunk), tuple(has_same_key_flags[start:end]))
+            if chunk_ids in old_texts and old_texts[chunk_ids][0] == state:
+                texts[chunk_ids] = old_texts[chunk_ids]
+                continue
+
+            if header_and_footer is None:
+                header_and_footer = self._get_header_and_footer(ancestors, collection)
+            header, footer = header_and_footer
+            text: str
+            if isinstance(collection, crdt_graph.MappingNode) and len(chunk) == 1 and \
+                    self._is_splittable(chunk[0].value):
+                value_ancestors = ancestors + ((collection, chunk[0], has_same_key_flags[start]),)
+                value_header, value_footer = self._get_header_and_footer(value_ancestors, chunk[0].value)
+                text = _remove_prefix(value_header, header) + \
+                    self._render_items(graph, value_ancestors, chunk[0].value) + \
+                    _remove_suffix(value_footer, footer)
+            else:
+                for item in chunk:
+                    self._texts.pop(item.value.id, None)  # if the value was split before, forget its parts
+                dumped = self._dump(ancestors, collection, chunk, has_same_key_flags[start:end])
+                text = _remove_suffix(_remove_prefix(dumped, header), footer)
+            texts[chunk_ids] = (state, text)
+
+        self._texts[collection.id] = texts  # texts of chunks which are not present anymore are dropped
+        return "".join(text for state, text in texts.values())
+
+    def _split_into_chunks(self, graph: crdt_graph.Graph, collection: Collection,
+                           visible_items: list[Item]) -> list[tuple[int, int]]:
+        """Returns [start, end) ranges of visible items. Items linked by a reference are in the same chunk"""
+        indices = {item.id: i for i, item in enumerate(visible_items)}
+        chunk_ends = list(range(1, len(visible_items) + 1))  # start of a reference -> end of its chunk
+        for i, item in enumerate(visible_items):
+            for referred_id in self._get_referred_ids(graph, item):
+                j = _get_index_of_item_containing(graph, collection, indices, referred_id)
+                if j is not None and i != j:
+                    chunk_ends[min(i, j)] = max(chunk_ends[min(i, j)], max(i, j) + 1)
+
+        result = []
+        start = 0
+        while start < len(visible_items):
+            end = chunk_ends[start]
+            k = start
+            while k < end:
+                end = max(end, chunk_ends[k])
+                k += 1
+            result.append((start, end))
+            start = end
+        return result
+
+    def _get_referred_ids(self, graph: crdt_graph.Graph, element) -> frozenset[crdt_graph.NodeId]:
+        if isinstance(element, crdt_graph.ReferenceNode):
+            return frozenset((element.referred_id,))
+        if isinstance(element, crdt_graph.ScalarNode):
+            return frozenset()
+
+        version = graph.get_version(element.id)
+        cached = self._refs.get(element.id)
+        if cached is None or cached[0] != version:
+            referred_ids = frozenset().union(*(self._get_referred_ids(graph, child)
+                                               for child in element.get_all_children()))
+            cached = self._refs[element.id] = (version, referred_ids)
+        return cached[1]
+
+    def _get_header_and_footer(self, ancestors: Ancestors, collection: Collection) -> tuple[str, str]:
+        """Text of the document before and after the items of the collection"""
+        sentinel = yaml.ScalarNode(tag=utils.get_tag("str"), value=_SENTINEL, **get_default_yaml_kwargs())
+        node: yaml.Node
+        if isinstance(collection, crdt_graph.MappingNode):
+            value = yaml.ScalarNode(tag=utils.get_tag("str"), value="x", **get_default_yaml_kwargs())
+            node = make_ruamel_mapping(collection, [(sentinel, value)])
+        else:
+            node = make_ruamel_sequence(collection, [sentinel])
+        dumped = self._dump_with_ancestors(ancestors, node)
+
+        if dumped.count(_SENTINEL) != 1:
+            raise _CantSplitText()
+        line_start = dumped.rfind("\n", 0, dumped.find(_SENTINEL)) + 1
+        line_end = dumped.find("\n", line_start) + 1
+        return dumped[:line_start], dumped[line_end:]
+
+    def _dump(self, ancestors: Ancestors, collection: Collection, chunk: list[Item],
+              has_same_key_flags: list[bool]) -> str:
+        converted_nodes: dict[crdt_graph.NodeId, yaml.Node] = {}
+        node: yaml.Node
+        if isinstance(collection, crdt_graph.MappingNode):
+            node = make_ruamel_mapping(collection, [(mapping_key_to_ruamel(item, has_same_key),
+                                                     crdt_node_to_ruamel_node(item.value, converted_nodes))
+                                                    for item, has_same_key in zip(chunk, has_same_key_flags)])
+        else:
+            node = make_ruamel_sequence(collection, [crdt_node_to_ruamel_node(item.value, converted_nodes)
+                                                     for item in chunk])
+        return self._dump_with_ancestors(ancestors, node)
+
+    @staticmethod
+    def _dump_with_ancestors(ancestors: Ancestors, node: yaml.Node) -> str:
+        for mapping, item, has_same_key in reversed(ancestors):
+            node = make_ruamel_mapping(mapping, [(mapping_key_to_ruamel(item, has_same_key), node)])
+        return utils.emits_yaml_node(node)
+
+
+def _get_index_of_item_containing(graph: crdt_graph.Graph, collection: Collection,
+                                  indices: dict[crdt_graph.NodeId, int],
+                                  node_id: crdt_graph.NodeId) -> None | int:
+    """Returns the index of the visible item of the collection which contains the node, if any"""
+    element = graph.get_node(node_id)
+    parent = graph.get_parent(node_id)
+    while parent is not None and parent is not collection:
+        element, parent = parent, graph.get_parent(parent.id)
+    return None if parent is None else indices.get(element.id)
+
+
+def _remove_prefix(text: str, prefix: str) -> str:
+    if not text.startswith(prefix):
+        raise _CantSplitText()
+    return text[len(prefix):]
+
+
+def _remove_suffix(text: str, suffix: str) -> str:
+    if not text.endswith(suffix):
+        raise _CantSplitText()
+    return text[:len(text) - len(suffix)]
@@ -0,0 +1,67 @@
+import bisect
+import functools
+import hashlib
+
+from yaml_diff_v3.crdt_graph.updates import SessionId
+
+# Sort keys are compared as plain strings. New keys consist of base-62 digits (in ASCII order).
+# Keys created by older versions ("1R", "1R<uuid>R", "0RL<uuid>R", ...) remain valid: the generator below works for
+# arbitrary neighbours, so old and new keys can be mixed in one collection and no migration of a graph is needed
+_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+_DIGIT_CODES = [ord(digit) for digit in _DIGITS]
+_SESSION_TAG_LENGTH = 5
+
+
+@functools.lru_cache(maxsize=1024)
+def make_session_tag(session_id: SessionId) -> str:
+    """Short deterministic suffix of the keys made by a session. If two sessions concurrently insert items between
+    the same neighbours, they get the same digits before the suffix, and the suffix orders them in the same way on
+    all replicas. The tag has a fixed length, so keys of different sessions never coincide (unless their tags do)"""
+    number = int.from_bytes(hashlib.blake2b(session_id.encode(), digest_size=8).digest(), "big")
+    tag = []
+    for _ in range(_SESSION_TAG_LENGTH - 1):
+        number, digit = divmod(number, len(_DIGITS))
+        tag.append(_DIGITS[digit])
+    tag.append(_DIGITS[1 + number % (len(_DIGITS) - 1)])  # a key never ends with the smallest digit, see below
+    return "".join(tag)
+
+
+def _make_digits_between(left_key: str, right_key: None | str) -> str:
+    """Returns a short string m such that left_key < m + suffix < right_key for any suffix.
+
+    Every key must end with a character greater than "0", otherwise there may be nothing between two keys
+    (e.g. between "5" and "50")"""
+    result = []
+    for i in range(len(left_key) + (0 if right_key is None else len(right_key)) + 1):
+        left_code = ord(left_key[i]) if i < len(left_key) else -1  # if left key has ended, any character fits
+        right_code = ord(right_key[i]) if right_key is not None else ord(_DIGITS[-1]) + 1
+        # digits strictly between left_key[i] and right_key[i] are _DIGITS[lo:hi]
+        lo, hi = bisect.bisect_right(_DIGIT_CODES, left_code), bisect.bisect_left(_DIGIT_CODES, right_code)
+        if lo < hi:
+            # Items are usually appended to the end (or to the beginning), so leave room for the next ones there
+            if right_key is None:
+                digit = _DIGITS[lo]
+            elif left_code == -1:
+                digit = _DIGITS[hi - 1]
+            else:
+                digit = _DIGITS[(lo + hi) // 2]
+            return "".join(result) + digit
+
+        if left_code == right_code:  # common prefix
+            result.append(left_key[i])
+        elif left_code != -1:
+            # left_key[i] and right_key[i] are neighbours. After left_key[i] the right bound doesn't matter
+            result.append(left_key[i])
+            right_key = None
+        else:
+            # Left key has ended and right_key[i] <= "0". Keys of older versions may contain "-" from uuids
+            result.append(right_key[i])
+    raise AssertionError(f"Can't make a sort key between {left_key} and {right_key}")
+
+
+def make_sort_key_between(left_key: None | str, right_key: None | str, session_id: SessionId) -> str:
+    """None means that there is no neighbour on this side"""
+    assert left_key is None or right_key is None or left_key < right_key, (left_key, right_key)
+    result = _make_digits_between(left_key or "", right_key) + make_session_tag(session_id)
+    assert (left_key is None or left_key < result) and (right_key is None or result < right_key)
+    return result
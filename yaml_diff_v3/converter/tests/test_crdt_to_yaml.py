@@ -1,6 +1,6 @@
 from yaml_diff_v3 import converter
 from yaml_diff_v3 import yaml_graph
-from yaml_diff_v3.crdt_graph import Timestamp, Graph
+from yaml_diff_v3.crdt_graph import Timestamp, Graph, IdGenerator
 from yaml_diff_v3.utils import loads_yaml_node, dumps_yaml_node, my_dedent
 from yaml_diff_v3.yaml_graph import serialization
 
@@ -9,7 +9,7 @@ def check(yaml_text):
     yaml_text = my_dedent(yaml_text)
     yaml_node = serialization.deserialize(loads_yaml_node(yaml_text))
 
-    crdt_node = converter.make_new_crdt_node_from_yaml(yaml_node, Timestamp(0))
+    crdt_node = converter.make_new_crdt_node_from_yaml(yaml_node, Timestamp(0), IdGenerator(0))
 
     yaml_node_2 = converter.crdt_graph_to_yaml_node(Graph(crdt_node))
     result_text = dumps_yaml_node(serialization.serialize(yaml_node_2))
@@ -24,7 +24,7 @@ def test_same_node():
     # This is one object (because of the & and *)
     assert yaml_node.items["A"].value is yaml_node.items["B"].value.referred_node
 
-    crdt_node = converter.make_new_crdt_node_from_yaml(yaml_node, Timestamp(0))
+    crdt_node = converter.make_new_crdt_node_from_yaml(yaml_node, Timestamp(0), IdGenerator(0))
     assert crdt_node.items[0].value.id == crdt_node.items[1].value.referred_id
 
     yaml_node_2 = converter.crdt_graph_to_yaml_node(Graph(crdt_node))
@@ -53,3 +53,34 @@ def test_comments():
         A: 1     # mess
            # with comments 
     """)
+
+
+def test_long_collections():
+    check("".join(f"K{i}:\n" + "".join(f"- {j}\n" for j in range(12)) for i in range(12)))
+
+
+def test_duplicated_keys():
+    yaml_node = serialization.deserialize(loads_yaml_node("A: 1\nB: 2\n"))
+    graph = Graph(converter.make_new_crdt_node_from_yaml(yaml_node, Timestamp(0), IdGenerator(0)))
+    new_item = converter.make_new_crdt_mapping_item_from_yaml(
+        serialization.deserialize(loads_yaml_node("A: 3\n")).items["A"], Timestamp(1), "2R", {}, IdGenerator(1))
+    graph.add_map_item(graph.root, new_item)
+
+    yaml_node_2 = converter.crdt_graph_to_yaml_node(graph)
+    item_a_1, item_b, item_a_2 = graph.root.items
+    assert list(yaml_node_2.items.keys()) == [("A", str(item_a_1.value.id)), "B", ("A", str(item_a_2.value.id))]
+    assert dumps_yaml_node(serialization.serialize(yaml_node_2)) == \
+           f"[A, '{item_a_1.value.id}']: 1\nB: 2\n[A, '{item_a_2.value.id}']: 3\n"
+
+
+def test_paths():
+    yaml_node = serialization.deserialize(loads_yaml_node("A: &a 1\nB: [x, {C: *a}]\n"))
+    graph = Graph(converter.make_new_crdt_node_from_yaml(yaml_node, Timestamp(0), IdGenerator(0)))
+    graph.root.items[1].value.items[0].value.is_deprecated = True
+
+    yaml_node_2 = converter.crdt_graph_to_yaml_node(graph)
+    item_b = yaml_node_2.items["B"]
+    assert (item_b.path, item_b.value.path) == (("B",), ("B", 1))
+    assert item_b.value.values[0].value.path == ("B", 1, 0)  # x is hidden
+    assert item_b.value.values[0].value.items["C"].value.path == ("B", 1, 0, "C", 1)
+    assert yaml_node_2.items["A"].value.path == ("A", 1)
@@ -0,0 +1,117 @@
+from yaml_diff_v3 import converter, crdt_graph, yaml_graph
+from yaml_diff_v3.crdt_graph import Timestamp, SessionId, UpdateId
+from yaml_diff_v3.crdt_graph.updates import EditScalarNode, DeleteListItem
+from yaml_diff_v3.service import Service
+from yaml_diff_v3.utils import my_dedent, dumps_yaml_node, get_tag
+
+
+class _CountingRenderer(converter.YamlTextRenderer):
+    def __init__(self):
+        super().__init__()
+        self.dumped_chunks = 0
+
+    def _dump(self, *args, **kwargs) -> str:
+        self.dumped_chunks += 1
+        return super()._dump(*args, **kwargs)
+
+
+def render_fully(graph: crdt_graph.Graph) -> str:
+    return dumps_yaml_node(yaml_graph.serialize(converter.crdt_graph_to_yaml_node(graph)))
+
+
+YAML_TEXT = my_dedent("""
+    # Pipeline
+    common: &common
+      image: python:3.10
+    stages:
+    - name: train    # the first stage
+      <<: *common
+      script:
+      - python train.py
+    - name: eval
+      script:
+      - python eval.py
+    - name: deploy
+      script: []
+    options:
+      a: 1
+      b: 2
+""")
+
+
+def test_same_text():
+    graph = Service().make_initial_crdt_graph(YAML_TEXT, Timestamp(0))
+    assert converter.YamlTextRenderer().render(graph) == render_fully(graph) == YAML_TEXT
+
+
+def test_only_changed_chunks_are_rendered():
+    graph = Service().make_initial_crdt_graph(YAML_TEXT, Timestamp(0))
+    renderer = _CountingRenderer()
+    renderer.render(graph)
+    # "common" and "stages" are one chunk because of the reference, items of "options" are rendered separately
+    assert renderer.dumped_chunks == 3
+
+    renderer.dumped_chunks = 0
+    assert renderer.render(graph) == YAML_TEXT
+    assert renderer.dumped_chunks == 0
+
+    options = graph.get_node_by_path(("options", 1))
+    value_b = options.items[1].value
+    crdt_graph.UpdatesApplier(set()).apply_updates(graph, [
+        EditScalarNode(SessionId("s"), Timestamp(1), UpdateId(1), node_id=value_b.id, new_yaml_tag=get_tag("int"),
+                       new_value="3"),
+    ])
+    assert renderer.render(graph) == render_fully(graph) == YAML_TEXT.replace("b: 2", "b: 3")
+    assert renderer.dumped_chunks == 1
+
+
+def test_split_list_items():
+    yaml_text = my_dedent("""
+        stages:
+        - name: train
+          script:
+          - python train.py
+        - name: eval    # comment
+        - name: deploy
+    """)
+    graph = Service().make_initial_crdt_graph(yaml_text, Timestamp(0))
+    renderer = _CountingRenderer()
+    assert renderer.render(graph) == yaml_text
+    assert renderer.dumped_chunks == 3
+
+    renderer.dumped_chunks = 0
+    stages = graph.get_node_by_path(("stages", 1))
+    crdt_graph.UpdatesApplier(set()).apply_updates(graph, [
+        DeleteListItem(SessionId("s"), Timestamp(1), UpdateId(1), item_id=stages.items[1].value.id),
+        EditScalarNode(SessionId("s"), Timestamp(1), UpdateId(2), node_id=stages.items[2].value.items[0].value.id,
+                       new_yaml_tag=get_tag("str"), new_value="release"),
+    ])
+    assert renderer.render(graph) == render_fully(graph) == my_dedent("""
+        stages:
+        - name: train
+          script:
+          - python train.py
+        - name: release
+    """)
+    assert renderer.dumped_chunks == 1
+
+
+def test_generated_anchors_in_different_chunks():
+    yaml_text = my_dedent("""
+        a: &id001
+          x: 1
+        b: *id001
+        c: &id002
+          y: 2
+        d: *id002
+    """)
+    graph = Service().make_initial_crdt_graph(yaml_text, Timestamp(0))
+    renderer = converter.YamlTextRenderer()
+    assert renderer.render(graph) == render_fully(graph) == yaml_text
+
+    c_value = graph.get_node_by_path(("c", 1)).items[0].value
+    crdt_graph.UpdatesApplier(set()).apply_updates(graph, [
+        EditScalarNode(SessionId("s"), Timestamp(1), UpdateId(1), node_id=c_value.id, new_yaml_tag=get_tag("int"),
+                       new_value="3"),
+    ])
+    assert renderer.render(graph) == render_fully(graph) == yaml_text.replace("y: 2", "y: 3")
@@ -0,0 +1,48 @@
+import bisect
+import random
+
+from yaml_diff_v3.converter.sort_keys import make_sort_key_between, make_session_tag
+from yaml_diff_v3.crdt_graph import SessionId
+
+
+def test_session_tag():
+    tag = make_session_tag(SessionId("session_1"))
+    assert tag == make_session_tag(SessionId("session_1"))
+    assert tag != make_session_tag(SessionId("session_2"))
+    assert len(tag) == 5 and tag.isalnum() and not tag.endswith("0")
+
+
+def test_keys_between_old_keys():
+    session_id = SessionId("s")
+    old_keys = ["10R", "10RL52f1b2c1-bd6d-4d35-8b1e-43b1a4e3f3f2R", "10Ra1e7d1b4-4a5b-45d2-9c0f-2c3d4e5f6a7bR", "11R",
+                "11R9f0d1c2b-4a5b-45d2-9c0f-2c3d4e5f6a7bR", "12R"]
+    assert old_keys == sorted(old_keys)
+    for left_key, right_key in zip([None] + old_keys, old_keys + [None]):
+        key = make_sort_key_between(left_key, right_key, session_id)
+        assert (left_key is None or left_key < key) and (right_key is None or key < right_key)
+        assert len(key) < 10
+
+
+def test_random_inserts():
+    rng = random.Random(0)
+    session_ids = [SessionId(f"session_{i}") for i in range(3)]
+    keys = [f"1{i}R" for i in range(10)]
+    for _ in range(2000):
+        index = rng.randint(0, len(keys))
+        left_key = keys[index - 1] if index > 0 else None
+        right_key = keys[index] if index < len(keys) else None
+        key = make_sort_key_between(left_key, right_key, rng.choice(session_ids))
+        bisect.insort(keys, key)
+        assert keys[index] == key
+    assert len(set(keys)) == len(keys)
+    assert max(map(len, keys)) < 30
+
+
+def test_concurrent_inserts():
+    left_key, right_key = "10R", "11R"
+    key_1 = make_sort_key_between(left_key, right_key, SessionId("session_1"))
+    key_2 = make_sort_key_between(left_key, right_key, SessionId("session_2"))
+    assert key_1 != key_2
+    assert left_key < min(key_1, key_2) < max(key_1, key_2) < right_key
+    key_3 = make_sort_key_between(min(key_1, key_2), max(key_1, key_2), SessionId("session_1"))
+    assert min(key_1, key_2) < key_3 < max(key_1, key_2)
@@ -1,8 +1,8 @@
 from yaml_diff_v3 import yaml_graph, utils, crdt_graph
 from yaml_diff_v3.converter import make_new_crdt_node_from_yaml, make_crdt_updates_from_yaml_updates
-from yaml_diff_v3.crdt_graph import Timestamp, SessionId, MappingNode
+from yaml_diff_v3.crdt_graph import Timestamp, SessionId, MappingNode, IdGenerator
 from yaml_diff_v3.crdt_graph.updates import DeleteMapItem, EditComment, EditScalarNode, EditMapItemSortKey, AddMapItem, \
-    AddListItem
+    AddListItem, EditListItemSortKey
 from yaml_diff_v3.utils import my_dedent
 
 
@@ -11,13 +11,14 @@ def make_crdt_updates(old_yaml_text: str, new_yaml_text: str):
     new_yaml_text = my_dedent(new_yaml_text)
 
     yaml_node = yaml_graph.deserialize(utils.loads_yaml_node(old_yaml_text))
-    crdt_node = make_new_crdt_node_from_yaml(yaml_node, Timestamp(0))
+    crdt_node = make_new_crdt_node_from_yaml(yaml_node, Timestamp(0), IdGenerator(0))
     graph = crdt_graph.Graph(root=crdt_node)
 
     old_yaml_node = yaml_graph.deserialize(utils.loads_yaml_node(old_yaml_text))
     new_yaml_node = yaml_graph.deserialize(utils.loads_yaml_node(new_yaml_text))
     yaml_updates = yaml_graph.build_updates(old_yaml_node, new_yaml_node)
-    return graph, make_crdt_updates_from_yaml_updates(yaml_updates, SessionId("session_1"), Timestamp(1), graph)
+    return graph, make_crdt_updates_from_yaml_updates(yaml_updates, SessionId("session_1"), Timestamp(1), graph,
+                                                      IdGenerator(1))
 
 
 def test_convert_del_map():
@@ -69,7 +70,7 @@ def test_add_map_items_with_order():
     assert len(updates) == 3
 
     assert isinstance(updates[0], EditMapItemSortKey)  # either A or C was moved
-    is_a_moved = graph.get_node(updates[0].item_id).yaml_path == ("A",)
+    is_a_moved = graph.get_node(updates[0].item_id).key.value == "A"
     if is_a_moved:
         a_sort_key = updates[0].new_sort_key
         c_sort_key = graph.get_path_to_node_mapping()[("C",)].sort_key
@@ -78,11 +79,11 @@ def test_add_map_items_with_order():
         c_sort_key = updates[0].new_sort_key
 
     assert isinstance(updates[1], AddMapItem)
-    assert updates[1].new_item.yaml_path == ("B",)
+    assert updates[1].new_item.key.value == "B"
     b_sort_key = updates[1].new_item.sort_key
 
     assert isinstance(updates[2], AddMapItem)
-    assert updates[2].new_item.yaml_path == ("X",)
+    assert updates[2].new_item.key.value == "X"
     x_sort_key = updates[2].new_item.sort_key
 
     assert c_sort_key < b_sort_key
@@ -130,3 +131,19 @@ def test_add_and_edit_list_item():
 
     assert isinstance(upd_1, EditScalarNode)
     assert upd_1.new_value == "2"
+
+
+def test_edit_list_order():
+    old_values = [str(i) for i in range(20)]
+    new_values = ["5", "0", "1", "19", "2", "3", "4", "18", "6", "10", "8", "9", "7", "11", "12", "13", "14", "15",
+                  "16", "17"]
+    graph, updates = make_crdt_updates(
+        "".join(f"- {value}\n" for value in old_values),
+        "".join(f"- {value}\n" for value in new_values),
+    )
+
+    # The longest chain of items which kept their relative order is 0, 1, 2, 3, 4, 6, 8, 9, 11, ..., 17
+    assert len(updates) == 5
+    assert all(isinstance(update, EditListItemSortKey) for update in updates)
+    crdt_graph.UpdatesApplier(set()).apply_updates(graph, updates)
+    assert [item.value.value for item in graph.root.items] == new_values
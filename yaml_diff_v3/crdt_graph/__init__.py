@@ -1,7 +1,16 @@
 from .graph import Graph
+from .ids import IdGenerator, from_string_id, convert_string_ids, convert_update_string_ids
 from .nodes import Node, ScalarNode, MappingNode, SequenceNode, ReferenceNode, Timestamp, NodeId
+from .columns import DecodeError
+from .snapshot import SnapshotError, dumps_snapshot, loads_snapshot, dump_snapshot, load_snapshot
+from .store import GraphStore
+from .update_log import UpdateLog, read_update_log
 from .updates import Update, SessionId, UpdateId
 from .updates_applier import UpdatesApplier
+from .wire import encode_updates, decode_updates
 
 __all__ = ["Graph", "UpdatesApplier", "Node", "ScalarNode", "MappingNode", "SequenceNode", "ReferenceNode",
-           "Update", "SessionId", "UpdateId", "NodeId", "Timestamp"]
+           "Update", "SessionId", "UpdateId", "NodeId", "Timestamp",
+           "SnapshotError", "dumps_snapshot", "loads_snapshot", "dump_snapshot", "load_snapshot",
+           "UpdateLog", "read_update_log", "GraphStore", "DecodeError", "encode_updates", "decode_updates",
+           "IdGenerator", "from_string_id", "convert_string_ids", "convert_update_string_ids"]
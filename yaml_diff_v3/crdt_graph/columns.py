@@ -0,0 +1,354 @@
+"""Columnar binary encoding of CRDT graph elements, shared by graph snapshots and the wire encoding of updates.
+
+Encoded data is a magic, a format version (1 byte) and a list of columns, each prefixed with its varint length.
+Subtrees of elements (nodes and items) are written as a table in pre-order, one kind byte per element. Children are
+not referenced explicitly: a collection stores the number of its items, an item is followed by its key and value.
+All other fields are stored column by column, only for the elements which have them. Strings (tags, keys, values,
+sort keys) are interned in a string table, comments are interned too. Yaml paths are not stored, they are derived
+from the tree. Integer columns are arrays of the narrowest fixed-width type which fits all values, timestamps are
+zigzag varints. Fixed-width columns are read with array.frombytes, so decoding is bound by creation of the node objects
+"""
+import array
+import contextlib
+import gc
+import itertools
+import sys
+
+from yaml_diff_v3.crdt_graph.nodes import ScalarNode, MappingNode, SequenceNode, ReferenceNode
+from yaml_diff_v3.yaml_graph.nodes import Comment
+
+# Kinds of elements
+_SCALAR, _MAPPING, _SEQUENCE, _REFERENCE, _MAPPING_ITEM, _SEQUENCE_ITEM = range(6)
+# Kinds of comment values
+_NO_TOKEN, _TOKEN, _TOKENS = range(3)
+
+FIXED, VARINT, BLOB = range(3)
+ELEMENT_COLUMNS = (
+    # string table
+    ("text_lengths", FIXED),
+    ("texts", BLOB),
+    # comment table
+    ("comment_sizes", FIXED),
+    ("comment_value_kinds", FIXED),
+    ("comment_token_values", FIXED),
+    ("comment_token_columns", FIXED),  # columns of tokens and sizes of token tuples
+    # elements
+    ("kinds", FIXED),
+    ("ids", FIXED),
+    ("tags", FIXED),
+    ("anchors", FIXED),  # 0 is None, otherwise string index + 1
+    ("comments", FIXED),  # 0 is None, otherwise comment index + 1
+    ("deprecated", FIXED),
+    ("edit_timestamps", VARINT),
+    ("comment_edit_timestamps", VARINT),
+    ("scalar_values", FIXED),
+    ("item_counts", FIXED),
+    ("sort_keys", FIXED),
+    ("sort_key_timestamps", VARINT),
+    ("referred_ids", FIXED),
+)
+# Columns of string indices. While writing, they hold the strings themselves, indices are assigned at the end
+ELEMENT_STRING_COLUMNS = ("comment_token_values", "tags", "anchors", "scalar_values", "sort_keys")
+
+
+class DecodeError(ValueError):
+    pass
+
+
+def _encode_varint(value: int, out: bytearray) -> None:
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varints(data: bytes) -> list[int]:
+    if not data or max(data) < 0x80:  # usual case: all timestamps are small
+        return list(data)
+    result = []
+    value = shift = 0
+    for byte in data:
+        if byte & 0x80:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+        else:
+            result.append(value | byte << shift)
+            value = shift = 0
+    if shift:
+        raise DecodeError("Truncated varint")
+    return result
+
+
+_FIXED_TYPECODES = {typecode: array.array(typecode).itemsize for typecode in "BHIQ"}
+
+
+def _encode_fixed(values: list[int]) -> bytes:
+    if not values:
+        return b"B"
+    max_value = max(values)
+    for typecode, itemsize in _FIXED_TYPECODES.items():
+        if max_value < 1 << 8 * itemsize:
+            column = array.array(typecode, values)
+            if sys.byteorder != "little":
+                column.byteswap()
+            return typecode.encode() + column.tobytes()
+    raise ValueError("Value is too large")
+
+
+def _decode_fixed(data: bytes) -> list[int]:
+    typecode = chr(data[0]) if data else ""
+    if typecode not in _FIXED_TYPECODES or (len(data) - 1) % _FIXED_TYPECODES[typecode]:
+        raise DecodeError("Malformed column")
+    if len(data) == 1:
+        return []
+    column = array.array(typecode)
+    column.frombytes(data[1:])
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column.tolist()
+
+
+def zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag_all(values: list[int]) -> list[int]:
+    return [value >> 1 ^ -(value & 1) for value in values]
+
+
+@contextlib.contextmanager
+def paused_gc():
+    """Decoding creates hundreds of thousands of objects, which triggers the cyclic garbage collector many times, and
+    each run traverses all of them. Nothing is garbage there, so the collector is paused: it halves the decoding time"""
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+class TableWriter:
+    def __init__(self, columns=ELEMENT_COLUMNS, string_columns=ELEMENT_STRING_COLUMNS):
+        """columns are ELEMENT_COLUMNS, possibly followed by columns of the caller, which fills them itself"""
+        self._column_types = columns
+        self._string_columns = string_columns
+        self.columns: dict[str, list] = {name: [] for name, _ in columns}
+        self._comments: dict[Comment, int] = {}
+
+    def _token(self, token: Comment.Token) -> None:
+        self.columns["comment_token_values"].append(token.value)
+        self.columns["comment_token_columns"].append(token.column)
+
+    def comment(self, comment: None | Comment) -> int:
+        """0 for None, otherwise index of the comment + 1"""
+        if comment is None:
+            return 0
+        if comment not in self._comments:
+            columns = self.columns
+            columns["comment_sizes"].append(len(comment.values))
+            for value in comment.values:
+                if value is None:
+                    columns["comment_value_kinds"].append(_NO_TOKEN)
+                elif isinstance(value, Comment.Token):
+                    columns["comment_value_kinds"].append(_TOKEN)
+                    self._token(value)
+                else:
+                    columns["comment_value_kinds"].append(_TOKENS)
+                    columns["comment_token_columns"].append(len(value))
+                    for token in value:
+                        self._token(token)
+            self._comments[comment] = len(self._comments)
+        return self._comments[comment] + 1
+
+    def _element(self, element) -> None:
+        columns = self.columns
+        columns["ids"].append(element.id)
+        if isinstance(element, (MappingNode.Item, SequenceNode.Item)):
+            columns["kinds"].append(_MAPPING_ITEM if isinstance(element, MappingNode.Item) else _SEQUENCE_ITEM)
+            columns["sort_keys"].append(element.sort_key)
+            columns["sort_key_timestamps"].append(zigzag(element.last_timestamp_sort_key_edited))
+            return
+
+        columns["deprecated"].append(int(element.is_deprecated))
+        if isinstance(element, ReferenceNode):
+            columns["kinds"].append(_REFERENCE)
+            columns["referred_ids"].append(element.referred_id)
+            return
+
+        columns["tags"].append(element.yaml_tag)
+        columns["anchors"].append(element.anchor)
+        columns["comments"].append(self.comment(element.comment))
+        columns["edit_timestamps"].append(zigzag(element.last_edit_ts))
+        columns["comment_edit_timestamps"].append(zigzag(element.last_comment_edit_ts))
+        if isinstance(element, ScalarNode):
+            columns["kinds"].append(_SCALAR)
+            columns["scalar_values"].append(element.value)
+        else:
+            columns["kinds"].append(_MAPPING if isinstance(element, MappingNode) else _SEQUENCE)
+            columns["item_counts"].append(len(element.items))
+
+    def subtree(self, root) -> None:
+        """Writes the node or item with all its descendants. read_subtrees returns the roots in the order of writing"""
+        stack = [root]
+        while stack:
+            element = stack.pop()
+            self._element(element)
+            stack.extend(reversed(element.get_all_children()))
+
+    def _write_strings(self) -> None:
+        columns = self.columns
+        strings = dict.fromkeys(itertools.chain.from_iterable(columns[name] for name in self._string_columns))
+        strings.pop(None, None)  # no anchor
+        indices = {value: i for i, value in enumerate(strings)}
+        for name in self._string_columns:
+            if name == "anchors":
+                columns[name] = [0 if value is None else indices[value] + 1 for value in columns[name]]
+            else:
+                columns[name] = [indices[value] for value in columns[name]]
+        columns["text_lengths"] = [len(value) for value in strings]
+        columns["texts"] = "".join(strings).encode()
+
+    def to_bytes(self, magic: bytes, version: int) -> bytes:
+        self._write_strings()
+        columns = self.columns
+        result = bytearray(magic)
+        result.append(version)
+        for name, column_type in self._column_types:
+            if column_type == FIXED:
+                data = _encode_fixed(columns[name])
+            elif column_type == VARINT:
+                data = bytearray()
+                for value in columns[name]:
+                    _encode_varint(value, data)
+            else:
+                data = columns[name]
+            _encode_varint(len(data), result)
+            result += data
+        return bytes(result)
+
+
+def read_columns(data: bytes, magic: bytes, version: int, column_types=ELEMENT_COLUMNS) -> dict[str, list | bytes]:
+    if data[:len(magic)] != magic:
+        raise DecodeError(f"Expected magic {magic!r}")
+    if len(data) <= len(magic) or data[len(magic)] != version:
+        raise DecodeError(f"Unsupported format version, expected {version}")
+    columns = {}
+    position = len(magic) + 1
+    for name, column_type in column_types:
+        length = shift = 0
+        while True:
+            if position >= len(data):
+                raise DecodeError("Truncated data")
+            byte = data[position]
+            position += 1
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        if position + length > len(data):
+            raise DecodeError("Truncated data")
+        chunk = data[position:position + length]
+        position += length
+        if column_type == FIXED:
+            columns[name] = _decode_fixed(chunk)
+        elif column_type == VARINT:
+            columns[name] = _decode_varints(chunk)
+        else:
+            columns[name] = chunk
+    if position != len(data):
+        raise DecodeError("Unexpected data at the end")
+    return columns
+
+
+def read_strings(columns) -> list[str]:
+    texts = columns["texts"].decode()
+    ends = list(itertools.accumulate(columns["text_lengths"]))
+    return [texts[end - length:end] for end, length in zip(ends, columns["text_lengths"])]
+
+
+def read_comments(columns, strings: list[str]) -> list[None | Comment]:
+    """Comments by the indices written by TableWriter.comment"""
+    comments: list[None | Comment] = [None]
+    kinds = iter(columns["comment_value_kinds"])
+    token_values = iter(columns["comment_token_values"])
+    token_columns = iter(columns["comment_token_columns"])
+
+    def read_token() -> Comment.Token:
+        return Comment.Token(strings[next(token_values)], next(token_columns))
+
+    for size in columns["comment_sizes"]:
+        values: list[None | Comment.Token | tuple[Comment.Token, ...]] = []
+        for _ in range(size):
+            kind = next(kinds)
+            if kind == _NO_TOKEN:
+                values.append(None)
+            elif kind == _TOKEN:
+                values.append(read_token())
+            else:
+                values.append(tuple(read_token() for _ in range(next(token_columns))))
+        comments.append(Comment(tuple(values)))
+    return comments
+
+
+def read_subtrees(columns, strings: list[str], comments: list[None | Comment]) -> list:
+    """Roots of the subtrees written by TableWriter.subtree. Raises IndexError if the columns are inconsistent"""
+    # Indices are resolved column by column, it is much faster than one by one
+    kinds = columns["kinds"]
+    if kinds and max(kinds) > _SEQUENCE_ITEM:
+        raise DecodeError("Unknown element kind")
+    ids = columns["ids"]
+    deprecated = [bool(value) for value in columns["deprecated"]]
+    tags = [strings[i] for i in columns["tags"]]
+    anchors = [None if i == 0 else strings[i - 1] for i in columns["anchors"]]
+    node_comments = [comments[i] for i in columns["comments"]]
+    edit_timestamps = unzigzag_all(columns["edit_timestamps"])
+    comment_edit_timestamps = unzigzag_all(columns["comment_edit_timestamps"])
+    scalar_values = [strings[i] for i in columns["scalar_values"]]
+    item_counts = columns["item_counts"]
+    sort_keys = [strings[i] for i in columns["sort_keys"]]
+    sort_key_timestamps = unzigzag_all(columns["sort_key_timestamps"])
+    referred_ids = columns["referred_ids"]
+
+    # Elements are created in reverse pre-order: children before their parents. Created elements wait for their
+    # parent on the stack. Fields of each kind are taken from the ends of their columns
+    node_i, base_i, scalar_i = len(deprecated), len(tags), len(scalar_values)
+    collection_i, item_i, reference_i = len(item_counts), len(sort_keys), len(referred_ids)
+    stack: list = []
+    for i in range(len(kinds) - 1, -1, -1):
+        kind = kinds[i]
+        if kind == _MAPPING_ITEM:
+            item_i -= 1
+            key = stack.pop()
+            stack.append(MappingNode.Item(ids[i], key, stack.pop(), sort_keys[item_i],
+                                          sort_key_timestamps[item_i]))
+        elif kind == _SEQUENCE_ITEM:
+            item_i -= 1
+            stack.append(SequenceNode.Item(ids[i], stack.pop(), sort_keys[item_i], sort_key_timestamps[item_i]))
+        elif kind == _REFERENCE:
+            node_i -= 1
+            reference_i -= 1
+            stack.append(ReferenceNode(ids[i], referred_ids[reference_i], deprecated[node_i]))
+        else:
+            node_i -= 1
+            base_i -= 1
+            # the order of the fields of _NodeBase
+            fields = (ids[i], tags[base_i], anchors[base_i], edit_timestamps[base_i],
+                      deprecated[node_i], node_comments[base_i], comment_edit_timestamps[base_i])
+            if kind == _SCALAR:
+                scalar_i -= 1
+                stack.append(ScalarNode(*fields, scalar_values[scalar_i]))
+            else:
+                collection_i -= 1
+                start = len(stack) - item_counts[collection_i]
+                if start < 0:
+                    raise DecodeError("Inconsistent element table")
+                items = stack[start:]
+                del stack[start:]
+                items.reverse()
+                stack.append(MappingNode(*fields, items) if kind == _MAPPING else SequenceNode(*fields, items))
+    if any((node_i, base_i, scalar_i, collection_i, item_i, reference_i)):
+        raise DecodeError("Inconsistent element table")
+    stack.reverse()
+    return stack
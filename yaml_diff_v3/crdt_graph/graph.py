@@ -1,35 +1,175 @@
+import bisect
+
 from yaml_diff_v3 import yaml_graph
+from yaml_diff_v3.crdt_graph.ids import get_counter
 from yaml_diff_v3.crdt_graph.nodes import Node, NodeId, MappingNode, SequenceNode
+from yaml_diff_v3.crdt_graph.updates import SessionId
+
+GraphElement = Node | MappingNode.Item | SequenceNode.Item
+
+
+def _get_sort_key(item: MappingNode.Item | SequenceNode.Item) -> str:
+    return item.sort_key
 
 
 class Graph:
     def __init__(self, root: Node):
         self.root = root
+        # Both indices are maintained incrementally, so every subtree attached to the graph must go through
+        # add_map_item / add_list_item
+        self._nodes: dict[NodeId, GraphElement] = {}  # id -> node or item
+        self._parents: dict[NodeId, GraphElement] = {}  # id -> node or item which holds it. Root has no parent
+        self._max_id_counter = 0  # see ids.py
+        self._session_indices: dict[SessionId, int] = {}  # see ids.py. Index 0 is for the nodes of initial graphs
+        self._max_session_index = 0
+        self._index_subtree(root, parent=None)
+
+        # Path index. It is filled lazily: node id -> path key of its visible child -> child.
+        # An entry is dropped when the visible children or their path keys change (see _invalidate_children_paths).
+        # Entries of other nodes stay valid because they store path keys, not full paths
+        self._children_by_path_key: dict[NodeId, dict[yaml_graph.NodePathKey, GraphElement]] = {}
+        self._path_keys: dict[NodeId, yaml_graph.NodePathKey] = {}  # child id -> key in _children_by_path_key
+
+        # id -> number of changes made in the subtree of the node or item. Lets readers (e.g. a renderer) cache
+        # anything computed for a subtree and find out which subtrees are dirty. Unchanged elements are not stored
+        self._versions: dict[NodeId, int] = {}
+
+    def _index_subtree(self, subtree_root: GraphElement, parent: None | GraphElement) -> None:
+        stack = [(subtree_root, parent)]
+        max_id_counter = self._max_id_counter
+        while stack:
+            node, parent = stack.pop()
+            assert node.id not in self._nodes, f"Node id {node.id} is not unique"
+            self._nodes[node.id] = node
+            if parent is not None:
+                self._parents[node.id] = parent
+            max_id_counter = max(max_id_counter, get_counter(node.id))
+            stack.extend((child, node) for child in node.get_all_children())
+        self._max_id_counter = max_id_counter
+
+    def get_max_id_counter(self) -> int:
+        """The largest counter of the ids of nodes and items ever attached to the graph and of applied updates"""
+        return self._max_id_counter
+
+    def observe_id_counter(self, counter: int) -> None:
+        self._max_id_counter = max(self._max_id_counter, counter)
+
+    def get_session_index(self, session_id: SessionId) -> int:
+        """Index of the ids made by the session. A new session gets the index after the largest one ever seen"""
+        if session_id not in self._session_indices:
+            self.observe_session_index(session_id, self._max_session_index + 1)
+        return self._session_indices[session_id]
+
+    def get_session_indices(self) -> dict[SessionId, int]:
+        return self._session_indices
+
+    def observe_session_index(self, session_id: SessionId, session_index: int) -> None:
+        self._session_indices.setdefault(session_id, session_index)
+        self._max_session_index = max(self._max_session_index, session_index)
+
+    def _invalidate_children_paths(self, node: GraphElement) -> None:
+        children = self._children_by_path_key.pop(node.id, None)
+        if children is None:
+            return
+        for child in children.values():
+            del self._path_keys[child.id]
+
+    def mark_changed(self, element: GraphElement) -> None:
+        """Must be called after any modification of a node or an item. Methods of Graph call it themselves"""
+        while element is not None:
+            self._versions[element.id] = self._versions.get(element.id, 0) + 1
+            element = self._parents.get(element.id)
+
+    def get_version(self, element_id: NodeId) -> int:
+        return self._versions.get(element_id, 0)
+
+    def _get_path_parent(self, node: GraphElement) -> GraphElement:
+        parent = self._parents[node.id]
+        if isinstance(parent, SequenceNode.Item):  # list items are not a part of a path
+            parent = self._parents[parent.id]
+        return parent
+
+    def get_children_by_path_key(self, node: GraphElement) -> dict[yaml_graph.NodePathKey, GraphElement]:
+        if node.id not in self._children_by_path_key:
+            children = dict(node.get_children_with_path())
+            for path_key, child in children.items():
+                self._path_keys[child.id] = path_key
+            self._children_by_path_key[node.id] = children
+        return self._children_by_path_key[node.id]
+
+    def get_node_by_path(self, path: yaml_graph.NodePath) -> Node | MappingNode.Item:
+        node = self.root
+        for path_key in path:
+            node = self.get_children_by_path_key(node)[path_key]
+        return node
+
+    def get_node_path(self, node_id: NodeId) -> None | yaml_graph.NodePath:
+        """Returns None if the node is hidden or is inside a hidden subtree"""
+        reversed_path = []
+        node = self._nodes[node_id]
+        assert not isinstance(node, SequenceNode.Item), "List items do not have a path, use item.value"
+        while node is not self.root:
+            self.get_children_by_path_key(self._get_path_parent(node))
+            if node.id not in self._path_keys:
+                return None
+            reversed_path.append(self._path_keys[node.id])
+            node = self._get_path_parent(node)
+        return tuple(reversed(reversed_path))
 
     def get_path_to_node_mapping(self) -> dict[yaml_graph.NodePath, Node | MappingNode.Item]:
         def dfs(node: Node, path):
-            if not isinstance(node, (MappingNode.Item, SequenceNode.Item)):  # they do not store it
-                node.yaml_path = path
             yield path, node
-            for path_key, child in node.get_children_with_path():
+            for path_key, child in self.get_children_by_path_key(node).items():
                 yield from dfs(child, path + (path_key,))
 
         return {path: node for path, node in dfs(self.root, ())}
 
-    def get_node(self, node_id: NodeId) -> Node | MappingNode.Item:
-        def dfs(node: Node):
-            yield node
-            for child in node.get_all_children():
-                yield from dfs(child)
+    def get_node(self, node_id: NodeId) -> GraphElement:
+        return self._nodes[node_id]
 
-        [node] = [node for node in dfs(self.root) if node.id == node_id]
-        return node
+    def get_all_nodes(self) -> list[GraphElement]:
+        return list(self._nodes.values())
+
+    def get_parent(self, node_id: NodeId) -> None | GraphElement:
+        """Returns an item for item.value and item.key, a collection node for an item and None for the root"""
+        return self._parents.get(node_id)
+
+    # Items of mappings and lists are always sorted by sort_key, so readers never need to sort them.
+    # Position is found by binary search (inserting into a Python list still moves the tail with memmove)
+
+    @staticmethod
+    def _insert_item(collection: MappingNode | SequenceNode, item: MappingNode.Item | SequenceNode.Item) -> None:
+        bisect.insort_right(collection.items, item, key=_get_sort_key)
+
+    @staticmethod
+    def _remove_item(collection: MappingNode | SequenceNode, item: MappingNode.Item | SequenceNode.Item) -> None:
+        idx = bisect.bisect_left(collection.items, item.sort_key, key=_get_sort_key)
+        while collection.items[idx] is not item:  # several items may have the same sort key
+            idx += 1
+        del collection.items[idx]
+
+    def add_map_item(self, map_node: MappingNode, item: MappingNode.Item) -> None:
+        self._insert_item(map_node, item)
+        self._index_subtree(item, parent=map_node)
+        self._invalidate_children_paths(map_node)  # new key may duplicate an existing one
+        self.mark_changed(map_node)
+
+    def add_list_item(self, list_node: SequenceNode, item: SequenceNode.Item) -> None:
+        self._insert_item(list_node, item)
+        self._index_subtree(item, parent=list_node)
+        self._invalidate_children_paths(list_node)
+        self.mark_changed(list_node)
+
+    def deprecate_item_value(self, item_value: Node) -> None:
+        item_value.is_deprecated = True
+        item = self._parents[item_value.id]
+        self._invalidate_children_paths(self._parents[item.id])  # the collection which holds the item
+        self.mark_changed(item_value)
 
-    # def get_parent(self, node_id: NodeId) -> Node | MappingNode.Item | SequenceNode.Item:
-    #     def dfs(node: Node, parent):
-    #         yield node, parent
-    #         for child in node.get_all_children():
-    #             yield from dfs(child, node)
-    #
-    #     [(node, parent)] = [(node, parent) for node, parent in dfs(self.root, None) if node.id == node_id]
-    #     return node
+    def set_item_sort_key(self, item: MappingNode.Item | SequenceNode.Item, sort_key: str) -> None:
+        collection = self._parents[item.id]
+        self._remove_item(collection, item)
+        item.sort_key = sort_key
+        self._insert_item(collection, item)
+        self._invalidate_children_paths(collection)
+        self.mark_changed(collection)
@@ -0,0 +1,97 @@
+"""Integer ids of nodes, items and updates.
+
+An id is (session_index << COUNTER_BITS) | counter, it fits into a signed 64-bit integer. Each session has its own
+index, so ids made by different sessions don't collide. Indices are allocated by the graph the session edits
+(Graph.get_session_index): a new session gets the index after the largest one the graph has seen. The graph keeps
+the indices in its snapshots and learns them from applied updates, so a session gets the same index in every service
+instance and after a restart. Sessions must get their indices from the same replica of the graph, e.g. the graph of
+GraphStore. Counters are Lamport clocks: a generator never issues a counter which is not greater than the counters it
+has observed, e.g. the largest counter of the graph it edits (Graph.get_max_id_counter), so ids stay unique when
+a session edits again after a restart.
+
+Ids of older graphs and clients are uuid strings. from_string_id maps them to integers with LEGACY_FLAG set, which
+never collide with generated ids. The mapping doesn't need any state, so every replica converts a string id the same
+way: a graph and the updates for it can be converted independently
+"""
+import hashlib
+
+from yaml_diff_v3.crdt_graph.nodes import NodeId, ReferenceNode
+from yaml_diff_v3.crdt_graph.updates import UpdateId, Update, AddMapItem, AddListItem
+
+COUNTER_BITS = 40
+SESSION_INDEX_BITS = 22
+LEGACY_FLAG = 1 << COUNTER_BITS + SESSION_INDEX_BITS
+_COUNTER_MASK = (1 << COUNTER_BITS) - 1
+
+
+def make_id(session_index: int, counter: int) -> int:
+    if not 0 <= session_index < 1 << SESSION_INDEX_BITS:
+        raise ValueError(f"Session index {session_index} is out of range")
+    if not 0 <= counter <= _COUNTER_MASK:
+        raise OverflowError(f"Id counter {counter} is out of range")
+    return session_index << COUNTER_BITS | counter
+
+
+def split_id(value: int) -> tuple[int, int]:
+    """(session index, counter) of a generated id"""
+    if value >= LEGACY_FLAG:
+        raise ValueError(f"{value} is a converted string id")
+    return value >> COUNTER_BITS, value & _COUNTER_MASK
+
+
+def get_counter(value: int) -> int:
+    """Counter of a generated id, 0 for a converted string id"""
+    return 0 if value >= LEGACY_FLAG else value & _COUNTER_MASK
+
+
+def from_string_id(value: str) -> int:
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return LEGACY_FLAG | int.from_bytes(digest, "little") & LEGACY_FLAG - 1
+
+
+def get_session_index_of_id(value: int) -> None | int:
+    """Session index of a generated id, None for a converted string id"""
+    return None if value >= LEGACY_FLAG else value >> COUNTER_BITS
+
+
+class IdGenerator:
+    def __init__(self, session_index: int, last_counter: int = 0):
+        make_id(session_index, last_counter)  # checks the ranges
+        self.session_index = session_index
+        self.last_counter = last_counter
+
+    def observe(self, counter: int) -> None:
+        """Makes the next ids greater than the counter"""
+        self.last_counter = max(self.last_counter, counter)
+
+    def _next(self) -> int:
+        self.last_counter += 1
+        return make_id(self.session_index, self.last_counter)
+
+    def node_id(self) -> NodeId:
+        return NodeId(self._next())
+
+    def update_id(self) -> UpdateId:
+        return UpdateId(self._next())
+
+
+def convert_string_ids(root) -> None:
+    """Replaces string ids of the node or item and all its descendants with from_string_id of them, in place"""
+    stack = [root]
+    while stack:
+        element = stack.pop()
+        if isinstance(element.id, str):
+            element.id = NodeId(from_string_id(element.id))
+        if isinstance(element, ReferenceNode) and isinstance(element.referred_id, str):
+            element.referred_id = NodeId(from_string_id(element.referred_id))
+        stack.extend(element.get_all_children())
+
+
+def convert_update_string_ids(update: Update) -> None:
+    """Replaces string ids in the update with from_string_id of them, in place"""
+    for name, value in vars(update).items():
+        if name != "session_id" and name.endswith("_id") and isinstance(value, str):
+            setattr(update, name, from_string_id(value))
+    if isinstance(update, (AddMapItem, AddListItem)):
+        convert_string_ids(update.new_item)
+
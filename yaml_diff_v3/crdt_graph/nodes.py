@@ -4,20 +4,21 @@ from collections import Counter
 from dataclasses import dataclass
 from typing import NewType
 
-from yaml_diff_v3 import yaml_graph
 from yaml_diff_v3.yaml_graph.nodes import Comment, NodePathKey
 
-NodeId = NewType("NodeId", str)
+NodeId = NewType("NodeId", int)  # see ids.py
 Timestamp = NewType("Timestamp", int)
 
 
-@dataclass
+# Graphs have hundreds of thousands of nodes, so all classes are slotted. Yaml paths are not stored in the nodes,
+# see Graph.get_node_path
+
+@dataclass(slots=True)
 class _NodeBase(abc.ABC):
     id: NodeId  # globally unique
     yaml_tag: str
     anchor: None | str
     # TODO: add list of nodes which reference this node
-    yaml_path: yaml_graph.NodePath  # TODO: do not store it in the Node
     last_edit_ts: Timestamp
     is_deprecated: bool
     comment: None | Comment
@@ -35,7 +36,7 @@ class _NodeBase(abc.ABC):
     def get_all_children(self) -> list["Node"]: ...
 
 
-@dataclass
+@dataclass(slots=True)
 class ScalarNode(_NodeBase):
     value: str
 
@@ -46,9 +47,9 @@ class ScalarNode(_NodeBase):
         return []
 
 
-@dataclass
+@dataclass(slots=True)
 class MappingNode(_NodeBase):
-    @dataclass
+    @dataclass(slots=True)
     class Item:
         id: NodeId
         key: ScalarNode
@@ -57,17 +58,13 @@ class MappingNode(_NodeBase):
         sort_key: str
         last_timestamp_sort_key_edited: Timestamp
 
-        @property
-        def yaml_path(self) -> yaml_graph.NodePath:
-            return self.value.yaml_path[:-1]  # TODO: make it more correct
-
         def get_all_children(self) -> list["Node"]:
             return [self.key, self.value]
 
         def get_children_with_path(self) -> list[tuple[NodePathKey, "Node"]]:
             return [(0, self.key), (1, self.value)]
 
-    items: list[Item]
+    items: list[Item]  # sorted by sort_key
 
     def get_all_children(self):
         return self.items
@@ -90,9 +87,9 @@ class MappingNode(_NodeBase):
         return result
 
 
-@dataclass
+@dataclass(slots=True)
 class SequenceNode(_NodeBase):
-    @dataclass
+    @dataclass(slots=True)
     class Item:
         id: NodeId
         value: "Node"
@@ -102,23 +99,21 @@ class SequenceNode(_NodeBase):
         def get_all_children(self):
             return [self.value]
 
-    items: list[Item]
+    items: list[Item]  # sorted by sort_key
 
     def get_all_children(self) -> list["Node"]:
         return self.items
 
     def get_children_with_path(self) -> list[tuple[NodePathKey, "Node"]]:
-        items = sorted(self.items, key=lambda item: item.sort_key)
-        values = [item.value for item in items if not item.value.is_hidden]
+        values = [item.value for item in self.items if not item.value.is_hidden]
         return list(enumerate(values))
 
 
-@dataclass
+@dataclass(slots=True)
 class ReferenceNode:
     id: NodeId
     referred_id: NodeId
     is_deprecated: bool
-    yaml_path: yaml_graph.NodePath  # TODO: do not store it in the Node
 
     @property
     def is_hidden(self) -> bool:
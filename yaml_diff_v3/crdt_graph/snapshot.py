@@ -0,0 +1,63 @@
+"""Binary snapshots of a CRDT graph.
+
+A snapshot keeps everything the graph consists of: ids, tombstones, timestamps, sort keys and comments.
+Version 4 layout:
+
+    magic "YDCG", format version (1 byte), then columns.ELEMENT_COLUMNS with the tree of the root,
+    the largest id counter of the graph and the session ids with their indices (see ids.py)
+
+See columns.py for the encoding of the columns
+"""
+from yaml_diff_v3.crdt_graph import columns as cols
+from yaml_diff_v3.crdt_graph.graph import Graph
+
+_MAGIC = b"YDCG"
+_VERSION = 4  # 1 had uuid string ids, 2 had yaml paths of the nodes, 3 had no session indices
+_COLUMNS = cols.ELEMENT_COLUMNS + (
+    ("max_id_counter", cols.VARINT),
+    ("session_ids", cols.FIXED),
+    ("session_indices", cols.FIXED),
+)
+_STRING_COLUMNS = cols.ELEMENT_STRING_COLUMNS + ("session_ids",)
+
+SnapshotError = cols.DecodeError
+
+
+def dumps_snapshot(graph: Graph) -> bytes:
+    writer = cols.TableWriter(_COLUMNS, _STRING_COLUMNS)
+    writer.subtree(graph.root)
+    writer.columns["max_id_counter"].append(graph.get_max_id_counter())
+    session_indices = graph.get_session_indices()
+    writer.columns["session_ids"] = list(session_indices.keys())
+    writer.columns["session_indices"] = list(session_indices.values())
+    return writer.to_bytes(_MAGIC, _VERSION)
+
+
+def loads_snapshot(data: bytes) -> Graph:
+    with cols.paused_gc():
+        columns = cols.read_columns(data, _MAGIC, _VERSION, _COLUMNS)
+        try:
+            strings = cols.read_strings(columns)
+            roots = cols.read_subtrees(columns, strings, cols.read_comments(columns, strings))
+            session_indices = [(strings[i], session_index) for i, session_index in
+                               zip(columns["session_ids"], columns["session_indices"], strict=True)]
+        # a column is shorter than the others refer to, or session columns have different lengths (zip strict)
+        except (IndexError, StopIteration, UnicodeDecodeError, ValueError) as e:
+            raise SnapshotError("Inconsistent snapshot") from e
+        if len(roots) != 1 or len(columns["max_id_counter"]) != 1:
+            raise SnapshotError("Inconsistent snapshot")
+        graph = Graph(root=roots[0])
+        graph.observe_id_counter(columns["max_id_counter"][0])  # counters of applied updates
+        for session_id, session_index in session_indices:
+            graph.observe_session_index(session_id, session_index)
+        return graph
+
+
+def dump_snapshot(graph: Graph, path: str) -> None:
+    with open(path, "wb") as f:
+        f.write(dumps_snapshot(graph))
+
+
+def load_snapshot(path: str) -> Graph:
+    with open(path, "rb") as f:
+        return loads_snapshot(f.read())
@@ -0,0 +1,154 @@
+"""A CRDT graph persisted in a directory as checkpoints and logs of updates.
+
+Checkpoint n is the snapshot of the graph with the ids of applied updates, log n holds the updates applied after it:
+
+    checkpoint.<n>   two records (see update_log): the graph snapshot and the applied update ids, sorted, in a
+                     fixed-width column (see columns)
+    updates.<n>.log  update log
+
+Only the latest checkpoint and its log are needed. A new checkpoint is written to a temporary file and renamed, then
+a new log is started and the old files are removed, so a crash at any moment leaves a consistent pair of files.
+Opening the store loads the latest checkpoint and replays its log
+"""
+import os
+import re
+from pathlib import Path
+
+from yaml_diff_v3.crdt_graph import columns as cols
+from yaml_diff_v3.crdt_graph.graph import Graph
+from yaml_diff_v3.crdt_graph.snapshot import dumps_snapshot, loads_snapshot
+from yaml_diff_v3.crdt_graph.update_log import UpdateLog, decode_records, encode_record, read_update_log
+from yaml_diff_v3.crdt_graph.updates import Update, UpdateId
+from yaml_diff_v3.crdt_graph.updates_applier import UpdatesApplier
+
+_CHECKPOINT_NAME = re.compile(r"checkpoint\.(\d+)")
+_FILE_NAME = re.compile(r"checkpoint\.\d+(\.tmp)?|updates\.\d+\.log")  # all files which the store may leave
+
+_APPLIED_UPDATES_MAGIC = b"YDCA"
+_APPLIED_UPDATES_VERSION = 1
+_APPLIED_UPDATES_COLUMNS = (("update_ids", cols.FIXED),)
+
+
+def _checkpoint_path(directory: Path, number: int) -> Path:
+    return directory / f"checkpoint.{number}"
+
+
+def _log_path(directory: Path, number: int) -> Path:
+    return directory / f"updates.{number}.log"
+
+
+def _sync_directory(directory: Path) -> None:
+    """Makes creation, renaming and removal of files in the directory durable"""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _dumps_applied_updates(applied_updates: set[UpdateId]) -> bytes:
+    writer = cols.TableWriter(_APPLIED_UPDATES_COLUMNS, ())
+    writer.columns["update_ids"] = sorted(applied_updates)
+    return writer.to_bytes(_APPLIED_UPDATES_MAGIC, _APPLIED_UPDATES_VERSION)
+
+
+def _loads_applied_updates(data: bytes) -> set[UpdateId]:
+    columns = cols.read_columns(data, _APPLIED_UPDATES_MAGIC, _APPLIED_UPDATES_VERSION, _APPLIED_UPDATES_COLUMNS)
+    return set(columns["update_ids"])
+
+
+def _write_checkpoint(directory: Path, number: int, graph: Graph, applied_updates: set[UpdateId]) -> None:
+    path = _checkpoint_path(directory, number)
+    temporary_path = path.with_name(f"{path.name}.tmp")
+    with open(temporary_path, "wb") as f:
+        f.write(encode_record(dumps_snapshot(graph)))
+        f.write(encode_record(_dumps_applied_updates(applied_updates)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+    _sync_directory(directory)
+
+
+def _read_checkpoint(path: Path) -> None | tuple[Graph, set[UpdateId]]:
+    data = path.read_bytes()
+    payloads, length = decode_records(data)
+    if len(payloads) != 2 or length != len(data):
+        return None
+    return loads_snapshot(payloads[0]), _loads_applied_updates(payloads[1])
+
+
+class GraphStore:
+    def __init__(self, directory: str | Path, sync_every: int = 16, checkpoint_every: int = 10_000):
+        """Recovers the graph from the directory. Use GraphStore.create for a new store.
+
+        Batches of updates are fsync-ed once per sync_every batches, a checkpoint is written once per
+        checkpoint_every updates"""
+        self.directory = Path(directory)
+        self.checkpoint_every = checkpoint_every
+
+        numbers = sorted((int(match[1]) for match in map(_CHECKPOINT_NAME.fullmatch, os.listdir(self.directory))
+                          if match), reverse=True)
+        for number in numbers:
+            checkpoint = _read_checkpoint(_checkpoint_path(self.directory, number))
+            if checkpoint is not None:
+                break
+        else:
+            raise FileNotFoundError(f"No valid checkpoint in {self.directory}")
+        self._number = number
+        self.graph, self.applied_updates = checkpoint
+
+        tail = read_update_log(_log_path(self.directory, number))
+        # The updates were decoded from the log, nothing else refers to them
+        UpdatesApplier(self.applied_updates, take_ownership=True).apply_updates_batch(self.graph, tail)
+        self._logged_count = len(tail)
+        self._log = UpdateLog(_log_path(self.directory, number), sync_every)
+        self._remove_old_files()
+
+    @classmethod
+    def create(cls, directory: str | Path, graph: Graph, applied_updates: None | set[UpdateId] = None,
+               **kwargs) -> "GraphStore":
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        if any(map(_CHECKPOINT_NAME.fullmatch, os.listdir(directory))):
+            raise FileExistsError(f"There is a graph in {directory} already")
+        _write_checkpoint(directory, 0, graph, applied_updates or set())
+        return cls(directory, **kwargs)
+
+    def apply_updates(self, updates: list[Update]) -> None:
+        """Logs the new updates and applies them to the graph"""
+        new_updates: dict[UpdateId, Update] = {}
+        for update in updates:
+            if update.update_id not in self.applied_updates:
+                new_updates.setdefault(update.update_id, update)
+        self._log.append(list(new_updates.values()))
+        UpdatesApplier(self.applied_updates).apply_updates_batch(self.graph, list(new_updates.values()))
+        self._logged_count += len(new_updates)
+        if self._logged_count >= self.checkpoint_every:
+            self.checkpoint()
+
+    def sync(self) -> None:
+        self._log.sync()
+
+    def checkpoint(self) -> None:
+        """Writes the graph to a new checkpoint and starts an empty log"""
+        _write_checkpoint(self.directory, self._number + 1, self.graph, self.applied_updates)
+        self._log.close()
+        self._number += 1
+        self._log = UpdateLog(_log_path(self.directory, self._number), self._log.sync_every)
+        self._logged_count = 0
+        self._remove_old_files()
+
+    def _remove_old_files(self) -> None:
+        current_paths = (_checkpoint_path(self.directory, self._number), _log_path(self.directory, self._number))
+        for name in os.listdir(self.directory):
+            if _FILE_NAME.fullmatch(name) and self.directory / name not in current_paths:
+                (self.directory / name).unlink()
+
+    def close(self) -> None:
+        self._log.close()
+
+    def __enter__(self) -> "GraphStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,172 @@
+from yaml_diff_v3 import crdt_graph
+from yaml_diff_v3.crdt_graph import Timestamp, SessionId, UpdateId, NodeId
+from yaml_diff_v3.crdt_graph.ids import make_id
+from yaml_diff_v3.crdt_graph.updates import AddMapItem, AddListItem, DeleteMapItem, EditListItemSortKey
+from yaml_diff_v3.service import Service
+from yaml_diff_v3.utils import my_dedent, get_tag
+
+# ids of a session which never edits the graphs of the tests
+MAP_ITEM_ID = NodeId(make_id(7, 1))
+LIST_ITEM_ID = NodeId(make_id(7, 2))
+KEY_ID = NodeId(make_id(7, 3))
+VALUE_ID = NodeId(make_id(7, 4))
+LIST_VALUE_ID = NodeId(make_id(7, 5))
+X_ID = NodeId(make_id(7, 6))
+ITEM_D_ID = NodeId(make_id(7, 7))
+
+
+def make_graph(yaml_text: str) -> crdt_graph.Graph:
+    return Service().make_initial_crdt_graph(my_dedent(yaml_text), Timestamp(0))
+
+
+def make_scalar(node_id: NodeId, value: str) -> crdt_graph.ScalarNode:
+    return crdt_graph.ScalarNode(id=node_id, yaml_tag=get_tag("str"), anchor=None,
+                                 last_edit_ts=Timestamp(1), is_deprecated=False, comment=None,
+                                 last_comment_edit_ts=Timestamp(1), value=value)
+
+
+def test_get_node_and_parent():
+    graph = make_graph("""
+        A: 1
+        B:
+          - x
+    """)
+    item_a, item_b = graph.root.items
+    list_item = item_b.value.items[0]
+
+    assert graph.get_node(graph.root.id) is graph.root
+    assert graph.get_parent(graph.root.id) is None
+    assert graph.get_node(item_a.id) is item_a
+    assert graph.get_parent(item_a.id) is graph.root
+    assert graph.get_parent(item_a.key.id) is item_a
+    assert graph.get_parent(item_a.value.id) is item_a
+    assert graph.get_node(list_item.value.id) is list_item.value
+    assert graph.get_parent(list_item.value.id) is list_item
+    assert graph.get_parent(list_item.id) is item_b.value
+    assert len(graph.get_all_nodes()) == 1 + 2 * 3 + 2
+
+
+def test_index_is_updated_by_applier():
+    graph = make_graph("""
+        A: 1
+        B: []
+    """)
+    list_node = graph.root.items[1].value
+    map_item = crdt_graph.MappingNode.Item(id=MAP_ITEM_ID, key=make_scalar(KEY_ID, "C"),
+                                           value=make_scalar(VALUE_ID, "3"), sort_key="2R",
+                                           last_timestamp_sort_key_edited=Timestamp(1))
+    list_item = crdt_graph.SequenceNode.Item(id=LIST_ITEM_ID, value=make_scalar(LIST_VALUE_ID, "x"),
+                                             sort_key="1R", last_timestamp_sort_key_edited=Timestamp(1))
+    applier = crdt_graph.UpdatesApplier(set())
+    applier.apply_updates(graph, [
+        AddMapItem(SessionId("s"), Timestamp(1), UpdateId(1), mapping_node_id=graph.root.id, new_item=map_item),
+        AddListItem(SessionId("s"), Timestamp(1), UpdateId(2), list_node_id=list_node.id, new_item=list_item),
+    ])
+
+    added_map_item = graph.get_node(MAP_ITEM_ID)
+    assert added_map_item is graph.root.items[2]
+    assert added_map_item is not map_item  # applier copies the update's item
+    assert graph.get_parent(MAP_ITEM_ID) is graph.root
+    assert graph.get_node(VALUE_ID) is added_map_item.value
+    assert graph.get_parent(VALUE_ID) is added_map_item
+    assert graph.get_node(LIST_VALUE_ID) is list_node.items[0].value
+    assert graph.get_parent(LIST_ITEM_ID) is list_node
+
+
+def test_paths():
+    graph = make_graph("""
+        A: 1
+        B:
+          - x
+          - y
+    """)
+    item_a, item_b = graph.root.items
+    value_x, value_y = (item.value for item in item_b.value.items)
+
+    assert graph.get_node_by_path(()) is graph.root
+    assert graph.get_node_by_path(("A",)) is item_a
+    assert graph.get_node_by_path(("A", 1)) is item_a.value
+    assert graph.get_node_by_path(("B", 1, 1)) is value_y
+    assert graph.get_node_path(item_a.key.id) == ("A", 0)
+    assert graph.get_node_path(value_x.id) == ("B", 1, 0)
+    assert graph.get_path_to_node_mapping() == {
+        path: graph.get_node_by_path(path)
+        for path in [(), ("A",), ("A", 0), ("A", 1), ("B",), ("B", 0), ("B", 1), ("B", 1, 0), ("B", 1, 1)]
+    }
+
+
+def test_paths_are_updated_by_applier():
+    graph = make_graph("""
+        A: 1
+        B:
+          - x
+          - y
+    """)
+    item_a, item_b = graph.root.items
+    item_x, item_y = item_b.value.items
+    assert graph.get_node_path(item_a.value.id) == ("A", 1)
+    assert graph.get_node_path(item_x.value.id) == ("B", 1, 0)
+
+    duplicated_a = crdt_graph.MappingNode.Item(id=MAP_ITEM_ID, key=make_scalar(KEY_ID, "A"),
+                                               value=make_scalar(VALUE_ID, "2"), sort_key="2R",
+                                               last_timestamp_sort_key_edited=Timestamp(1))
+    applier = crdt_graph.UpdatesApplier(set())
+    applier.apply_updates(graph, [
+        AddMapItem(SessionId("s"), Timestamp(1), UpdateId(1), mapping_node_id=graph.root.id,
+                   new_item=duplicated_a),
+        EditListItemSortKey(SessionId("s"), Timestamp(1), UpdateId(2), item_id=item_x.id, new_sort_key="2R"),
+    ])
+    assert graph.get_node_path(item_a.value.id) == (("A", str(item_a.value.id)), 1)
+    assert graph.get_node_path(VALUE_ID) == (("A", str(VALUE_ID)), 1)
+    assert graph.get_node_path(item_x.value.id) == ("B", 1, 1)
+    assert graph.get_node_by_path(("B", 1, 0)) is item_y.value
+
+    applier.apply_updates(graph, [
+        DeleteMapItem(SessionId("s"), Timestamp(2), UpdateId(3), item_value_id=item_a.value.id),
+    ])
+    assert graph.get_node_path(item_a.value.id) is None
+    assert graph.get_node_path(item_a.key.id) is None
+    assert graph.get_node_path(VALUE_ID) == ("A", 1)
+
+
+def test_items_are_kept_sorted():
+    graph = make_graph("[" + ", ".join(str(i) for i in range(12)) + "]")
+    list_node = graph.root
+    assert [item.value.value for item in list_node.items] == [str(i) for i in range(12)]
+    assert all(list_node.items[i - 1].sort_key < list_node.items[i].sort_key for i in range(1, 12))
+
+    item_0, item_5 = list_node.items[0], list_node.items[5]
+    applier = crdt_graph.UpdatesApplier(set())
+    applier.apply_updates(graph, [
+        EditListItemSortKey(SessionId("s"), Timestamp(1), UpdateId(1), item_id=item_0.id, new_sort_key="9R"),
+        EditListItemSortKey(SessionId("s"), Timestamp(1), UpdateId(2), item_id=item_5.id, new_sort_key="0R"),
+        AddListItem(SessionId("s"), Timestamp(1), UpdateId(3), list_node_id=list_node.id,
+                    new_item=crdt_graph.SequenceNode.Item(id=LIST_ITEM_ID, value=make_scalar(X_ID, "x"),
+                                                          sort_key="105R", last_timestamp_sort_key_edited=Timestamp(1))),
+    ])
+    assert [item.value.value for item in list_node.items] == \
+           ["5", "1", "2", "3", "4", "x", "6", "7", "8", "9", "10", "11", "0"]
+    assert graph.get_node_path(item_0.value.id) == (12,)
+    assert graph.get_node_path(item_5.value.id) == (0,)
+
+
+def test_versions():
+    graph = make_graph("""
+        A:
+          B: 1
+        C: 2
+    """)
+    item_a, item_c = graph.root.items
+    item_b = item_a.value.items[0]
+    versions = {element.id: graph.get_version(element.id) for element in (graph.root, item_a, item_b, item_c)}
+
+    crdt_graph.UpdatesApplier(set()).apply_updates(graph, [
+        AddMapItem(SessionId("s"), Timestamp(1), UpdateId(1), mapping_node_id=item_a.value.id,
+                   new_item=crdt_graph.MappingNode.Item(id=ITEM_D_ID, key=make_scalar(KEY_ID, "D"),
+                                                        value=make_scalar(VALUE_ID, "3"), sort_key="2R",
+                                                        last_timestamp_sort_key_edited=Timestamp(1))),
+    ])
+    assert graph.get_version(graph.root.id) > versions[graph.root.id]
+    assert graph.get_version(item_a.id) > versions[item_a.id]
+    assert graph.get_version(item_b.id) == versions[item_b.id]
+    assert graph.get_version(item_c.id) == versions[item_c.id]
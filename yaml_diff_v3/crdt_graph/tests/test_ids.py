@@ -0,0 +1,131 @@
+from pathlib import Path
+
+import pytest
+
+from yaml_diff_v3 import crdt_graph
+from yaml_diff_v3.crdt_graph import Timestamp, SessionId, from_string_id, convert_string_ids, \
+    convert_update_string_ids, dumps_snapshot, loads_snapshot, GraphStore
+from yaml_diff_v3.crdt_graph.ids import make_id, split_id, get_counter, LEGACY_FLAG, COUNTER_BITS
+from yaml_diff_v3.crdt_graph.updates import AddMapItem
+from yaml_diff_v3.service import Service
+
+
+def get_all_ids(graph: crdt_graph.Graph) -> list[int]:
+    ids = []
+    stack = [graph.root]
+    while stack:
+        element = stack.pop()
+        ids.append(element.id)
+        stack.extend(element.get_all_children())
+    return ids
+
+
+def test_make_and_split():
+    assert split_id(make_id(3, 5)) == (3, 5)
+    assert make_id(1, 0) == 1 << COUNTER_BITS
+    assert get_counter(make_id(3, 5)) == 5
+    assert get_counter(from_string_id("x")) == 0
+    assert make_id((1 << 22) - 1, (1 << COUNTER_BITS) - 1) < LEGACY_FLAG < 2 ** 63
+    with pytest.raises(ValueError):
+        make_id(1 << 22, 0)
+    with pytest.raises(OverflowError):
+        make_id(0, 1 << COUNTER_BITS)
+    with pytest.raises(ValueError):
+        split_id(from_string_id("x"))
+
+
+def test_sessions_dont_collide():
+    service = Service()
+    graph = service.make_initial_crdt_graph("A: [1, 2]\n", Timestamp(0))
+    updates = []
+    for i, text in enumerate(["A: [1, 2, 3]\nB: x\n", "A: [0, 1, 2]\nC: {D: y}\n"], start=1):
+        updates += service.build_local_updates(graph, "A: [1, 2]\n", text, SessionId(f"s{i}"), Timestamp(i))
+    crdt_graph.UpdatesApplier(set()).apply_updates(graph, updates)
+
+    ids = get_all_ids(graph) + [update.update_id for update in updates]
+    assert len(ids) == len(set(ids))
+    assert {split_id(update.update_id)[0] for update in updates} == \
+        {graph.get_session_index(SessionId("s1")), graph.get_session_index(SessionId("s2"))} == {1, 2}
+    assert all(isinstance(element_id, int) for element_id in ids)
+
+
+def test_session_index_doesnt_depend_on_service():
+    base_text = "A: 1\n"
+    first_service, second_service = Service(), Service()  # e.g. two workers, or one worker after a restart
+    graph = first_service.make_initial_crdt_graph(base_text, Timestamp(0))
+    updates_1 = first_service.build_local_updates(graph, base_text, "A: 1\nB: 2\n", SessionId("s1"), Timestamp(1))
+    updates_2 = second_service.build_local_updates(graph, base_text, "A: 1\nC: 3\n", SessionId("s2"), Timestamp(2))
+    assert first_service.get_id_generator(graph, SessionId("s2")).session_index == \
+        second_service.get_id_generator(graph, SessionId("s2")).session_index != \
+        second_service.get_id_generator(graph, SessionId("s1")).session_index
+
+    applied_updates = set()
+    crdt_graph.UpdatesApplier(applied_updates).apply_updates(graph, updates_1 + updates_2)
+    assert len(applied_updates) == len(updates_1 + updates_2)
+    assert first_service.convert_to_yaml(graph) == "A: 1\nB: 2\nC: 3\n"
+
+
+def test_session_index_survives_restart(tmp_path: Path):
+    # The ids of these sessions had the same hash when indices were hashed from session ids
+    first_session, second_session = SessionId("session_139"), SessionId("session_974")
+    base_text = "A: 1\n"
+    graph = Service().make_initial_crdt_graph(base_text, Timestamp(0))
+    with GraphStore.create(tmp_path / "store", graph) as store:
+        first_updates = Service().build_local_updates(store.graph, base_text, "A: 1\nB: 2\n", first_session,
+                                                      Timestamp(1))
+        store.apply_updates(first_updates)
+
+    # the index is recovered from the log, the other session gets a new one
+    with GraphStore(tmp_path / "store") as store:
+        text = Service().convert_to_yaml(store.graph)
+        second_updates = Service().build_local_updates(store.graph, text, text + "C: 3\n", second_session,
+                                                       Timestamp(2))
+        store.apply_updates(second_updates)
+        store.checkpoint()
+    assert {split_id(update.update_id)[0] for update in first_updates} == {1}
+    assert {split_id(update.update_id)[0] for update in second_updates} == {2}
+
+    # and from the checkpoint
+    with GraphStore(tmp_path / "store") as store:
+        assert store.graph.get_session_indices() == \
+            loads_snapshot(dumps_snapshot(store.graph)).get_session_indices() == {first_session: 1, second_session: 2}
+        assert Service().get_id_generator(store.graph, SessionId("new")).session_index == 3
+
+
+def test_counter_is_observed():
+    service = Service()
+    graph = service.make_initial_crdt_graph("A: 1\n", Timestamp(0))
+    updates = service.build_local_updates(graph, "A: 1\n", "A: 1\nB: 2\n", SessionId("s"), Timestamp(1))
+    crdt_graph.UpdatesApplier(set()).apply_updates(graph, updates)
+    max_counter = graph.get_max_id_counter()
+    assert max_counter == max(map(get_counter, get_all_ids(graph) + [updates[0].update_id]))
+
+    # a restarted session starts with a fresh generator of the same index, but continues after the graph's counter
+    text = service.convert_to_yaml(graph)
+    graph = loads_snapshot(dumps_snapshot(graph))
+    assert graph.get_max_id_counter() == max_counter
+    restarted_updates = Service().build_local_updates(graph, text, text + "C: 3\n", SessionId("s"), Timestamp(2))
+    assert all(get_counter(update.update_id) > max_counter for update in restarted_updates)
+    assert not {update.update_id for update in restarted_updates} & {update.update_id for update in updates}
+
+
+def test_string_ids():
+    uuid_id = "0b5f2c9e-1d2a-4d3b-9e4f-5a6b7c8d9e0f"
+    assert from_string_id(uuid_id) == from_string_id(uuid_id) >= LEGACY_FLAG
+    assert from_string_id(uuid_id) != from_string_id(uuid_id[:-1])
+
+    graph = Service().make_initial_crdt_graph("A: &a 1\nB: [*a]\n", Timestamp(0))
+    reference = graph.root.items[1].value.items[0].value
+    item = graph.root.items[0]
+    item.id, item.value.id, reference.referred_id = "item", uuid_id, uuid_id
+    convert_string_ids(graph.root)
+    assert (item.id, item.value.id) == (from_string_id("item"), from_string_id(uuid_id))
+    assert reference.referred_id == item.value.id
+    assert crdt_graph.Graph(graph.root).get_node(from_string_id(uuid_id)) is item.value
+
+    update = AddMapItem(SessionId("s"), Timestamp(1), "update", mapping_node_id="root", new_item=item)
+    item.id = "item"
+    convert_update_string_ids(update)
+    assert (update.update_id, update.mapping_node_id, update.new_item.id) == \
+           (from_string_id("update"), from_string_id("root"), from_string_id("item"))
+    assert update.session_id == "s"
@@ -0,0 +1,86 @@
+from pathlib import Path
+
+import pytest
+
+from yaml_diff_v3 import crdt_graph
+from yaml_diff_v3.crdt_graph import Timestamp, NodeId, SnapshotError, dumps_snapshot, loads_snapshot, from_string_id
+from yaml_diff_v3.service import Service
+from yaml_diff_v3.utils import my_dedent
+
+DEMO_DIR = Path(__file__).parent.parent.parent / "demo"
+
+
+def make_graph(yaml_text: str) -> crdt_graph.Graph:
+    return Service().make_initial_crdt_graph(my_dedent(yaml_text), Timestamp(0))
+
+
+def check(graph: crdt_graph.Graph) -> crdt_graph.Graph:
+    loaded = loads_snapshot(dumps_snapshot(graph))
+    assert loaded.root == graph.root
+    assert len(loaded.get_all_nodes()) == len(graph.get_all_nodes())
+    return loaded
+
+
+def test_demo_files():
+    for path in sorted(DEMO_DIR.glob("experiment_*/case_*/v*.yaml")):
+        check(Service().make_initial_crdt_graph(path.read_text(), Timestamp(0)))
+
+
+def test_all_fields():
+    graph = make_graph("""
+        # head
+        A: &a 1  # inline
+        B: *a
+        C:
+          - x
+          # between
+          - {D: true}
+        E: |
+          multiline
+          text
+        F: []
+    """)
+    item_a, item_b, item_c, _, item_f = graph.root.items
+    item_a.value.last_edit_ts = Timestamp(-5)
+    item_a.value.last_comment_edit_ts = Timestamp(2 ** 40)
+    item_b.value.is_deprecated = True
+    item_b.last_timestamp_sort_key_edited = Timestamp(-2 ** 40)
+    item_c.value.items[0].value.id = NodeId(from_string_id("not a uuid"))
+    item_f.value.is_deprecated = True
+
+    loaded = check(graph)
+    assert loaded.root.items[0].value.last_edit_ts == -5
+    assert loaded.get_node(NodeId(from_string_id("not a uuid"))) is loaded.root.items[2].value.items[0].value
+    assert loaded.root.items[1].value.referred_id == loaded.root.items[0].value.id
+    assert loaded.root.items[0].value.anchor == "a"
+    assert loaded.get_node_path(loaded.root.items[4].value.id) is None
+
+
+def test_scalar_root():
+    check(make_graph("text"))
+
+
+def test_shared_values_are_interned():
+    graph = make_graph("\n".join(f"key_{i}: {{tag: same, path: same}}" for i in range(100)))
+    comments_graph = make_graph("\n".join(f"key_{i}: 1  # same" for i in range(100)))
+    assert len(dumps_snapshot(graph)) < len(dumps_snapshot(make_graph(
+        "\n".join(f"key_{i}: {{tag: value_{i}, path: value_{i}}}" for i in range(100)))))
+    loaded = check(comments_graph)
+    assert loaded.root.items[0].value.comment is loaded.root.items[1].value.comment
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda data: b"XXXX" + data[4:],
+    lambda data: data[:4] + bytes([1]) + data[5:],  # an older version
+    lambda data: data[:-1],
+    lambda data: data[:len(data) // 2],
+    lambda data: data + b"\0",
+    lambda data: b"",
+])
+def test_corrupted(corrupt):
+    data = dumps_snapshot(make_graph("""
+        A: 1
+        B: [x, y]
+    """))
+    with pytest.raises(SnapshotError):
+        loads_snapshot(corrupt(data))
@@ -0,0 +1,130 @@
+import pickle
+import random
+import shutil
+from copy import deepcopy
+from pathlib import Path
+
+import pytest
+
+from yaml_diff_v3 import crdt_graph
+from yaml_diff_v3.crdt_graph import Timestamp, SessionId, GraphStore, UpdateLog, DecodeError, read_update_log
+from yaml_diff_v3.crdt_graph.update_log import decode_records, encode_record
+from yaml_diff_v3.service import Service
+from yaml_diff_v3.utils import dumps_yaml, loads_yaml
+
+
+def make_edits(service: Service, graph: crdt_graph.Graph, count: int,
+               rng: random.Random) -> list[list[crdt_graph.Update]]:
+    """Random local edits of the graph: additions, deletions and changes of keys and comments. Each edit is applied
+    to a copy of the graph, so that the next one is built against the edited text"""
+    graph = deepcopy(graph)
+    edits = []
+    for ts in range(1, count + 1):
+        old_text = service.convert_to_yaml(graph)
+        data = loads_yaml(old_text)
+        key = f"key_{rng.randrange(10)}"
+        if key in data and rng.random() < 0.3:
+            del data[key]
+        else:
+            data[key] = [rng.randrange(100) for _ in range(rng.randrange(3))] or rng.randrange(100)
+        updates = service.build_local_updates(graph, old_text, dumps_yaml(data), SessionId("s"), Timestamp(ts))
+        crdt_graph.UpdatesApplier(set()).apply_updates(graph, updates)
+        edits.append(updates)
+    return edits
+
+
+def test_update_log(tmp_path: Path):
+    service = Service()
+    graph = service.make_initial_crdt_graph("key_0: 0\n", Timestamp(0))
+    updates = [update for edit in make_edits(service, graph, 5, random.Random(0)) for update in edit]
+    with UpdateLog(tmp_path / "log", sync_every=2) as log:
+        log.append(updates[:3])
+        log.append(updates[3:])
+    assert read_update_log(tmp_path / "log") == updates
+
+    with open(tmp_path / "log", "ab") as f:
+        f.write(b"\1\0\0\0torn")
+    assert read_update_log(tmp_path / "log") == updates
+    with UpdateLog(tmp_path / "log") as log:  # the torn record is cut off, new records go after the valid ones
+        log.append(updates[:1])
+    assert read_update_log(tmp_path / "log") == updates + updates[:1]
+    assert read_update_log(tmp_path / "missing") == []
+
+
+@pytest.mark.parametrize("checkpoint_every", [1000, 7])
+def test_crash_recovery(tmp_path: Path, checkpoint_every: int):
+    """The log is cut at random offsets, as if the process crashed while writing it. The recovered graph must be
+    equal to the graph after the last update which was written completely"""
+    service = Service()
+    initial_graph = service.make_initial_crdt_graph("key_0: 0\n", Timestamp(0))
+    edits = make_edits(service, initial_graph, 30, random.Random(0))
+
+    store_dir = tmp_path / "store"
+    store = GraphStore.create(store_dir, deepcopy(initial_graph), sync_every=1, checkpoint_every=checkpoint_every)
+    # log file -> its size after each written update and the state at that moment. After a checkpoint the new log
+    # is empty, its first state is the state of the checkpoint
+    states: dict[str, list[tuple[int, crdt_graph.Node, set]]] = \
+        {store._log.path.name: [(0, deepcopy(store.graph.root), set())]}
+    for updates in edits:
+        for update in updates:
+            store.apply_updates([update])
+            states.setdefault(store._log.path.name, []).append(
+                (store._log.path.stat().st_size, deepcopy(store.graph.root), set(store.applied_updates)))
+    store.close()
+    with GraphStore(store_dir) as reopened:
+        assert reopened.graph.root == store.graph.root
+
+    rng = random.Random(1)
+    log_states = states[store._log.path.name]
+    for i in range(50):
+        offset = rng.randrange(log_states[-1][0] + 1)
+        crash_dir = tmp_path / f"crash_{i}"
+        shutil.copytree(store_dir, crash_dir)
+        with open(crash_dir / store._log.path.name, "r+b") as f:
+            f.truncate(offset)
+
+        _, expected_root, expected_applied_updates = max((state for state in log_states if state[0] <= offset),
+                                                         key=lambda state: state[0])
+        with GraphStore(crash_dir) as recovered:
+            assert recovered.graph.root == expected_root
+            assert recovered.applied_updates == expected_applied_updates
+            # the store keeps working after the recovery
+            recovered.apply_updates([update for updates in edits for update in updates])
+            assert recovered.graph.root == store.graph.root
+
+
+def test_checkpoint_files(tmp_path: Path):
+    service = Service()
+    graph = service.make_initial_crdt_graph("key_0: 0\n", Timestamp(0))
+    updates = [update for edit in make_edits(service, graph, 10, random.Random(0)) for update in edit]
+    with GraphStore.create(tmp_path, graph, checkpoint_every=6) as store:
+        for update in updates:
+            store.apply_updates([update])
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["checkpoint.2", "updates.2.log"]
+        assert read_update_log(tmp_path / "updates.2.log") == updates[12:]
+        (tmp_path / "checkpoint.3.tmp").write_bytes(b"interrupted checkpoint")
+    with GraphStore(tmp_path) as recovered:
+        assert recovered.graph.root == store.graph.root
+        assert recovered.applied_updates == {update.update_id for update in updates}
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["checkpoint.2", "updates.2.log"]
+    with pytest.raises(FileExistsError):
+        GraphStore.create(tmp_path, graph)
+
+
+class _Payload:
+    def __reduce__(self):
+        return exec, ("raise AssertionError('pickle was loaded')",)
+
+
+def test_checkpoint_is_not_pickled(tmp_path: Path):
+    graph = Service().make_initial_crdt_graph("A: 1\n", Timestamp(0))
+    applied_updates = {crdt_graph.UpdateId(1), crdt_graph.UpdateId(2 ** 63 - 1)}
+    GraphStore.create(tmp_path, graph, applied_updates).close()
+    with GraphStore(tmp_path) as store:
+        assert store.applied_updates == applied_updates
+
+    path = tmp_path / "checkpoint.0"
+    (snapshot, _), _ = decode_records(path.read_bytes())
+    path.write_bytes(encode_record(snapshot) + encode_record(pickle.dumps(_Payload())))
+    with pytest.raises(DecodeError):
+        GraphStore(tmp_path)
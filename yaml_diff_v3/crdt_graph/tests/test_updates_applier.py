@@ -0,0 +1,96 @@
+from copy import deepcopy
+
+from yaml_diff_v3 import crdt_graph
+from yaml_diff_v3.crdt_graph import Timestamp, SessionId, UpdateId
+from yaml_diff_v3.crdt_graph.ids import make_id
+from yaml_diff_v3.crdt_graph.updates import EditScalarNode, EditListItemSortKey, AddMapItem
+from yaml_diff_v3.service import Service
+from yaml_diff_v3.utils import my_dedent, get_tag
+
+
+def edit_scalar(node_id, ts: int, update_id: int, value: str) -> EditScalarNode:
+    return EditScalarNode(SessionId("s"), Timestamp(ts), UpdateId(update_id), node_id=node_id,
+                          new_yaml_tag=get_tag("str"), new_value=value)
+
+
+def test_batch_applies_latest_edit():
+    graph = Service().make_initial_crdt_graph("A: 1\nB: 2\n", Timestamp(0))
+    node_a, node_b = (item.value for item in graph.root.items)
+    updates = [
+        edit_scalar(node_a.id, 3, 1, "a3"),
+        edit_scalar(node_a.id, 1, 2, "a1"),
+        edit_scalar(node_b.id, 2, 3, "b2"),
+        edit_scalar(node_b.id, 2, 4, "b2_last"),  # same timestamp, the last one wins
+    ]
+    sequential_graph = deepcopy(graph)
+    crdt_graph.UpdatesApplier(set()).apply_updates(sequential_graph, updates)
+
+    applied_updates = set()
+    crdt_graph.UpdatesApplier(applied_updates).apply_updates_batch(graph, updates)
+    assert (node_a.value, node_a.last_edit_ts) == ("a3", 3)
+    assert (node_b.value, node_b.last_edit_ts) == ("b2_last", 2)
+    assert applied_updates == {1, 2, 3, 4}
+    assert Service().convert_to_yaml(graph) == Service().convert_to_yaml(sequential_graph)
+
+
+def test_batch_coalesces_sort_key_edits():
+    graph = Service().make_initial_crdt_graph("[a, b, c]", Timestamp(0))
+    item_a = graph.root.items[0]
+    crdt_graph.UpdatesApplier(set()).apply_updates_batch(graph, [
+        EditListItemSortKey(SessionId("s"), Timestamp(2), UpdateId(1), item_id=item_a.id, new_sort_key="9"),
+        EditListItemSortKey(SessionId("s"), Timestamp(1), UpdateId(2), item_id=item_a.id, new_sort_key="0"),
+    ])
+    assert (item_a.sort_key, item_a.last_timestamp_sort_key_edited) == ("9", 2)
+    assert Service().convert_to_yaml(graph) == "- b\n- c\n- a\n"
+
+
+def test_batch_observes_coalesced_ids():
+    graph = Service().make_initial_crdt_graph("A: 1\n", Timestamp(0))
+    node_a = graph.root.items[0].value
+    crdt_graph.UpdatesApplier(set()).apply_updates_batch(graph, [
+        edit_scalar(node_a.id, 2, make_id(1, 5000), "a2"),
+        edit_scalar(node_a.id, 1, make_id(1, 9000), "a1"),  # coalesced away
+    ])
+    assert node_a.value == "a2"
+    assert graph.get_max_id_counter() == 9000
+
+
+def test_batch_is_same_as_sequential():
+    service = Service()
+    base_text = my_dedent("""
+        - 1
+        - - x
+          - y
+        - A: a
+          B: b
+    """)
+    graph = service.make_initial_crdt_graph(base_text, Timestamp(0))
+    updates = []
+    for ts, text in enumerate([
+        "- 0\n- 1\n- - y\n  - x\n- A: a\n  B: b\n  C: c\n",
+        "- 1\n- - x\n  - z\n- B: bb\n  A: a\n",
+        "- - x\n  - y\n- 1\n- 2\n",
+    ], start=1):
+        updates += service.build_local_updates(graph, base_text, text, SessionId(f"session_{ts}"), Timestamp(ts))
+
+    sequential_graph = deepcopy(graph)
+    crdt_graph.UpdatesApplier(set()).apply_updates(sequential_graph, updates)
+    crdt_graph.UpdatesApplier(set()).apply_updates_batch(graph, updates)
+    assert service.convert_to_yaml(graph) == service.convert_to_yaml(sequential_graph)
+
+
+def test_take_ownership():
+    service = Service()
+    graph = service.make_initial_crdt_graph("A: 1\n", Timestamp(0))
+    [update] = service.build_local_updates(graph, "A: 1\n", "A: 1\nB: {X: x}\n", SessionId("s"), Timestamp(1))
+    assert isinstance(update, AddMapItem)
+
+    copying_graph = deepcopy(graph)
+    crdt_graph.UpdatesApplier(set()).apply_updates(copying_graph, [update])
+    assert copying_graph.root.items[1] is not update.new_item
+    assert copying_graph.root.items[1] == update.new_item
+
+    crdt_graph.UpdatesApplier(set(), take_ownership=True).apply_updates(graph, [update])
+    assert graph.root.items[1] is update.new_item
+    assert graph.get_node(update.new_item.value.items[0].value.id) is update.new_item.value.items[0].value
+    assert service.convert_to_yaml(graph) == service.convert_to_yaml(copying_graph) == "A: 1\nB:\n  X: x\n"
@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import pytest
+
+from yaml_diff_v3.crdt_graph import columns as cols
+from yaml_diff_v3.crdt_graph import Timestamp, SessionId, UpdateId, NodeId, DecodeError, encode_updates, \
+    decode_updates
+from yaml_diff_v3.crdt_graph.updates import EditScalarNode, EditComment, AddMapItem, DeleteMapItem, \
+    EditMapItemSortKey, AddListItem, DeleteListItem, EditListItemSortKey
+from yaml_diff_v3.service import Service
+from yaml_diff_v3.utils import get_tag
+from yaml_diff_v3.yaml_graph.nodes import Comment
+
+DEMO_DIR = Path(__file__).parent.parent.parent / "demo"
+
+
+def make_all_updates() -> list:
+    graph = Service().make_initial_crdt_graph("A: &a 1  # comment\nB: [*a, {C: x}]\n", Timestamp(0))
+    map_item = graph.root.items[1]
+    list_item = map_item.value.items[1]
+    comment = Comment((None, Comment.Token("# x\n", 3), (Comment.Token("# y\n", 0), Comment.Token("\n", 0))))
+    return [
+        EditScalarNode(SessionId("s1"), Timestamp(1), UpdateId(1), node_id=NodeId(1 << 62 | 1),
+                       new_yaml_tag=get_tag("str"), new_value="multi\nline"),
+        EditComment(SessionId("s1"), Timestamp(2), UpdateId(2), node_id=NodeId(1 << 62 | 1), new_comment=comment),
+        EditComment(SessionId("s2"), Timestamp(2), UpdateId(3), node_id=NodeId(1 << 62 | 1), new_comment=None),
+        AddMapItem(SessionId("s2"), Timestamp(-3), UpdateId(4), mapping_node_id=graph.root.id,
+                   new_item=map_item),
+        DeleteMapItem(SessionId("s1"), Timestamp(2 ** 40), UpdateId(5), item_value_id=NodeId(2 ** 40 + 2)),
+        EditMapItemSortKey(SessionId("s1"), Timestamp(5), UpdateId(6), item_id=map_item.id, new_sort_key="0V"),
+        AddListItem(SessionId("s1"), Timestamp(6), UpdateId(7), list_node_id=map_item.value.id,
+                    new_item=list_item),
+        DeleteListItem(SessionId("s1"), Timestamp(7), UpdateId(8), item_id=list_item.id),
+        EditListItemSortKey(SessionId("s1"), Timestamp(8), UpdateId(9), item_id=list_item.id, new_sort_key="1"),
+    ]
+
+
+def test_all_update_types():
+    updates = make_all_updates()
+    assert decode_updates(encode_updates(updates)) == updates
+    assert decode_updates(encode_updates([])) == []
+
+
+def test_demo_updates():
+    service = Service()
+    for case_dir in sorted(DEMO_DIR.glob("experiment_*/case_*")):
+        base_text = (case_dir / "v0.yaml").read_text()
+        graph = service.make_initial_crdt_graph(base_text, Timestamp(0))
+        for i, path in enumerate(sorted(case_dir.glob("v[1-9].yaml")), start=1):
+            updates = service.build_local_updates(graph, base_text, path.read_text(), SessionId(f"session_{i}"),
+                                                  Timestamp(i))
+            data = encode_updates(updates)
+            assert decode_updates(data) == updates
+            assert data.count(f"session_{i}".encode()) == 1  # session ids are interned
+
+
+def test_unknown_update_type():
+    with pytest.raises(TypeError):
+        encode_updates([object()])
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda data: b"YDCG" + data[4:],
+    lambda data: data[:4] + bytes([1]) + data[5:],  # an older version
+    lambda data: data[:-1],
+    lambda data: data[:len(data) // 2],
+    lambda data: data + b"\0",
+])
+def test_corrupted(corrupt):
+    with pytest.raises(DecodeError):
+        decode_updates(corrupt(encode_updates(make_all_updates())))
+
+
+def test_columns_of_different_lengths(monkeypatch):
+    to_bytes = cols.TableWriter.to_bytes
+
+    def to_bytes_with_extra_id(self, magic: bytes, version: int) -> bytes:
+        self.columns["update_ids"].append(UpdateId(100))
+        return to_bytes(self, magic, version)
+
+    monkeypatch.setattr(cols.TableWriter, "to_bytes", to_bytes_with_extra_id)
+    data = encode_updates(make_all_updates())
+    monkeypatch.undo()
+    with pytest.raises(DecodeError):
+        decode_updates(data)
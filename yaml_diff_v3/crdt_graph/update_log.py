@@ -0,0 +1,92 @@
+"""Append-only log of CRDT graph updates.
+
+The log is a sequence of records, one batch of appended updates per record:
+
+    payload length (4 bytes), crc32 of the payload (4 bytes), payload
+
+All integers are little-endian, the payload is the batch encoded by wire.encode_updates. A crash may leave a torn
+record at the end of the file: reading stops at the first record which is incomplete or doesn't match its checksum,
+and the log is truncated to the last valid record when it is opened for appending.
+
+Records are written to the file on every append, but fsync is called once per sync_every records (or by sync()),
+so a crash of the machine loses at most the last sync_every - 1 batches
+"""
+import itertools
+import os
+import struct
+import zlib
+from pathlib import Path
+
+from yaml_diff_v3.crdt_graph.updates import Update
+from yaml_diff_v3.crdt_graph.wire import encode_updates, decode_updates
+
+_HEADER = struct.Struct("<II")
+
+
+def encode_record(payload: bytes) -> bytes:
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_records(data: bytes) -> tuple[list[bytes], int]:
+    """Payloads of the valid records at the start of data and the length of these records"""
+    payloads = []
+    position = 0
+    while position + _HEADER.size <= len(data):
+        length, checksum = _HEADER.unpack_from(data, position)
+        end = position + _HEADER.size + length
+        payload = data[position + _HEADER.size:end]
+        if end > len(data) or zlib.crc32(payload) != checksum:
+            break
+        payloads.append(payload)
+        position = end
+    return payloads, position
+
+
+def read_update_log(path: str | Path) -> list[Update]:
+    """Updates of the valid records of the log. A missing log is empty"""
+    try:
+        data = Path(path).read_bytes()
+    except FileNotFoundError:
+        return []
+    payloads, _ = decode_records(data)
+    return list(itertools.chain.from_iterable(map(decode_updates, payloads)))
+
+
+class UpdateLog:
+    def __init__(self, path: str | Path, sync_every: int = 16):
+        """Opens the log for appending, creates it if it doesn't exist. A torn tail left by a crash is cut off"""
+        self.path = Path(path)
+        self.sync_every = sync_every
+        self._not_synced_count = 0
+        self._file = open(self.path, "ab")
+        _, valid_length = decode_records(self.path.read_bytes())
+        if valid_length != self._file.tell():
+            self._file.truncate(valid_length)
+            self._file.seek(valid_length)
+            os.fsync(self._file.fileno())
+
+    def append(self, updates: list[Update]) -> None:
+        if not updates:
+            return
+        self._file.write(encode_record(encode_updates(updates)))
+        self._file.flush()
+        self._not_synced_count += 1
+        if self._not_synced_count >= self.sync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        """Makes all appended batches durable"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._not_synced_count = 0
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self) -> "UpdateLog":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
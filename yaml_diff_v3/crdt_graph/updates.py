@@ -4,7 +4,7 @@ from typing import NewType
 from yaml_diff_v3.crdt_graph.nodes import NodeId, MappingNode, Timestamp, Comment, SequenceNode
 
 SessionId = NewType("SessionId", str)
-UpdateId = NewType("UpdateId", str)
+UpdateId = NewType("UpdateId", int)  # see ids.py
 
 
 @dataclass
@@ -1,14 +1,31 @@
+import typing
 from copy import deepcopy
+from operator import attrgetter
 
 from yaml_diff_v3.crdt_graph.graph import Graph
-from yaml_diff_v3.crdt_graph.nodes import ScalarNode, MappingNode, SequenceNode
+from yaml_diff_v3.crdt_graph.ids import get_counter, get_session_index_of_id
+from yaml_diff_v3.crdt_graph.nodes import ScalarNode, MappingNode, SequenceNode, NodeId
 from yaml_diff_v3.crdt_graph.updates import Update, UpdateId, EditScalarNode, AddMapItem, DeleteMapItem, EditComment, \
     EditMapItemSortKey, EditListItemSortKey, DeleteListItem, AddListItem
 
 
 class UpdatesApplier:
-    def __init__(self, applied_updates: set[UpdateId]):
+    def __init__(self, applied_updates: set[UpdateId], take_ownership: bool = False):
+        """If take_ownership is set, added items are attached to the graph as is, without copying.
+        It is only safe if the updates are not used after applying (e.g. they were decoded from the wire),
+        because the graph will modify these items. Otherwise, each graph gets its own copy"""
         self.applied_updates = applied_updates
+        self.take_ownership = take_ownership
+        self._handlers: dict[type, typing.Callable[[Graph, typing.Any], None]] = {
+            EditScalarNode: self._apply_edit_scalar,
+            EditComment: self._apply_edit_comment,
+            AddMapItem: self._apply_add_map_item,
+            DeleteMapItem: self._apply_delete_map_item,
+            EditMapItemSortKey: self._apply_edit_map_item_sort_key,
+            AddListItem: self._apply_add_list_item,
+            DeleteListItem: self._apply_delete_list_item,
+            EditListItemSortKey: self._apply_edit_list_item_sort_key,
+        }
 
     def apply_updates(self, graph: Graph, updates: list[Update]) -> None:
         for update in updates:
@@ -17,25 +34,40 @@ class UpdatesApplier:
             self._apply_update(graph, update)
             self.applied_updates.add(update.update_id)
 
+    def apply_updates_batch(self, graph: Graph, updates: list[Update]) -> None:
+        """Gives the same result as apply_updates, but applies only one update of each type to each node.
+
+        Additions are applied first, in the given order, because other updates may refer to the added nodes.
+        All other updates are last-writer-wins registers (or idempotent deletions), so for each type and target node
+        only the update with the latest timestamp is applied. Among updates with equal timestamps the last one wins
+        """
+        new_updates: dict[UpdateId, Update] = {}
+        for update in updates:
+            if update.update_id not in self.applied_updates and update.update_id not in new_updates:
+                new_updates[update.update_id] = update
+
+        latest_updates: dict[tuple[type, NodeId], Update] = {}
+        for update in new_updates.values():
+            get_target_id = self._coalesced_update_targets.get(type(update))
+            if get_target_id is None:
+                self._apply_update(graph, update)
+                continue
+            key = (type(update), get_target_id(update))
+            if key not in latest_updates or latest_updates[key].timestamp <= update.timestamp:
+                latest_updates[key] = update
+
+        for update in latest_updates.values():
+            self._apply_update(graph, update)
+        for update in new_updates.values():  # the ids of coalesced updates are taken too
+            _observe_ids(graph, update)
+        self.applied_updates.update(new_updates.keys())
+
     def _apply_update(self, graph: Graph, update: Update) -> None:
-        if isinstance(update, EditScalarNode):
-            self._apply_edit_scalar(graph, update)
-        elif isinstance(update, EditComment):
-            self._apply_edit_comment(graph, update)
-        elif isinstance(update, AddMapItem):
-            self._apply_add_map_item(graph, update)
-        elif isinstance(update, DeleteMapItem):
-            self._apply_delete_map_item(graph, update)
-        elif isinstance(update, EditMapItemSortKey):
-            self._apply_edit_map_item_sort_key(graph, update)
-        elif isinstance(update, AddListItem):
-            self._apply_add_list_item(graph, update)
-        elif isinstance(update, DeleteListItem):
-            self._apply_delete_list_item(graph, update)
-        elif isinstance(update, EditListItemSortKey):
-            self._apply_edit_list_item_sort_key(graph, update)
-        else:
+        handler = self._handlers.get(type(update))
+        if handler is None:
             raise TypeError(f"Unexpected update type {update}")
+        handler(graph, update)
+        _observe_ids(graph, update)
 
     @staticmethod
     def _apply_edit_scalar(graph: Graph, update: EditScalarNode) -> None:
@@ -46,6 +78,7 @@ class UpdatesApplier:
         node.yaml_tag = update.new_yaml_tag
         node.value = update.new_value
         node.last_edit_ts = update.timestamp
+        graph.mark_changed(node)
 
     @staticmethod
     def _apply_edit_comment(graph: Graph, update: EditComment) -> None:
@@ -55,36 +88,35 @@ class UpdatesApplier:
             return
         node.comment = update.new_comment
         node.last_comment_edit_ts = update.timestamp
+        graph.mark_changed(node)
 
-    @staticmethod
-    def _apply_add_map_item(graph: Graph, update: AddMapItem) -> None:
+    def _apply_add_map_item(self, graph: Graph, update: AddMapItem) -> None:
         map_node = graph.get_node(update.mapping_node_id)
         assert isinstance(map_node, MappingNode)
-        map_node.items.append(deepcopy(update.new_item))
+        graph.add_map_item(map_node, update.new_item if self.take_ownership else deepcopy(update.new_item))
 
     @staticmethod
     def _apply_delete_map_item(graph: Graph, update: DeleteMapItem) -> None:
         item_value = graph.get_node(update.item_value_id)
-        item_value.is_deprecated = True
+        graph.deprecate_item_value(item_value)
 
     @staticmethod
     def _apply_edit_map_item_sort_key(graph: Graph, update: EditMapItemSortKey) -> None:
         item = graph.get_node(update.item_id)
         if item.last_timestamp_sort_key_edited > update.timestamp:
             return
-        item.sort_key = update.new_sort_key
+        graph.set_item_sort_key(item, update.new_sort_key)
+        item.last_timestamp_sort_key_edited = update.timestamp
 
-    @staticmethod
-    def _apply_add_list_item(graph: Graph, update: AddListItem) -> None:
+    def _apply_add_list_item(self, graph: Graph, update: AddListItem) -> None:
         list_node = graph.get_node(update.list_node_id)
         assert isinstance(list_node, SequenceNode)
-        list_node.items.append(deepcopy(update.new_item))
-        list_node.items.sort(key=lambda item: item.sort_key)
+        graph.add_list_item(list_node, update.new_item if self.take_ownership else deepcopy(update.new_item))
 
     @staticmethod
     def _apply_delete_list_item(graph: Graph, update: DeleteListItem) -> None:
         item_value = graph.get_node(update.item_id)
-        item_value.is_deprecated = True
+        graph.deprecate_item_value(item_value)
 
     @staticmethod
     def _apply_edit_list_item_sort_key(graph: Graph, update: EditListItemSortKey) -> None:
@@ -92,4 +124,23 @@ class UpdatesApplier:
         assert isinstance(item, SequenceNode.Item), item
         if item.last_timestamp_sort_key_edited > update.timestamp:
             return
-        item.sort_key = update.new_sort_key
+        graph.set_item_sort_key(item, update.new_sort_key)
+        item.last_timestamp_sort_key_edited = update.timestamp
+
+    # update type -> id of the node it modifies. Updates of other types (additions) can't be coalesced
+    _coalesced_update_targets: dict[type, typing.Callable[[typing.Any], NodeId]] = {
+        EditScalarNode: attrgetter("node_id"),
+        EditComment: attrgetter("node_id"),
+        DeleteMapItem: attrgetter("item_value_id"),
+        EditMapItemSortKey: attrgetter("item_id"),
+        DeleteListItem: attrgetter("item_id"),
+        EditListItemSortKey: attrgetter("item_id"),
+    }
+
+
+def _observe_ids(graph: Graph, update: Update) -> None:
+    """The graph never gives out the counter and the session index of the update again, see ids.py"""
+    graph.observe_id_counter(get_counter(update.update_id))
+    session_index = get_session_index_of_id(update.update_id)
+    if session_index is not None:
+        graph.observe_session_index(update.session_id, session_index)
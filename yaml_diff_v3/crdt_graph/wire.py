@@ -0,0 +1,116 @@
+"""Binary encoding of batches of CRDT graph updates, for the network and the update log.
+
+Version 3 layout of a batch:
+
+    magic "YDCU", format version (1 byte), then columns.ELEMENT_COLUMNS followed by _UPDATE_COLUMNS
+
+Each update has a type tag, its session id, timestamp, id and target (the node or item it changes). Other fields
+are stored in columns of their own, only for the updates which have them. Session ids and all other strings share
+the string table with the nodes, so each session id is stored once per batch.
+Items of AddMapItem and AddListItem are written to the element table in the order of the updates
+"""
+from yaml_diff_v3.crdt_graph import columns as cols
+from yaml_diff_v3.crdt_graph.nodes import MappingNode, SequenceNode
+from yaml_diff_v3.crdt_graph.updates import Update, EditScalarNode, EditComment, AddMapItem, DeleteMapItem, \
+    EditMapItemSortKey, AddListItem, DeleteListItem, EditListItemSortKey
+
+_MAGIC = b"YDCU"
+_VERSION = 3  # 1 had uuid string ids, 2 had yaml paths of the nodes
+
+# Type tags are indices in this tuple, new types must be appended
+_UPDATE_TYPES = (EditScalarNode, EditComment, AddMapItem, DeleteMapItem, EditMapItemSortKey, AddListItem,
+                 DeleteListItem, EditListItemSortKey)
+_TYPE_TAGS = {update_type: tag for tag, update_type in enumerate(_UPDATE_TYPES)}
+_TARGETS = {
+    EditScalarNode: "node_id",
+    EditComment: "node_id",
+    AddMapItem: "mapping_node_id",
+    DeleteMapItem: "item_value_id",
+    EditMapItemSortKey: "item_id",
+    AddListItem: "list_node_id",
+    DeleteListItem: "item_id",
+    EditListItemSortKey: "item_id",
+}
+_ITEM_TYPES = {AddMapItem: MappingNode.Item, AddListItem: SequenceNode.Item}
+
+_UPDATE_COLUMNS = (
+    ("update_types", cols.FIXED),
+    ("update_sessions", cols.FIXED),
+    ("update_timestamps", cols.VARINT),
+    ("update_ids", cols.FIXED),
+    ("update_targets", cols.FIXED),
+    ("update_tags", cols.FIXED),  # EditScalarNode
+    ("update_values", cols.FIXED),  # EditScalarNode
+    ("update_comments", cols.FIXED),  # EditComment, 0 is None, otherwise comment index + 1
+    ("update_sort_keys", cols.FIXED),  # Edit*SortKey
+)
+_UPDATE_STRING_COLUMNS = ("update_sessions", "update_tags", "update_values", "update_sort_keys")
+
+
+def encode_updates(updates: list[Update]) -> bytes:
+    writer = cols.TableWriter(cols.ELEMENT_COLUMNS + _UPDATE_COLUMNS,
+                              cols.ELEMENT_STRING_COLUMNS + _UPDATE_STRING_COLUMNS)
+    columns = writer.columns
+    for update in updates:
+        update_type = type(update)
+        if update_type not in _TYPE_TAGS:
+            raise TypeError(f"Unexpected update type {update}")
+        columns["update_types"].append(_TYPE_TAGS[update_type])
+        columns["update_sessions"].append(update.session_id)
+        columns["update_timestamps"].append(cols.zigzag(update.timestamp))
+        columns["update_ids"].append(update.update_id)
+        columns["update_targets"].append(getattr(update, _TARGETS[update_type]))
+        if update_type is EditScalarNode:
+            columns["update_tags"].append(update.new_yaml_tag)
+            columns["update_values"].append(update.new_value)
+        elif update_type is EditComment:
+            columns["update_comments"].append(writer.comment(update.new_comment))
+        elif update_type in _ITEM_TYPES:
+            writer.subtree(update.new_item)
+        elif update_type in (EditMapItemSortKey, EditListItemSortKey):
+            columns["update_sort_keys"].append(update.new_sort_key)
+    return writer.to_bytes(_MAGIC, _VERSION)
+
+
+def decode_updates(data: bytes) -> list[Update]:
+    """Nothing else refers to the decoded items, so they can be applied with UpdatesApplier(take_ownership=True)"""
+    with cols.paused_gc():
+        columns = cols.read_columns(data, _MAGIC, _VERSION, cols.ELEMENT_COLUMNS + _UPDATE_COLUMNS)
+        try:
+            return _decode_updates(columns)
+        # a column is shorter than the others refer to, or update columns have different lengths (zip strict)
+        except (IndexError, StopIteration, ValueError) as e:
+            raise cols.DecodeError("Inconsistent batch of updates") from e
+
+
+def _decode_updates(columns) -> list[Update]:
+    strings = cols.read_strings(columns)
+    comments = cols.read_comments(columns, strings)
+    items = iter(cols.read_subtrees(columns, strings, comments))
+    tags = iter(columns["update_tags"])
+    values = iter(columns["update_values"])
+    update_comments = iter(columns["update_comments"])
+    sort_keys = iter(columns["update_sort_keys"])
+
+    updates = []
+    for type_tag, session, timestamp, update_id, target in zip(
+            columns["update_types"], columns["update_sessions"], cols.unzigzag_all(columns["update_timestamps"]),
+            columns["update_ids"], columns["update_targets"], strict=True):
+        update_type = _UPDATE_TYPES[type_tag]
+        fields = (strings[session], timestamp, update_id, target)
+        if update_type is EditScalarNode:
+            updates.append(EditScalarNode(*fields, strings[next(tags)], strings[next(values)]))
+        elif update_type is EditComment:
+            updates.append(EditComment(*fields, comments[next(update_comments)]))
+        elif update_type in _ITEM_TYPES:
+            item = next(items)
+            if not isinstance(item, _ITEM_TYPES[update_type]):
+                raise cols.DecodeError(f"Unexpected item of {update_type.__name__}")
+            updates.append(update_type(*fields, item))
+        elif update_type in (EditMapItemSortKey, EditListItemSortKey):
+            updates.append(update_type(*fields, strings[next(sort_keys)]))
+        else:
+            updates.append(update_type(*fields))
+    if next(items, None) is not None:
+        raise cols.DecodeError("Inconsistent batch of updates")
+    return updates
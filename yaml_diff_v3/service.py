@@ -1,34 +1,57 @@
-from yaml_diff_v3 import crdt_graph, utils, yaml_graph, converter
-from yaml_diff_v3.crdt_graph import Timestamp, SessionId
+import weakref
+
+from yaml_diff_v3 import crdt_graph, yaml_graph, converter
+from yaml_diff_v3.crdt_graph import Timestamp, SessionId, IdGenerator
 
 
 class Service:
+    def __init__(self, parse_cache_max_bytes: int = 64 * 2 ** 20):
+        # All users editing the same revision send the same base text, so it is parsed once.
+        # Hit and miss counts are in self.parse_cache.stats
+        self.parse_cache = yaml_graph.YamlNodeCache(parse_cache_max_bytes)
+        # Each renderer keeps the text of its graph, so that only changed parts are rendered again
+        self._renderers: weakref.WeakKeyDictionary[crdt_graph.Graph, converter.YamlTextRenderer] = \
+            weakref.WeakKeyDictionary()
+        # Ids of new nodes and updates, see crdt_graph/ids.py. Index 0 is for the nodes of initial graphs,
+        # a session gets its index from the graph it edits
+        self._id_generators: dict[SessionId, IdGenerator] = {}
+
+    def get_id_generator(self, graph: crdt_graph.Graph, session_id: SessionId) -> IdGenerator:
+        session_index = graph.get_session_index(session_id)
+        if session_id not in self._id_generators or self._id_generators[session_id].session_index != session_index:
+            self._id_generators[session_id] = IdGenerator(session_index)
+        return self._id_generators[session_id]
+
     def make_initial_crdt_graph(self, yaml_text: str, ts: Timestamp) -> crdt_graph.Graph:
-        yaml_node = yaml_graph.deserialize(utils.loads_yaml_node(yaml_text))
-        crdt_node = converter.make_new_crdt_node_from_yaml(yaml_node, ts)
+        yaml_node = self.parse_cache.loads(yaml_text)
+        # The ids don't depend on anything but the text, so all replicas get the same initial graph
+        crdt_node = converter.make_new_crdt_node_from_yaml(yaml_node, ts, IdGenerator(0))
         return crdt_graph.Graph(root=crdt_node)
 
     def build_local_updates(self, old_graph: crdt_graph.Graph,
                             old_yaml_text: str, new_yaml_text: str,
                             session_id: SessionId, ts: Timestamp) -> list[crdt_graph.Update]:
-        old_yaml_node = yaml_graph.deserialize(utils.loads_yaml_node(old_yaml_text))
-        new_yaml_node = yaml_graph.deserialize(utils.loads_yaml_node(new_yaml_text))
+        old_yaml_node = self.parse_cache.loads(old_yaml_text)
+        new_yaml_node = self.parse_cache.loads(new_yaml_text)
         yaml_updates = yaml_graph.build_updates(old_yaml_node, new_yaml_node)
-        return converter.make_crdt_updates_from_yaml_updates(yaml_updates, session_id, ts, old_graph)
+        return converter.make_crdt_updates_from_yaml_updates(yaml_updates, session_id, ts, old_graph,
+                                                             self.get_id_generator(old_graph, session_id))
 
     def apply_updates(self, graph: crdt_graph.Graph, updates: list[crdt_graph.Update],
-                      applied_updates: set[crdt_graph.UpdateId]) -> crdt_graph.Graph:
-        applier = crdt_graph.UpdatesApplier(applied_updates)
-        applier.apply_updates(graph, updates)
+                      applied_updates: set[crdt_graph.UpdateId], take_ownership: bool = False) -> crdt_graph.Graph:
+        applier = crdt_graph.UpdatesApplier(applied_updates, take_ownership)
+        applier.apply_updates_batch(graph, updates)
         return graph
 
     def convert_to_yaml(self, graph: crdt_graph.Graph) -> str:
-        yaml_node = converter.crdt_graph_to_yaml_node(graph)
-        return utils.dumps_yaml_node(yaml_graph.serialize(yaml_node))
+        if graph not in self._renderers:
+            self._renderers[graph] = converter.YamlTextRenderer()
+        return self._renderers[graph].render(graph)
 
     def merge_with_empty_graph(self, base_yaml_text: str, yaml_text_1: str, yaml_text_2: str) -> str:
         graph = self.make_initial_crdt_graph(base_yaml_text, Timestamp(0))
         updates_1 = self.build_local_updates(graph, base_yaml_text, yaml_text_1, SessionId("session_1"), Timestamp(1))
         updates_2 = self.build_local_updates(graph, base_yaml_text, yaml_text_2, SessionId("session_2"), Timestamp(2))
-        self.apply_updates(graph, updates_1 + updates_2, applied_updates=set())
+        # The updates are not used anywhere else, so they can be attached to the graph without copying
+        self.apply_updates(graph, updates_1 + updates_2, applied_updates=set(), take_ownership=True)
         return self.convert_to_yaml(graph)
@@ -22,6 +22,7 @@ def test_two_map_inserts():
     service = Service()
     merged = service.merge_with_empty_graph(old_yaml_text, yaml_text_1, yaml_text_2)
     assert merged in ("A: 1\nB: 2\nC: 3\n", "A: 1\nC: 3\nB: 2\n")
+    assert (service.parse_cache.stats.misses, service.parse_cache.stats.hits) == (3, 2)  # the base is parsed once
 
 
 def test_two_list_inserts():
@@ -216,7 +217,7 @@ def test_file_2():
     with open(test_dir / "expected_regex.yml") as f:
         expected_regex = f.read()
     expected_regex = re.escape(expected_regex)
-    expected_regex = expected_regex.replace("RE_UUID", r"[\w-]+")
+    expected_regex = expected_regex.replace("RE_ID", r"'\d+'")
 
     service = Service()
     merged = service.merge_with_empty_graph(base_text, text_1, text_2)
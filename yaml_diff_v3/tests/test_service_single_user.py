@@ -8,6 +8,7 @@ def check(base_text, new_text):
     service = Service()
 
     graph = service.make_initial_crdt_graph(base_text, Timestamp(0))
+    service.convert_to_yaml(graph)  # the text after the updates is rendered incrementally
 
     session_id = SessionId("session_1")
     ts = Timestamp(1)
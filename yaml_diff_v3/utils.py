@@ -1,12 +1,24 @@
 import io
+import re
 import uuid
 from copy import deepcopy
 from textwrap import dedent
 
 from ruamel.yaml import YAML, RoundTripLoader
+from ruamel.yaml.resolver import Resolver
+
+try:
+    from _ruamel_yaml import CParser  # ruamel.yaml.clib, installed with ruamel.yaml on CPython
+except ImportError:
+    CParser = None
 
 yaml = YAML(typ="rt")
 
+# A comment, an anchor, an alias, a folded scalar (its folds are marked with "\a") or a directive. The check is
+# conservative: e.g. "#" inside a quoted string is also found, then the text is just parsed by the round-trip loader
+_ROUND_TRIP_ONLY_SYNTAX = re.compile(r"(?:^|\s)#|(?:^|[\s\[{,])[&*][^\s\]},]|>[-+0-9]*[ \t]*$|^%", re.MULTILINE)
+_BLOCK_SCALAR_START = re.compile(r"\|[-+0-9]*[ \t]*$")
+
 
 def load_yaml(path: str):
     with open(path) as f:
@@ -39,14 +51,51 @@ def _load_yaml_node(stream):
     return RoundTripLoader(stream).get_single_node()
 
 
+if CParser is not None:
+    class _CComposer(CParser, Resolver):
+        """Composes nodes in C with the same YAML 1.2 tag resolution as RoundTripLoader. Comments and names of
+        anchors are not kept"""
+
+        def __init__(self, stream):
+            CParser.__init__(self, stream)
+            Resolver.__init__(self, loadumper=self)
+
+
+def _has_empty_lines_outside_block_scalars(yaml_text: str) -> bool:
+    """Empty lines are kept by the round-trip loader as comments, unless they are inside a literal block scalar"""
+    block_indent: None | int = None  # indentation of the line which starts the current block scalar
+    has_empty_line = False
+    for line in yaml_text.splitlines():
+        content = line.lstrip(" ")
+        if not content.strip():
+            has_empty_line = True
+            continue
+        indent = len(line) - len(content)
+        if block_indent is not None and indent <= block_indent:
+            block_indent = None
+        if has_empty_line and block_indent is None:
+            return True  # also an empty line at the end of a block scalar, it is not a part of the scalar
+        has_empty_line = False
+        if block_indent is None and _BLOCK_SCALAR_START.search(line):
+            block_indent = indent
+    return has_empty_line
+
+
+def can_load_yaml_node_fast(yaml_text: str) -> bool:
+    """Whether the C composer gives the same yaml node as the round-trip loader, i.e. the text has no comments, empty
+    lines outside literal block scalars, anchors and folded scalars. Texts made by programs usually don't have them"""
+    return CParser is not None and _ROUND_TRIP_ONLY_SYNTAX.search(yaml_text) is None and \
+        not _has_empty_lines_outside_block_scalars(yaml_text)
+
+
 def _dump_yaml_node(node, stream):
     document = parse_yaml_node(node)
     yaml.dump(document, stream)
 
 
-def load_yaml_node(path: str):
+def load_yaml_node(path: str, fast: None | bool = None):
     with open(path) as f:
-        return _load_yaml_node(f)
+        return loads_yaml_node(f.read(), fast)
 
 
 def dump_yaml_node(yaml_data, path: str):
@@ -54,7 +103,13 @@ def dump_yaml_node(yaml_data, path: str):
         _dump_yaml_node(yaml_data, f)
 
 
-def loads_yaml_node(yaml_text: str):
+def loads_yaml_node(yaml_text: str, fast: None | bool = None):
+    """Parses the text with the round-trip loader, or with the C composer if fast is True or if fast is None and
+    can_load_yaml_node_fast(yaml_text). The C composer is not used if ruamel.yaml.clib is not installed"""
+    if fast is None:
+        fast = can_load_yaml_node_fast(yaml_text)
+    if fast and CParser is not None:
+        return _CComposer(yaml_text).get_single_node()
     with io.StringIO(yaml_text) as stream:
         return _load_yaml_node(stream)
 
@@ -66,6 +121,14 @@ def dumps_yaml_node(yaml_data):
         return stream.read()
 
 
+def emits_yaml_node(node) -> str:
+    """Dumps a node as is, without constructing python objects from it like dumps_yaml_node does.
+    Anchors of the node must be ruamel Anchor objects, as the representer makes them"""
+    with io.StringIO() as stream:
+        YAML(typ="rt").serialize(node, stream)  # serializer of a YAML instance can't be opened twice
+        return stream.getvalue()
+
+
 def my_dedent(text):
     text = dedent(text)
     text = text.lstrip("\n")
@@ -1,8 +1,9 @@
+from .cache import YamlNodeCache, CacheStats
 from .nodes import NodePath, NodePathKey, Node, ScalarNode, MappingNode, SequenceNode, ReferenceNode
 from .serialization import serialize, deserialize
 from .updates import Update, EditScalarNode, AddMapItem, DeleteMapItem
 from .updates_builder import build_updates
 
-__all__ = ["serialize", "deserialize", "build_updates", "NodePath", "NodePathKey",
+__all__ = ["serialize", "deserialize", "build_updates", "YamlNodeCache", "CacheStats", "NodePath", "NodePathKey",
            "Node", "MappingNode", "SequenceNode", "ReferenceNode",
            "Update", "EditScalarNode", "AddMapItem", "DeleteMapItem"]
@@ -0,0 +1,54 @@
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from yaml_diff_v3 import utils
+from yaml_diff_v3.yaml_graph import nodes
+from yaml_diff_v3.yaml_graph.serialization import deserialize
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class YamlNodeCache:
+    """LRU cache of deserialized yaml texts: text digest -> root of the yaml graph.
+
+    Yaml graph nodes are immutable, so the same root is shared by all callers. The cache is bounded by the total
+    size of the texts in bytes: memory of a yaml graph is roughly proportional to the size of its text"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.stats = CacheStats()
+        self._entries: OrderedDict[bytes, tuple[nodes.Node, int]] = OrderedDict()  # the last one is the most recent
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def loads(self, yaml_text: str) -> nodes.Node:
+        """yaml_graph.deserialize(utils.loads_yaml_node(yaml_text)), parsed once while the text is in the cache"""
+        text_bytes = yaml_text.encode()
+        digest = hashlib.blake2b(text_bytes, digest_size=16).digest()
+        if digest in self._entries:
+            self.stats.hits += 1
+            self._entries.move_to_end(digest)
+            return self._entries[digest][0]
+
+        self.stats.misses += 1
+        root = deserialize(utils.loads_yaml_node(yaml_text))
+        if len(text_bytes) <= self.max_bytes:
+            self._entries[digest] = (root, len(text_bytes))
+            self.size_bytes += len(text_bytes)
+            while self.size_bytes > self.max_bytes:
+                _, (_, size) = self._entries.popitem(last=False)
+                self.size_bytes -= size
+                self.stats.evictions += 1
+        return root
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size_bytes = 0
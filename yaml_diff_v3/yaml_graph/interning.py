@@ -0,0 +1,38 @@
+"""Sharing of values which repeat all over yaml and CRDT graphs: tags, mapping keys and comments.
+
+Every node has a tag, most mappings of a config have the same keys and many comments are the same (e.g. an empty
+line). Equal values are made the same object: it saves memory, and equality checks of the differ become identity
+checks, because tuple and dataclass comparison tries identity first. Strings are interned with sys.intern. Comment
+tokens and comments are frozen dataclasses, they are shared through tables of this module. The tables are bounded:
+when a table is full it is cleared, which only stops the sharing with the values interned before
+"""
+import sys
+
+from yaml_diff_v3.yaml_graph.nodes import Comment
+
+MAX_TABLE_SIZE = 100_000
+
+_tokens: dict[tuple[str, int], Comment.Token] = {}
+_comments: dict[tuple, Comment] = {}
+
+intern_string = sys.intern
+
+
+def intern_token(value: str, column: int) -> Comment.Token:
+    key = (value, column)
+    token = _tokens.get(key)
+    if token is None:
+        if len(_tokens) >= MAX_TABLE_SIZE:
+            _tokens.clear()
+        token = _tokens[key] = Comment.Token(sys.intern(value), column)
+    return token
+
+
+def intern_comment(values: tuple[None | Comment.Token | tuple[Comment.Token, ...], ...]) -> Comment:
+    """Tokens in values must be interned already: a table lookup hashes all of them"""
+    comment = _comments.get(values)
+    if comment is None:
+        if len(_comments) >= MAX_TABLE_SIZE:
+            _comments.clear()
+        comment = _comments[values] = Comment(values)
+    return comment
@@ -1,5 +1,5 @@
 import typing
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 NodePathKey: typing.TypeAlias = str | tuple[str, ...] | int
 NodePath: typing.TypeAlias = tuple[NodePathKey, ...]
@@ -16,18 +16,33 @@ class Comment:
     values: tuple[None | Token | tuple[Token, ...], ...]
 
 
+def _set_content_hash(obj, content_hash: int) -> None:
+    object.__setattr__(obj, "content_hash", content_hash)  # the dataclass is frozen
+
+
 @dataclass(frozen=True)
 class _NodeBase:
     path: NodePath
     tag: str
     anchor: None | str
     comment: None | Comment
+    # Merkle hash of the subtree, computed once on creation (children are always created first).
+    # Path is not taken into account, so equal subtrees in different places have equal hashes
+    content_hash: int = field(init=False, repr=False, compare=False)
+
+    def __hash__(self) -> int:
+        return hash((self.path, self.content_hash))
 
 
 @dataclass(frozen=True)
 class ScalarNode(_NodeBase):
     value: str
 
+    def __post_init__(self):
+        _set_content_hash(self, hash((ScalarNode, self.tag, self.value, self.anchor, self.comment)))
+
+    __hash__ = _NodeBase.__hash__
+
 
 @dataclass(frozen=True)
 class MappingNode(_NodeBase):
@@ -37,12 +52,21 @@ class MappingNode(_NodeBase):
         value: "Node"
         path: NodePath
         path_key: NodePathKey
+        content_hash: int = field(init=False, repr=False, compare=False)
+
+        def __post_init__(self):
+            _set_content_hash(self, hash((self.path_key, self.key.content_hash, self.value.content_hash)))
+
+        def __hash__(self) -> int:
+            return hash((self.path, self.content_hash))
 
     items: typing.OrderedDict[str, Item]
 
-    def __hash__(self) -> int:
-        """This is valid if self.items is not edited by anyone"""
-        return hash((self.path, self.tag, tuple(self.items.items())))
+    def __post_init__(self):
+        items_hashes = tuple(item.content_hash for item in self.items.values())
+        _set_content_hash(self, hash((MappingNode, self.tag, self.anchor, self.comment, items_hashes)))
+
+    __hash__ = _NodeBase.__hash__  # This is valid if self.items is not edited by anyone
 
 
 @dataclass(frozen=True)
@@ -51,13 +75,33 @@ class SequenceNode(_NodeBase):
     class Item:
         value: "Node"
 
+        @property
+        def content_hash(self) -> int:
+            return self.value.content_hash
+
+        def __hash__(self) -> int:
+            return hash(self.value)
+
     values: tuple[Item, ...]
 
+    def __post_init__(self):
+        values_hashes = tuple(item.content_hash for item in self.values)
+        _set_content_hash(self, hash((SequenceNode, self.tag, self.anchor, self.comment, values_hashes)))
+
+    __hash__ = _NodeBase.__hash__
+
 
 @dataclass(frozen=True)
 class ReferenceNode:
     path: NodePath
     referred_node: "Node"  # a reference to an already added node
+    content_hash: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        _set_content_hash(self, hash((ReferenceNode, self.referred_node.content_hash)))
+
+    def __hash__(self) -> int:
+        return hash((self.path, self.content_hash))
 
 
 Node = typing.Union[ScalarNode, MappingNode, SequenceNode, ReferenceNode]
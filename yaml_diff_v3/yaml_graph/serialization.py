@@ -4,6 +4,7 @@ from ruamel import yaml
 from ruamel.yaml.error import FileMark
 
 from yaml_diff_v3.yaml_graph import nodes
+from yaml_diff_v3.yaml_graph.interning import intern_string, intern_token, intern_comment
 from yaml_diff_v3.yaml_graph.nodes import NodePath, NodePathKey
 
 
@@ -28,15 +29,15 @@ def _deserialize_comment(yaml_comment: None | list[None | yaml.CommentToken]) ->
         if token is None:
             tokens.append(None)
         elif isinstance(token, yaml.CommentToken):
-            tokens.append(nodes.Comment.Token(token.value, token.column))
+            tokens.append(intern_token(token.value, token.column))
         else:
             assert isinstance(token, list)
             assert all(isinstance(inner, yaml.CommentToken) for inner in token)
-            tokens.append(tuple(nodes.Comment.Token(inner.value, inner.column) for inner in token))
-    return nodes.Comment(tuple(tokens))
+            tokens.append(tuple(intern_token(inner.value, inner.column) for inner in token))
+    return intern_comment(tuple(tokens))
 
 
-def _serialize_comment(node_comment: None | nodes.Comment) -> None | \
+def serialize_comment(node_comment: None | nodes.Comment) -> None | \
                                                               list[None | yaml.CommentToken | list[yaml.CommentToken]]:
     if node_comment is None:
         return None
@@ -53,7 +54,7 @@ def _serialize_comment(node_comment: None | nodes.Comment) -> None | \
     return result
 
 
-def _get_default_yaml_kwargs():
+def get_default_yaml_kwargs():
     return dict(
         start_mark=_make_dummy_mark(),  # Can't be None
         end_mark=_make_dummy_mark(),
@@ -62,18 +63,18 @@ def _get_default_yaml_kwargs():
 
 def _yaml_node_as_path_key(serialized: yaml.Node) -> NodePathKey:
     if isinstance(serialized, yaml.ScalarNode):
-        return serialized.value
+        return intern_string(serialized.value)
     if isinstance(serialized, yaml.SequenceNode) and len(serialized.value) == 2 and \
             all(isinstance(item, yaml.ScalarNode) for item in serialized.value):
-        return tuple(item.value for item in serialized.value)
+        return tuple(intern_string(item.value) for item in serialized.value)
     raise TypeError("Only a scalar or a pair of scalars can be a key")
 
 
-def _deserialize_scalar(serialized: yaml.ScalarNode, path: NodePath) -> nodes.ScalarNode:
+def _deserialize_scalar(serialized: yaml.ScalarNode, path: NodePath, is_key: bool) -> nodes.ScalarNode:
     return nodes.ScalarNode(
         path=path,
-        tag=serialized.tag,
-        value=serialized.value,
+        tag=intern_string(serialized.tag),
+        value=intern_string(serialized.value) if is_key else serialized.value,  # keys repeat, values mostly do not
         anchor=serialized.anchor,
         comment=_deserialize_comment(serialized.comment),
     )
@@ -86,8 +87,8 @@ def _serialize_scalar(node: nodes.ScalarNode) -> yaml.ScalarNode:
         value=node.value,
         style=style,
         anchor=node.anchor,
-        comment=_serialize_comment(node.comment),
-        **_get_default_yaml_kwargs(),
+        comment=serialize_comment(node.comment),
+        **get_default_yaml_kwargs(),
     )
 
 
@@ -99,13 +100,13 @@ def _deserialize_mapping(serialized: yaml.MappingNode, path: NodePath,
     for key, value in serialized.value:
         path_key: NodePathKey = _yaml_node_as_path_key(key)
         item_path = path + (path_key,)
-        key_node = _deserialize_node(key, item_path + (0,), deserialized_nodes)
+        key_node = _deserialize_node(key, item_path + (0,), deserialized_nodes, is_key=True)
         value_node = _deserialize_node(value, item_path + (1,), deserialized_nodes)
         items[path_key] = nodes.MappingNode.Item(key=key_node, value=value_node, path=item_path, path_key=path_key)
 
     return nodes.MappingNode(
         path=path,
-        tag=serialized.tag,
+        tag=intern_string(serialized.tag),
         items=items,
         anchor=serialized.anchor,
         comment=_deserialize_comment(serialized.comment),
@@ -119,8 +120,8 @@ def _serialize_mapping(node: nodes.MappingNode, serialized_nodes: dict[nodes.Nod
                 _serialize_node(item.value, serialized_nodes)) for item in node.items.values()],
         flow_style=None,  # TODO: fill
         anchor=node.anchor,
-        comment=_serialize_comment(node.comment),
-        **_get_default_yaml_kwargs(),
+        comment=serialize_comment(node.comment),
+        **get_default_yaml_kwargs(),
     )
     serialized.merge = None  # TODO: find out when it is not None
     return serialized
@@ -130,7 +131,7 @@ def _deserialize_sequence(serialized: yaml.SequenceNode, path: NodePath,
                           deserialized_nodes: dict[yaml.Node, nodes.Node]) -> nodes.SequenceNode:
     return nodes.SequenceNode(
         path=path,
-        tag=serialized.tag,
+        tag=intern_string(serialized.tag),
         values=tuple(nodes.SequenceNode.Item(_deserialize_node(value, path + (i,), deserialized_nodes))
                      for i, value in enumerate(serialized.value)),
         anchor=serialized.anchor,
@@ -144,13 +145,13 @@ def _serialize_sequence(node: nodes.SequenceNode, serialized_nodes: dict[nodes.N
         value=[_serialize_node(item.value, serialized_nodes) for item in node.values],
         flow_style=None,  # TODO: fill
         anchor=node.anchor,
-        comment=_serialize_comment(node.comment),
-        **_get_default_yaml_kwargs(),
+        comment=serialize_comment(node.comment),
+        **get_default_yaml_kwargs(),
     )
 
 
-def _deserialize_node(serialized: yaml.Node, path: NodePath,
-                      deserialized_nodes: dict[yaml.Node, nodes.Node]) -> nodes.Node:
+def _deserialize_node(serialized: yaml.Node, path: NodePath, deserialized_nodes: dict[yaml.Node, nodes.Node],
+                      is_key: bool = False) -> nodes.Node:
     if serialized in deserialized_nodes:
         assert serialized.anchor is not None
         assert serialized.anchor == deserialized_nodes[serialized].anchor
@@ -158,7 +159,7 @@ def _deserialize_node(serialized: yaml.Node, path: NodePath,
 
     node: nodes.Node
     if isinstance(serialized, yaml.ScalarNode):
-        node = _deserialize_scalar(serialized, path)
+        node = _deserialize_scalar(serialized, path, is_key)
     elif isinstance(serialized, yaml.MappingNode):
         node = _deserialize_mapping(serialized, path, deserialized_nodes)
     elif isinstance(serialized, yaml.SequenceNode):
@@ -0,0 +1,29 @@
+from yaml_diff_v3 import yaml_graph
+from yaml_diff_v3.utils import loads_yaml_node
+
+
+def test_hits_and_misses():
+    cache = yaml_graph.YamlNodeCache(max_bytes=1000)
+    root = cache.loads("A: 1\n")
+    assert root == yaml_graph.deserialize(loads_yaml_node("A: 1\n"))
+    assert cache.loads("A: 1\n") is root
+    assert cache.loads("A: 2\n") is not root
+    assert cache.stats == yaml_graph.CacheStats(hits=1, misses=2, evictions=0)
+    assert len(cache) == 2 and cache.size_bytes == 10
+
+
+def test_eviction():
+    cache = yaml_graph.YamlNodeCache(max_bytes=12)
+    texts = ["A: 1\n", "B: 2\n", "C: 3\n"]
+    root_a = cache.loads(texts[0])
+    cache.loads(texts[1])
+    cache.loads(texts[0])  # now "B" is the least recently used
+    cache.loads(texts[2])
+    assert cache.stats.evictions == 1 and len(cache) == 2 and cache.size_bytes == 10
+    assert cache.loads(texts[0]) is root_a
+    assert cache.stats.misses == 3
+    cache.loads(texts[1])
+    assert cache.stats.misses == 4
+
+    cache.loads("D: " + "x" * 100 + "\n")  # larger than the cache, it is not stored
+    assert cache.stats.evictions == 2 and cache.size_bytes == 10
@@ -0,0 +1,40 @@
+from yaml_diff_v3 import yaml_graph
+from yaml_diff_v3.crdt_graph import Timestamp
+from yaml_diff_v3.service import Service
+from yaml_diff_v3.utils import loads_yaml_node, my_dedent
+from yaml_diff_v3.yaml_graph import interning
+
+TEXT = my_dedent("""
+    - name: one  # same
+      inputs: [a]
+
+    - name: two  # same
+      inputs: [b]
+""")
+
+
+def test_deserialized_values_are_shared():
+    first, second = yaml_graph.deserialize(loads_yaml_node(TEXT)).values
+    other_first = yaml_graph.deserialize(loads_yaml_node(TEXT)).values[0]
+    for item in (second, other_first):
+        assert item.value.tag is first.value.tag
+        assert item.value.items["name"].key.value is first.value.items["name"].key.value
+        assert item.value.items["inputs"].value.tag is first.value.items["inputs"].value.tag
+        assert item.value.items["name"].value.comment is first.value.items["name"].value.comment
+    assert other_first.value.items["inputs"].value.comment is first.value.items["inputs"].value.comment
+    assert list(first.value.items)[0] is list(second.value.items)[0]  # path keys
+
+
+def test_crdt_values_are_shared():
+    first, second = (item.value for item in Service().make_initial_crdt_graph(TEXT, Timestamp(0)).root.items)
+    assert first.yaml_tag is second.yaml_tag
+    assert first.items[0].key.value is second.items[0].key.value
+    assert first.items[0].value.comment is second.items[0].value.comment
+
+
+def test_tables_are_bounded(monkeypatch):
+    monkeypatch.setattr(interning, "MAX_TABLE_SIZE", 2)
+    tokens = [interning.intern_token(f"# {i}\n", 0) for i in range(3)]
+    assert interning.intern_token("# 2\n", 0) is tokens[2]
+    assert interning.intern_token("# 0\n", 0) == tokens[0]
+    assert len(interning._tokens) <= 2
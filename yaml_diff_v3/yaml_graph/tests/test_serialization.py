@@ -1,5 +1,6 @@
 import pytest
 
+from yaml_diff_v3 import utils
 from yaml_diff_v3.utils import my_dedent, loads_yaml_node, dumps_yaml_node, get_tag
 from yaml_diff_v3.yaml_graph import serialization
 from yaml_diff_v3.yaml_graph.nodes import MappingNode, ScalarNode
@@ -15,6 +16,9 @@ def check(text: str):
     output_text = dumps_yaml_node(serialized_2)
     assert output_text == text
 
+    if utils.can_load_yaml_node_fast(text):
+        assert serialization.deserialize(loads_yaml_node(text, fast=True)) == root
+
 
 def test_list():
     check("""
@@ -132,3 +136,41 @@ def test_merge():
         B: *a
         <<: *a
     """)
+
+
+def test_content_hash():
+    root = serialization.deserialize(loads_yaml_node(my_dedent("""
+        A: {x: [1, 2]}
+        B: {x: [1, 2]}
+        C: {x: [2, 1]}
+        D: {x: [1, 2]}  # Comment
+    """)))
+    a, b, c, d = (item.value for item in root.items.values())
+    assert a.path != b.path
+    assert a.content_hash == b.content_hash
+    assert a.items["x"].content_hash == b.items["x"].content_hash
+    assert a.content_hash != c.content_hash
+    assert a.content_hash != d.content_hash
+    assert a != b and hash(a) != hash(b)  # nodes in different places are still different
+
+
+@pytest.mark.skipif(utils.CParser is None, reason="ruamel.yaml.clib is not installed")
+def test_fast_load():
+    text = my_dedent("""
+        A: [1, {b: 2.5}]
+        B: !Atom
+          x: 'quoted'
+          y: |
+            multi
+
+            line
+        <<: {c: true}
+    """)
+    assert utils.can_load_yaml_node_fast(text)
+    assert serialization.deserialize(loads_yaml_node(text, fast=True)) == \
+           serialization.deserialize(loads_yaml_node(text, fast=False))
+
+    for round_trip_only_text in ["A: 1  # comment\n", "# comment\nA: 1\n", "A: 1\n\nB: 2\n", "A: |\n  x\n\nB: 1\n",
+                                 "A: &a 1\nB: *a\n", "A: [*a]\n", "A: >\n  folded\n", "%YAML 1.1\n---\nA: 1\n"]:
+        assert not utils.can_load_yaml_node_fast(round_trip_only_text)
+    assert utils.can_load_yaml_node_fast("A: x#y\nB: a & b\nC: a*b\n")
@@ -320,3 +320,42 @@ def test_shuffle_and_delete_list_item():
         DeleteListItem(path=(0, 1)),
         DeleteListItem(path=(0, 3)),
     ])
+
+
+def test_change_map_value_type():
+    check("A: 1\nB: 2", "A: [1]\nB: 2", [
+        DeleteMapItem(path=("A", 1)),
+        AddMapItem(map_path=(), prev_item_key=None, next_item_key="B", new_item=MappingNode.Item(
+            path=("A",),
+            path_key="A",
+            key=ScalarNode(path=("A", 0), tag=get_tag("str"), value="A", anchor=None, comment=None),
+            value=SequenceNode(path=("A", 1), tag=get_tag("seq"), anchor=None, comment=None, values=(
+                SequenceNode.Item(ScalarNode(path=("A", 1, 0), tag=get_tag("int"), value="1", anchor=None,
+                                             comment=None)),
+            )),
+        )),
+    ])
+
+
+def test_edit_list_items_with_similar_content():
+    check("""
+        - name: a
+          X: x
+        - name: b
+          X: x
+    """, """
+        - name: b
+          X: x
+          Y: y
+        - name: a
+          X: xx
+    """, [
+        EditListOrder(list_path=(), new_order=(1, 0)),
+        AddMapItem(map_path=(1,), prev_item_key="X", next_item_key=None, new_item=MappingNode.Item(
+            path=(0, "Y"),
+            path_key="Y",
+            key=ScalarNode(path=(0, "Y", 0), tag=get_tag("str"), value="Y", anchor=None, comment=None),
+            value=ScalarNode(path=(0, "Y", 1), tag=get_tag("str"), value="y", anchor=None, comment=None),
+        )),
+        EditScalarNode(path=(0, "X", 1), tag=get_tag("str"), value="xx"),
+    ])
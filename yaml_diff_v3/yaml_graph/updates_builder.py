@@ -1,346 +1,222 @@
-import re
-from collections import OrderedDict, defaultdict
+from collections import defaultdict
 
-import deepdiff.operator
-from deepdiff import DeepDiff
-
-from yaml_diff_v3.yaml_graph.nodes import Node, ScalarNode, MappingNode, ReferenceNode, Comment, SequenceNode, \
-    NodePathKey
+from yaml_diff_v3.yaml_graph.nodes import Node, ScalarNode, MappingNode, ReferenceNode, SequenceNode
 from yaml_diff_v3.yaml_graph.updates import Update, EditScalarNode, AddMapItem, DeleteMapItem, EditComment, \
     EditMapOrder, AddListItem, EditListOrder, DeleteListItem
 
+# Unmatched list items of the same type are considered to be one edited item if the distance between them is lower.
+# See _TreeDiffer._distance
+_CUTOFF_DISTANCE_FOR_PAIRS = 0.3
+# If there are more candidate pairs in a list, unmatched items are paired in order of their appearance
+_MAX_PAIRS_TO_COMPARE = 10_000
 
-def _has_comment_parent(deepdiff_item):
-    while not isinstance(deepdiff_item.t1, Node):
-        if isinstance(deepdiff_item.t1, Comment) or isinstance(deepdiff_item.t2, Comment):
-            return True
-        deepdiff_item = deepdiff_item.up
-    return False
-
-
-def _get_node_parent(deepdiff_item) -> tuple[Node, Node]:
-    while not isinstance(deepdiff_item.t1, Node):
-        deepdiff_item = deepdiff_item.up
-    assert isinstance(deepdiff_item.t1, type(deepdiff_item.t2)), "Type change should be handled by other means"
-    return deepdiff_item.t1, deepdiff_item.t2
-
-
-def _build_values_changed(items) -> list[EditScalarNode]:
-    nodes = set()  # I need a set because same node appears several times (.tag and .value are different changes)
-    for item in items:
-        if isinstance(item.t1, SequenceNode.Item):
-            old_node = item.t1.value
-            new_node = item.t2.value
-        else:
-            parent = item.up
-            old_node, new_node = parent.t1, parent.t2
-
-        assert isinstance(old_node, ScalarNode), f"Only a scalar can be edited {old_node}"
-        assert isinstance(new_node, ScalarNode), f"Only a scalar can be edited {new_node}"
-        nodes.add((old_node.path, new_node))
-
-    return [EditScalarNode(path=old_node_path, tag=node.tag, value=node.value) for old_node_path, node in nodes]
-
-
-def _build_edit_comment(items) -> list[EditComment]:
-    nodes = set()
-    for item in items:
-        old_node, new_node = _get_node_parent(item)
-        nodes.add((old_node.path, new_node))
-    return [EditComment(path=old_node_path, new_comment=node.comment) for old_node_path, node in nodes]
-
-
-def _get_prev_item_in_ordered_dict(checked, ordered_dict: OrderedDict):
-    prev_item = None
-    for item in ordered_dict.values():
-        if item is checked:
-            return prev_item
-        prev_item = item
-    raise KeyError
-
-
-def _get_next_item_in_ordered_dict(checked, ordered_dict: OrderedDict, key_filter):
-    checked_found = False
-    for key, item in ordered_dict.items():
-        if not checked_found:
-            if item is checked:
-                checked_found = True
-            continue
-
-        if key in key_filter:
-            return item
-
-    if not checked_found:
-        raise KeyError
-    return None
 
-
-def _build_dictionary_item_added(items) -> list[Update]:
-    updates = []
-    for item in items:
-        added_item = item.t2
-        assert isinstance(added_item, MappingNode.Item)
-        old_mapping_node = item.up.up.t1  # Item -> dict of items -> MappingNode
-        assert isinstance(old_mapping_node, MappingNode)
-
-        old_dict, new_dict = item.up.t1, item.up.t2
-        assert isinstance(old_dict, OrderedDict) and isinstance(new_dict, OrderedDict)
-        prev_item = _get_prev_item_in_ordered_dict(added_item, new_dict)
-        next_item = _get_next_item_in_ordered_dict(added_item, new_dict, old_dict.keys())
-
-        updates.append(AddMapItem(
-            map_path=old_mapping_node.path,
-            prev_item_key=None if prev_item is None else prev_item.path_key,
-            next_item_key=None if next_item is None else next_item.path_key,
-            new_item=added_item,
-        ))
-    return updates
-
-
-def _build_dictionary_item_removed(items) -> list[Update]:
-    updates = []
-    for item in items:
-        deleted_item = item.t1
-        assert isinstance(deleted_item, MappingNode.Item)
-        key_path = deleted_item.key.path
-        item_path = key_path[:-1]
-        value_path = item_path + (1,)
-        updates.append(DeleteMapItem(value_path))  # all operations with item are performed via its value
-    return updates
-
-
-def _build_list_item_removed(items) -> list[Update]:
-    updates = []
-    for item in items:
-        deleted_item = item.t1
-        assert isinstance(deleted_item, SequenceNode.Item)
-        path = deleted_item.value.path
-        updates.append(DeleteListItem(path))
-    return updates
-
-
-def _get_index(path: str) -> int:
-    # root.values[1] -> 1
-    match = re.fullmatch(r".+\[(\d+)]", path)
-    assert match is not None, path
-    return int(match.group(1))
-
-
-def _build_list_item_added(items) -> list[Update]:
-    updates = []
-    for item in items:
-        added_item = item.t2
-        assert isinstance(added_item, SequenceNode.Item)
-        insertion_index = _get_index(item.path())
-        old_list = item.up.up.t1  # Item -> tuple of items -> SequenceNode
-        assert isinstance(old_list, SequenceNode)
-        updates.append(AddListItem(
-            list_path=old_list.path,
-            insertion_index=insertion_index,
-            new_item=added_item,
-        ))
-    return updates
-
-
-def _match_mapping_order(old_mapping: MappingNode,
-                         new_mapping: MappingNode) -> tuple[tuple[NodePathKey, ...], tuple[NodePathKey, ...]]:
-    common_keys = old_mapping.items.keys() & new_mapping.items.keys()
-    old_order = tuple(key for key, item in old_mapping.items.items() if key in common_keys)
-    new_order = tuple(key for key, item in new_mapping.items.items() if key in common_keys)
-    return old_order, new_order
-
-
-class _DictOrderOperator(deepdiff.operator.BaseOperator):
+class _TreeDiffer:
     def __init__(self):
-        super().__init__(types=[OrderedDict])  # only pairs of this type will be processed
-
-    def give_up_diffing(self, level, diff_instance) -> bool:
-        parent = level.up
-        assert isinstance(parent.t1, MappingNode) and isinstance(parent.t2, MappingNode)
-        old_mapping, new_mapping = parent.t1, parent.t2
-        old_order, new_order = _match_mapping_order(old_mapping, new_mapping)
-        if old_order != new_order:
-            new_order_keys = tuple(new_mapping.items[key].path_key for key in new_order)
-            diff_instance.custom_report_result(
-                "edit_dict_order", level, {"map_path": old_mapping.path, "new_order": new_order_keys},
-            )
-        return False  # do not stop diffing nested objects
-
-
-class _ListOrderOperator(deepdiff.operator.BaseOperator):
-    def __init__(self):
-        super().__init__(types=[SequenceNode, SequenceNode.Item])
-        # all pairs of old SequenceNode and corresponding new SequenceNode
-        self.compared_nodes: list[tuple[SequenceNode, SequenceNode]] = []
-        # id(edited item) -> original item
-        self.original_items: dict[int, SequenceNode.Item] = {}
-        self.root_diff = None
-
-    def give_up_diffing(self, level, diff_instance) -> bool:
-        if self.root_diff is None:
-            self.root_diff = diff_instance
-
-        if diff_instance is not self.root_diff:  # This is inner deepdiff call. Skip it
-            return False
-
-        if isinstance(level.t1, SequenceNode):
-            old_list, new_list = level.t1, level.t2
-            assert isinstance(old_list, SequenceNode) and isinstance(new_list, SequenceNode)
-            self.compared_nodes.append((old_list, new_list))
+        self.order_updates: list[Update] = []
+        self.updates: list[Update] = []
+        self.comment_updates: list[EditComment] = []
+        self._sizes: dict[int, int] = {}  # id(node) -> number of its attributes which are compared
+
+    def _size(self, node: Node) -> int:
+        node_id = id(node)
+        if node_id in self._sizes:
+            return self._sizes[node_id]
+
+        result: int
+        if isinstance(node, ScalarNode):
+            result = 4  # tag, value, anchor, comment
+        elif isinstance(node, MappingNode):
+            result = 3 + sum(self._size(item.key) + self._size(item.value) for item in node.items.values())
+        elif isinstance(node, SequenceNode):
+            result = 3 + sum(self._size(item.value) for item in node.values)
+        elif isinstance(node, ReferenceNode):
+            result = 1
         else:
-            old_item, edited_item = level.t1, level.t2
-            assert isinstance(old_item, SequenceNode.Item) and isinstance(edited_item, SequenceNode.Item)
-            if id(edited_item) in self.original_items:
-                assert self.original_items[id(edited_item)] is old_item
-            elif isinstance(old_item.value, type(edited_item.value)):
-                self.original_items[id(edited_item)] = old_item
-        return False
+            raise TypeError(f"Unexpected graph node {node}")
+
+        self._sizes[node_id] = result
+        return result
 
-    def _match_list_items(self, old_list: SequenceNode, new_list: SequenceNode, hashes) -> list[tuple[int, int]]:
-        hash_to_old_index = defaultdict(list)
+    def _cost(self, old_node: Node, new_node: Node) -> tuple[int, int]:
+        """Approximate number of attributes of the old and of the new subtree which are not present in the other one"""
+        if old_node.content_hash == new_node.content_hash:
+            return 0, 0
+        if type(old_node) is not type(new_node):
+            return self._size(old_node), self._size(new_node)
+
+        cost = 0 if isinstance(old_node, ReferenceNode) else int(old_node.comment != new_node.comment)
+        old_cost, new_cost = cost, cost
+        if isinstance(old_node, ScalarNode):
+            cost = (old_node.tag != new_node.tag) + (old_node.value != new_node.value) + \
+                   (old_node.anchor != new_node.anchor)
+            old_cost, new_cost = old_cost + cost, new_cost + cost
+        elif isinstance(old_node, MappingNode):
+            for key, old_item in old_node.items.items():
+                new_item = new_node.items.get(key)
+                if new_item is None:
+                    old_cost += self._size(old_item.key) + self._size(old_item.value)
+                    continue
+                for old_child, new_child in ((old_item.key, new_item.key), (old_item.value, new_item.value)):
+                    child_old_cost, child_new_cost = self._cost(old_child, new_child)
+                    old_cost, new_cost = old_cost + child_old_cost, new_cost + child_new_cost
+            for key, new_item in new_node.items.items():
+                if key not in old_node.items:
+                    new_cost += self._size(new_item.key) + self._size(new_item.value)
+        elif isinstance(old_node, SequenceNode):
+            _, unmatched_old, unmatched_new = self._match_equal_items(old_node, new_node)
+            for i, j in zip(unmatched_old, unmatched_new):  # cheap approximation of the pairing
+                child_old_cost, child_new_cost = self._cost(old_node.values[i].value, new_node.values[j].value)
+                old_cost, new_cost = old_cost + child_old_cost, new_cost + child_new_cost
+            paired_count = min(len(unmatched_old), len(unmatched_new))
+            old_cost += sum(self._size(old_node.values[i].value) for i in unmatched_old[paired_count:])
+            new_cost += sum(self._size(new_node.values[j].value) for j in unmatched_new[paired_count:])
+        return old_cost, new_cost
+
+    def _distance(self, old_node: Node, new_node: Node) -> float:
+        """The smallest share of a subtree which is not present in the other subtree. E.g. 0 if one contains another"""
+        old_cost, new_cost = self._cost(old_node, new_node)
+        return min(old_cost / self._size(old_node), new_cost / self._size(new_node))
+
+    def _match_equal_items(self, old_list: SequenceNode,
+                           new_list: SequenceNode) -> tuple[list[tuple[int, int]], list[int], list[int]]:
+        """Returns pairs of equal items (old index, new index) and indices of items which were not matched"""
+        hash_to_old_indices = defaultdict(list)
         for i, old_item in enumerate(old_list.values):
-            hash_to_old_index[hashes[old_item]].append(i)
-        hash_to_old_index = {k: v[::-1] for k, v in hash_to_old_index.items()}
+            hash_to_old_indices[old_item.value.content_hash].append(i)
+        hash_to_old_indices = {k: v[::-1] for k, v in hash_to_old_indices.items()}
 
-        result = []
+        pairs = []
+        unmatched_new = []
         for j, new_item in enumerate(new_list.values):
-            new_item_hash = hashes[new_item]
-            if id(new_item) in self.original_items:
-                old_item = self.original_items[id(new_item)]
-                old_item_hash = hashes[old_item]
-            elif new_item_hash in hash_to_old_index:
-                old_item_hash = new_item_hash
-            else:  # newly added item
-                continue
-            matching_old_indices = hash_to_old_index[old_item_hash]
-            i = matching_old_indices.pop()  # get the smallest index
+            matching_old_indices = hash_to_old_indices.get(new_item.value.content_hash)
             if not matching_old_indices:
-                del hash_to_old_index[old_item_hash]
-            result.append((i, j))
-        return result
-
-    def _match_lists_recursively(self, old_list: SequenceNode, new_list: SequenceNode, hashes, used_pairs: set):
-        if (id(old_list), id(new_list)) in used_pairs:
-            return []
-        used_pairs.add((id(old_list), id(new_list)))
-        pairs = self._match_list_items(old_list, new_list, hashes)
-        result = []
-        if not all(pairs[i - 1] < pairs[i] for i in range(1, len(pairs))):
-            # If both sequences are ascending, no permutations were made. Only insertions and deletions
-            result.append(EditListOrder(list_path=old_list.path, new_order=tuple(i for i, j in pairs)))
-        for i, j in pairs:
-            old_item: SequenceNode.Item = old_list.values[i]
-            new_item: SequenceNode.Item = new_list.values[j]
-            if not isinstance(old_item.value, type(new_item.value)):
-                continue  # type was changed, this is not a match. Process it outside as delete + add
-            if isinstance(old_item.value, SequenceNode):
-                result += self._match_lists_recursively(old_item.value, new_item.value, hashes, used_pairs)
-            elif isinstance(old_item.value, MappingNode):
-                result += self._match_mappings_recursively(old_item.value, new_item.value, hashes, used_pairs)
-        return result
-
-    def _match_mappings_recursively(self, old_mapping: MappingNode,
-                                    new_mapping: MappingNode, hashes, used_pairs: set):
-        if (id(old_mapping), id(new_mapping)) in used_pairs:
-            return []
-        used_pairs.add((id(old_mapping), id(new_mapping)))
-        old_order, new_order = _match_mapping_order(old_mapping, new_mapping)
-        result = []
+                unmatched_new.append(j)
+                continue
+            pairs.append((matching_old_indices.pop(), j))  # get the smallest index
+        matched_old = {i for i, j in pairs}
+        unmatched_old = [i for i in range(len(old_list.values)) if i not in matched_old]
+        return pairs, unmatched_old, unmatched_new
+
+    def _pair_edited_items(self, old_list: SequenceNode, new_list: SequenceNode,
+                           unmatched_old: list[int], unmatched_new: list[int]) -> list[tuple[int, int]]:
+        """Finds the items which were edited, not replaced. Items of different types are never paired"""
+        def can_be_paired(i: int, j: int) -> bool:
+            old_value, new_value = old_list.values[i].value, new_list.values[j].value
+            return type(old_value) is type(new_value) and \
+                self._distance(old_value, new_value) < _CUTOFF_DISTANCE_FOR_PAIRS
+
+        pairs = []
+        if len(unmatched_old) * len(unmatched_new) > _MAX_PAIRS_TO_COMPARE:
+            old_by_type = defaultdict(list)
+            for i in unmatched_old:
+                old_by_type[type(old_list.values[i].value)].append(i)
+            new_by_type = defaultdict(list)
+            for j in unmatched_new:
+                new_by_type[type(new_list.values[j].value)].append(j)
+            for node_type, old_indices in old_by_type.items():
+                pairs += [(i, j) for i, j in zip(old_indices, new_by_type[node_type]) if can_be_paired(i, j)]
+            return pairs
+
+        free_old = list(unmatched_old)
+        for j in unmatched_new:
+            candidates = [i for i in free_old if can_be_paired(i, j)]
+            if not candidates:
+                continue
+            new_value = new_list.values[j].value
+            i = min(candidates, key=lambda i: self._distance(old_list.values[i].value, new_value))
+            free_old.remove(i)
+            pairs.append((i, j))
+        return pairs
+
+    def diff_nodes(self, old_node: Node, new_node: Node) -> None:
+        if isinstance(old_node, ReferenceNode) or isinstance(new_node, ReferenceNode):
+            return  # TODO: what if we want to change node type from Scalar to Reference?
+        if old_node.content_hash == new_node.content_hash:
+            return
+        if type(old_node) is not type(new_node):
+            raise NotImplementedError(f"Type of a node can't be changed in place: {old_node.path}")
+
+        if old_node.comment != new_node.comment:
+            self.comment_updates.append(EditComment(path=old_node.path, new_comment=new_node.comment))
+
+        if isinstance(old_node, ScalarNode):
+            if old_node.tag != new_node.tag or old_node.value != new_node.value:
+                self.updates.append(EditScalarNode(path=old_node.path, tag=new_node.tag, value=new_node.value))
+        elif old_node.tag != new_node.tag:
+            raise NotImplementedError(f"Tag of a collection can't be edited: {old_node.path}")
+        elif isinstance(old_node, MappingNode):
+            self._diff_mappings(old_node, new_node)
+        elif isinstance(old_node, SequenceNode):
+            self._diff_sequences(old_node, new_node)
+        else:
+            raise TypeError(f"Unexpected graph node {old_node}")
+
+    def _diff_mappings(self, old_mapping: MappingNode, new_mapping: MappingNode) -> None:
+        # If type of a value was changed, the item is replaced: deleted and added again
+        replaced_keys = {
+            key for key in old_mapping.items.keys() & new_mapping.items.keys()
+            if not _is_same_type_or_reference(old_mapping.items[key].value, new_mapping.items[key].value)
+        }
+        kept_keys = (old_mapping.items.keys() & new_mapping.items.keys()) - replaced_keys
+
+        old_order = tuple(key for key in old_mapping.items if key in kept_keys)
+        new_order = tuple(key for key in new_mapping.items if key in kept_keys)
         if old_order != new_order:
-            result.append(EditMapOrder(
+            self.order_updates.append(EditMapOrder(
                 map_path=old_mapping.path,
                 new_order=tuple(new_mapping.items[key].path_key for key in new_order),
             ))
-        for key in new_order:
-            old_item: MappingNode.Item = old_mapping.items[key]
-            new_item: MappingNode.Item = new_mapping.items[key]
-            if isinstance(old_item.value, SequenceNode):
-                assert isinstance(new_item.value, SequenceNode)
-                result += self._match_lists_recursively(old_item.value, new_item.value, hashes, used_pairs)
-            elif isinstance(old_item.value, MappingNode):
-                assert isinstance(new_item.value, MappingNode)
-                result += self._match_mappings_recursively(old_item.value, new_item.value, hashes, used_pairs)
-        return result
-
-    def make_edit_order_updates(self, hashes: dict) -> list[EditListOrder | EditMapOrder]:
-        result = []
-        used_pairs = set()
-        for old_list, new_list in self.compared_nodes:
-            result += self._match_lists_recursively(old_list, new_list, hashes, used_pairs)
-        return result
-
 
-def _build_dictionary_edit_order(deltas) -> list[EditMapOrder]:
-    return [EditMapOrder(map_path=delta["map_path"], new_order=delta["new_order"]) for delta in deltas.values()]
+        for key, old_item in old_mapping.items.items():
+            if key not in kept_keys:
+                self.updates.append(DeleteMapItem(old_item.path + (1,)))  # all operations are performed via value
 
+        new_items = list(new_mapping.items.values())
+        for index, (key, new_item) in enumerate(new_mapping.items.items()):
+            if key in kept_keys:
+                old_item = old_mapping.items[key]
+                self.diff_nodes(old_item.key, new_item.key)
+                self.diff_nodes(old_item.value, new_item.value)
+                continue
+            prev_item = new_items[index - 1] if index > 0 else None
+            next_item = next((item for item in new_items[index + 1:] if item.path_key in kept_keys), None)
+            self.updates.append(AddMapItem(
+                map_path=old_mapping.path,
+                prev_item_key=None if prev_item is None else prev_item.path_key,
+                next_item_key=None if next_item is None else next_item.path_key,
+                new_item=new_item,
+            ))
 
-def _fix_type_changes(diff: deepdiff.DeepDiff) -> None:
-    for item in diff.tree["type_changes"]:
-        if _has_comment_parent(item):
-            continue
-        parent = item.up
-        old_value = parent.t1
-        new_value = parent.t2
-        assert isinstance(new_value, SequenceNode.Item)
-        assert isinstance(old_value, SequenceNode.Item)
-        diff.custom_report_result("iterable_item_removed", parent)
-        diff.custom_report_result("iterable_item_added", parent)
-        diff.tree["type_changes"].discard(item)
+    def _diff_sequences(self, old_list: SequenceNode, new_list: SequenceNode) -> None:
+        equal_pairs, unmatched_old, unmatched_new = self._match_equal_items(old_list, new_list)
+        edited_pairs = self._pair_edited_items(old_list, new_list, unmatched_old, unmatched_new)
+        pairs = sorted(equal_pairs + edited_pairs, key=lambda pair: pair[1])
 
+        if not all(pairs[k - 1] < pairs[k] for k in range(1, len(pairs))):
+            # If both sequences are ascending, no permutations were made. Only insertions and deletions
+            self.order_updates.append(EditListOrder(list_path=old_list.path, new_order=tuple(i for i, j in pairs)))
 
-def build_updates(old_graph: Node, new_graph: Node) -> list[Update]:
-    def exclude_object_diff(value, level_path) -> bool:
-        return level_path.endswith(".path")  # TODO: become agnostic to variable name
+        for i, j in edited_pairs:
+            self.diff_nodes(old_list.values[i].value, new_list.values[j].value)
 
-    list_order_operator = _ListOrderOperator()
-    hashes = {}
-    diff = DeepDiff(
-        old_graph,
-        new_graph,
-        verbose_level=2,  # This is to see dict key's new value
-        # If any of compared nodes (t1 or t2) is of this type, it is skipped.
-        # TODO: what if we want to change node type from Scalar to Reference?
-        exclude_types=[ReferenceNode],
-        exclude_obj_callback=exclude_object_diff,
-        custom_operators=[_DictOrderOperator(), list_order_operator],
-        hashes=hashes,
-        ignore_order=True,
-    )
+        paired_old = {i for i, j in pairs}
+        for i, old_item in enumerate(old_list.values):
+            if i not in paired_old:
+                self.updates.append(DeleteListItem(old_item.value.path))
 
-    _fix_type_changes(diff)
+        paired_new = {j for i, j in pairs}
+        for j, new_item in enumerate(new_list.values):
+            if j not in paired_new:
+                self.updates.append(AddListItem(list_path=old_list.path, insertion_index=j, new_item=new_item))
 
-    updates: list[Update] = list_order_operator.make_edit_order_updates(hashes)
-    if "edit_dict_order" in diff:
-        dict_order_updates = _build_dictionary_edit_order(diff["edit_dict_order"])
-        # if dict was inside list, order could have been processed in list_order_operator.make_edit_order_updates
-        dict_order_updates = [upd for upd in dict_order_updates if upd not in updates]
-        updates += dict_order_updates
 
-    comment_edit_items = []
-    for operation in diff.tree.keys():
-        items = []
-        for item in diff.tree[operation].items:
-            if _has_comment_parent(item):
-                comment_edit_items.append(item)
-            else:
-                items.append(item)
-        if not items:
-            continue
+def _is_same_type_or_reference(old_node: Node, new_node: Node) -> bool:
+    return type(old_node) is type(new_node) or isinstance(old_node, ReferenceNode) or \
+        isinstance(new_node, ReferenceNode)
 
-        if operation == "values_changed":
-            updates += _build_values_changed(items)
-        elif operation == "dictionary_item_added":
-            updates += _build_dictionary_item_added(items)
-        elif operation == "dictionary_item_removed":
-            updates += _build_dictionary_item_removed(items)
-        elif operation == "iterable_item_added":
-            updates += _build_list_item_added(items)
-        elif operation == "iterable_item_removed":
-            updates += _build_list_item_removed(items)
-        elif operation == "edit_dict_order":
-            continue  # Was already processed (without using tree)
-        else:
-            raise NotImplementedError(operation)
 
-    updates += _build_edit_comment(comment_edit_items)
-    return updates
+def build_updates(old_graph: Node, new_graph: Node) -> list[Update]:
+    differ = _TreeDiffer()
+    differ.diff_nodes(old_graph, new_graph)
+    return differ.order_updates + differ.updates + differ.comment_updates